@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+受信データ一括解析 (utr_batch.parse_capture) のベンチマーク
+
+インベントリ応答を連結した疑似キャプチャ(または記録ファイル)を、
+received_data_parse() と parse_capture() でそれぞれ解析し、処理時間を比較する。
+NumPyがインストールされている場合は、NumPy版と標準ライブラリ版の両方を計測する。
+
+実行例:
+    python benchmarks/bench_batch_parse.py --responses 2000 --tags 50
+    python benchmarks/bench_batch_parse.py --capture capture.bin
+    python benchmarks/bench_batch_parse.py --corruption 0.01   # フレームの約1%を壊す
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import utr_batch  # noqa: E402
+import utr_protocol as utr  # noqa: E402
+from bench_communicate import build_inventory_response  # noqa: E402
+
+
+def measure(func, *args) -> float:
+    """func(*args) の実行時間(秒)を返す。"""
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="受信データ一括解析のベンチマーク")
+    parser.add_argument('--capture', help="受信データ(生バイト列)のファイル。省略時は疑似データを生成")
+    parser.add_argument('--responses', type=int, default=2000, help="疑似データのインベントリ応答数")
+    parser.add_argument('--tags', type=int, default=50, help="1応答あたりのタグ枚数")
+    parser.add_argument('--corruption', type=float, default=0.0,
+                        help="1ビットを反転させるフレームの割合 (0～1、SUMエラー・再同期の計測用)")
+    args = parser.parse_args()
+
+    if args.capture:
+        with open(args.capture, 'rb') as f:
+            buffer = f.read()
+    else:
+        buffer = build_inventory_response(args.tags) * args.responses
+
+    frames = utr_batch.parse_capture(buffer)
+    if args.corruption > 0:
+        # フレーム数 × 割合 の箇所で1ビットずつ反転させる
+        rng = random.Random(0)
+        corrupted = bytearray(buffer)
+        for _ in range(int(len(frames) * args.corruption)):
+            corrupted[rng.randrange(len(corrupted))] ^= 1 << rng.randrange(8)
+        buffer = bytes(corrupted)
+        frames = utr_batch.parse_capture(buffer)
+
+    # 解析結果のタグ数が一致することを確認 (壊したデータでは、再同期の方法が異なるため確認しない)
+    with contextlib.redirect_stdout(io.StringIO()):
+        pc_uii_list, _, _ = utr.received_data_parse(buffer)
+    inventory_count = sum(1 for _ in frames.inventory_indexes())
+    if args.corruption <= 0:
+        assert inventory_count == len(pc_uii_list), (inventory_count, len(pc_uii_list))
+
+    print(f"データ長: {len(buffer):,} バイト, フレーム数: {len(frames):,}, タグ数: {inventory_count:,} "
+          f"(received_data_parse: {len(pc_uii_list):,}), SUMエラー: {frames.sum_errors:,}")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        elapsed = measure(utr.received_data_parse, buffer)
+    print(f"received_data_parse()         : {elapsed:8.3f} 秒 ({len(frames) / elapsed:12,.0f} フレーム/秒)")
+
+    numpy_module = utr_batch.np
+    if numpy_module is not None:
+        elapsed = measure(utr_batch.parse_capture, buffer)
+        print(f"parse_capture() NumPy版       : {elapsed:8.3f} 秒 ({len(frames) / elapsed:12,.0f} フレーム/秒)")
+    utr_batch.np = None
+    try:
+        elapsed = measure(utr_batch.parse_capture, buffer)
+        print(f"parse_capture() 標準ライブラリ版: {elapsed:8.3f} 秒 ({len(frames) / elapsed:12,.0f} フレーム/秒)")
+    finally:
+        utr_batch.np = numpy_module
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+communicate() の受信処理ベンチマーク
+
+1バイトずつ読み取る旧方式(V1.1.5)と、まとめて読み取りオフセットでフレームを
+切り出す現行方式とで、1フレームあたりのCPU時間を比較する。
+リーダライタは不要 (メモリ上の疑似シリアルに応答データを用意して計測)。
+
+実行例:
+    python benchmarks/bench_communicate.py --tags 100 --cycles 50
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import utr_protocol as utr  # noqa: E402
+
+
+class FakeSerial:
+    """
+    write()されるたびに、用意した応答データを受信バッファに積む疑似シリアル。
+    受信データは chunk_size バイトずつ到着したものとして扱う。
+    """
+
+    def __init__(self, response: bytes, chunk_size: int = 64) -> None:
+        self._response = response
+        self._chunk_size = chunk_size
+        self._rx = bytearray()
+        self._pos = 0
+        self.timeout = 0
+
+    def write(self, data: bytes) -> int:
+        self._rx = bytearray(self._response)
+        self._pos = 0
+        return len(data)
+
+    @property
+    def in_waiting(self) -> int:
+        # 到着済みとみなすのは chunk_size バイトまで
+        return min(self._chunk_size, len(self._rx) - self._pos)
+
+    def read(self, size: int = 1) -> bytes:
+        data = bytes(self._rx[self._pos:self._pos + size])
+        self._pos += len(data)
+        return data
+
+
+def build_frame(command: int, data: bytes) -> bytes:
+    """コマンドとデータ部から STX～CR のフレームを組み立てる。"""
+    body = bytes([0x02, 0x00, command, len(data)]) + data + b'\x03'
+    return body + bytes([utr.calculate_sum_value(body)]) + b'\x0D'
+
+
+def build_inventory_response(tag_count: int) -> bytes:
+    """tag_count 枚分の0x6Cフレームと、読み取り枚数入りのACKを連結した応答を作る。"""
+    frames: List[bytes] = []
+    for i in range(tag_count):
+        pc_uii = bytes([0x30, 0x00]) + i.to_bytes(12, 'big')
+        frames.append(build_frame(0x6C, bytes([0x09, 0xFC, 0x18, 0x00, len(pc_uii)]) + pc_uii))
+    frames.append(build_frame(0x30, bytes([0x10, 0x00]) + tag_count.to_bytes(2, 'little')))
+    return b''.join(frames)
+
+
+def legacy_communicate(ser, command: bytes, timeout: float = 1.0) -> bytes:
+    """V1.1.5 の communicate() (1バイトずつ読み取り、リストをスライスで作り直す方式)。"""
+    complete_response = b''
+    receive_buffer: List[int] = []
+    buffer_length = 0
+    ser.write(command)
+    start_time = time.time()
+    while True:
+        if (time.time() - start_time) > timeout:
+            return complete_response
+        chunk = ser.read(1)
+        if chunk:
+            receive_buffer.append(chunk[0])
+            buffer_length = len(receive_buffer)
+        if receive_buffer:
+            if receive_buffer[0] == utr.STX[0]:
+                if buffer_length >= utr.HEADER_LENGTH:
+                    data_length = receive_buffer[utr.HEADER_LENGTH - 1]
+                    frame_length = data_length + utr.HEADER_LENGTH + utr.FOOTER_LENGTH
+                    if buffer_length >= frame_length:
+                        if (receive_buffer[frame_length - 1] == utr.CR[0]
+                                and receive_buffer[data_length + utr.HEADER_LENGTH] == utr.ETX[0]):
+                            current_frame_bytes = bytes(receive_buffer[:frame_length])
+                            if utr.verify_sum_value(current_frame_bytes):
+                                complete_response += current_frame_bytes
+                                if receive_buffer[utr.CMD_LOCATION] in [utr.ACK[0], utr.NACK[0]]:
+                                    return complete_response
+                                receive_buffer = receive_buffer[frame_length:]
+                            else:
+                                receive_buffer = receive_buffer[1:]
+                        else:
+                            receive_buffer = receive_buffer[1:]
+            else:
+                receive_buffer = receive_buffer[1:]
+
+
+def measure(func, ser, cycles: int) -> float:
+    """cycles回インベントリを実行し、合計CPU時間(秒)を返す。"""
+    start = time.process_time()
+    for _ in range(cycles):
+        func(ser, utr.COMMANDS['UHF_INVENTORY'])
+    return time.process_time() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="communicate() の受信処理ベンチマーク")
+    parser.add_argument('--tags', type=int, default=100, help="1サイクルあたりのタグ枚数")
+    parser.add_argument('--cycles', type=int, default=50, help="インベントリのサイクル数")
+    parser.add_argument('--chunk', type=int, default=64, help="1回の到着バイト数")
+    args = parser.parse_args()
+
+    response = build_inventory_response(args.tags)
+    frames = (args.tags + 1) * args.cycles
+
+    # 応答内容が同じであることを確認してから計測
+    ser = FakeSerial(response, args.chunk)
+    assert legacy_communicate(ser, utr.COMMANDS['UHF_INVENTORY']) == response
+    assert utr.communicate(ser, utr.COMMANDS['UHF_INVENTORY']) == response
+
+    legacy = measure(legacy_communicate, ser, args.cycles)
+    current = measure(utr.communicate, ser, args.cycles)
+
+    print(f"タグ枚数: {args.tags} 枚/サイクル, サイクル数: {args.cycles}, 応答長: {len(response)} バイト")
+    print(f"旧方式 (1バイト読み取り): {legacy / frames * 1e6:8.2f} us/フレーム")
+    print(f"現行方式 (まとめて読み取り): {current / frames * 1e6:8.2f} us/フレーム")
+    if current > 0:
+        print(f"速度比: {legacy / current:.1f} 倍")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+SUM値の計算とRSSIの変換のベンチマーク (一致確認つき)
+
+計測の前に、変更前の実装 (forループでの合計、16進数文字列を経由したRSSIの変換) と
+現在の実装が、ビット単位で同じ結果になることを確認する。一致しない場合は計測せずに終了する。
+
+- RSSI   : 2バイトの全ての値 (65536通り) について、convert_rssi(hex)、decode_rssi()、
+           decode_rssi_values() の結果 (floatのビット列) が同じか
+- SUM値  : 長さ0～300バイトのランダムなデータ (bytes/bytearray/memoryview) について、
+           calculate_sum_value() が変更前と同じか。正しいフレームとSUM値を壊したフレームについて、
+           verify_sum_value()、verify_sum_values()、FrameReceiver の判定が変更前と同じか
+
+実行例:
+    python benchmarks/bench_decode.py --frames 100000
+"""
+
+import argparse
+import os
+import random
+import struct
+import sys
+import time
+
+from typing import Callable, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import utr_protocol as utr  # noqa: E402
+
+from utr_emulator import make_frame, make_tag_population  # noqa: E402
+
+
+# 変更前の calculate_sum_value() (比較用)
+def reference_sum_value(data: bytes) -> int:
+    sum_value = 0
+    for byte in data:
+        sum_value += byte
+    sum_value &= 0xFF
+    return sum_value
+
+
+# 変更前の verify_sum_value() (比較用)
+def reference_verify_sum_value(data_frame: bytes) -> bool:
+    data_length = len(data_frame)
+    return data_frame[data_length - 2] == reference_sum_value(data_frame[:data_length - 2])
+
+
+def float_bits(value: float) -> bytes:
+    return struct.pack('<d', value)
+
+
+def check_rssi() -> int:
+    """全てのRSSI値で、変更前と同じ値になるかを確認し、不一致の数を返す。"""
+    frames = [bytes([0x02, 0x00, 0x6C, 0x05, 0x09, high, low, 0x00, 0x00, 0x03, 0x00, 0x0D])
+              for high in range(256) for low in range(256)]
+    batch = utr.decode_rssi_values(frames)
+    errors = 0
+    for frame, batch_value in zip(frames, batch):
+        expected = float_bits(utr.convert_rssi(frame[5:7].hex()))
+        if float_bits(utr.decode_rssi(frame)) != expected or float_bits(batch_value) != expected:
+            errors += 1
+    return errors
+
+
+def check_sum(count: int, seed: int = 0) -> int:
+    """ランダムなデータとフレームで、SUM値の計算・検証が変更前と同じかを確認し、不一致の数を返す。"""
+    rng = random.Random(seed)
+    errors = 0
+    frames: List[bytes] = []
+    for _ in range(count):
+        data = bytes(rng.getrandbits(8) for _ in range(rng.randint(0, 300)))
+        expected = reference_sum_value(data)
+        for variant in (data, bytearray(data), memoryview(data)):
+            if utr.calculate_sum_value(variant) != expected:
+                errors += 1
+        if len(data) >= 2:
+            frames.append(data)   # SUM値が正しいとは限らないフレーム
+
+    # 正しいフレームと、SUM値を1だけずらしたフレーム
+    for pc_uii in make_tag_population(count // 10 + 1, seed):
+        frame = make_frame(utr.INV[0], bytes([0x09, 0xFC, 0x18, 0x00, len(pc_uii)]) + pc_uii)
+        frames.append(frame)
+        frames.append(frame[:-2] + bytes([(frame[-2] + 1) & 0xFF]) + frame[-1:])
+
+    expected_results = [reference_verify_sum_value(frame) for frame in frames]
+    for frame, expected in zip(frames, expected_results):
+        if utr.verify_sum_value(frame) != expected or utr.verify_sum_value(memoryview(frame)) != expected:
+            errors += 1
+    if utr.verify_sum_values(frames) != expected_results:
+        errors += 1
+
+    # FrameReceiver: SUM値が正しいフレームだけを受け取るか (フレームの種類は変更前の判定で数える)
+    stream = b''.join(frame for frame in frames[-2 * (count // 10 + 1):])
+    receiver = utr.FrameReceiver()
+    receiver.feed(stream)
+    received = [frame.raw for frame in receiver.frames()]
+    if received != [frame for frame in frames[-2 * (count // 10 + 1):] if reference_verify_sum_value(frame)]:
+        errors += 1
+    return errors
+
+
+def measure(function: Callable[[], object], repeat: int) -> float:
+    """function を repeat 回実行し、最も速かった回の時間（秒）を返す。"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SUM値の計算とRSSIの変換のベンチマーク")
+    parser.add_argument('--frames', type=int, default=100000, help="計測に使うインベントリ応答フレームの数")
+    parser.add_argument('--checks', type=int, default=20000, help="SUM値の一致確認に使うランダムなデータの数")
+    parser.add_argument('--repeat', type=int, default=5, help="計測の回数 (最も速かった回を表示)")
+    args = parser.parse_args()
+
+    rssi_errors = check_rssi()
+    sum_errors = check_sum(args.checks)
+    print(f"一致確認: RSSI 65536通り 不一致 {rssi_errors} 件, SUM値 {args.checks}件 不一致 {sum_errors} 件")
+    if rssi_errors or sum_errors:
+        sys.exit(1)
+
+    frames = [make_frame(utr.INV[0], bytes([0x09, 0xFC, 0x18, 0x00, len(pc_uii)]) + pc_uii)
+              for pc_uii in make_tag_population(args.frames)]
+    views = [memoryview(frame) for frame in frames]
+
+    cases = [
+        ("SUM値の検証 (変更前)", lambda: [reference_verify_sum_value(f) for f in frames]),
+        ("SUM値の検証 verify_sum_value", lambda: [utr.verify_sum_value(f) for f in frames]),
+        ("SUM値の検証 verify_sum_values", lambda: utr.verify_sum_values(frames)),
+        ("SUM値の検証 verify_sum_values (memoryview)", lambda: utr.verify_sum_values(views)),
+        ("RSSI (変更前 convert_rssi(hex))", lambda: [utr.convert_rssi(f[5:7].hex()) for f in frames]),
+        ("RSSI decode_rssi", lambda: [utr.decode_rssi(f) for f in frames]),
+        ("RSSI decode_rssi_values", lambda: utr.decode_rssi_values(frames)),
+    ]
+    for name, function in cases:
+        elapsed = measure(function, args.repeat)
+        print(f"{name:44s}: {elapsed / args.frames * 1e9:8.1f} ns/フレーム")
+
+
+if __name__ == '__main__':
+    main()
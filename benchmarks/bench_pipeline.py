@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+インベントリのパイプライン実行 (utr_pipeline) のベンチマーク
+
+疑似リーダライタ (utr_emulator、ボーレートに合わせた送信速度) に対して、
+従来の順次実行 (送信 → 受信 → 解析 → 表示・集計) と InventoryPipeline とで
+1秒あたりのインベントリ回数と、リーダライタと通信していた時間の割合を比較する。
+PC+UIIの表示は、main() と同様に行う (出力先はメモリ上、--print-delay でコンソールへの
+表示にかかる時間を再現する)。
+
+実行例:
+    python benchmarks/bench_pipeline.py --tags 100 --cycles 50 --baud 115200
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+from typing import Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import utr_protocol as utr  # noqa: E402
+from utr_emulator import EmulatedSerial, UtrEmulator, make_tag_population  # noqa: E402
+from utr_pipeline import InventoryPipeline  # noqa: E402
+from utr_tags import TagStore  # noqa: E402
+
+
+class SlowConsole(io.StringIO):
+    """1回の書き込みごとに delay 秒かかるコンソールの代わり。"""
+
+    def __init__(self, delay: float) -> None:
+        super().__init__()
+        self.delay = delay
+
+    def write(self, text: str) -> int:
+        if self.delay:
+            time.sleep(self.delay)
+        return super().write(text)
+
+
+def run_sequential(ser, cycles: int) -> Tuple[float, float]:
+    """main() の従来の読み取りループと同じ処理を行い、(経過時間, 通信時間) を返す。"""
+    store = TagStore()
+    timeout = utr.InventoryTimeout(ser.baudrate)
+    io_seconds = 0.0
+    start = time.monotonic()
+    for _ in range(cycles):
+        io_start = time.monotonic()
+        result = utr.communicate(ser, utr.COMMANDS['UHF_INVENTORY'], timeout.value)
+        io_seconds += time.monotonic() - io_start
+        pc_uii_list, rssi_list, expected_count = utr.received_data_parse(result)
+        timeout.update(expected_count)
+        for pc_uii in pc_uii_list:
+            print(f"PC+UII: {pc_uii.hex().upper()}")
+        store.add_many(pc_uii_list, rssi_list)
+    return time.monotonic() - start, io_seconds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="インベントリのパイプライン実行のベンチマーク")
+    parser.add_argument('--tags', type=int, default=100, help="1回のインベントリで読み取るタグ枚数")
+    parser.add_argument('--cycles', type=int, default=50, help="インベントリの回数")
+    parser.add_argument('--baud', type=int, default=115200, help="疑似リーダライタのボーレート")
+    parser.add_argument('--delay', type=float, default=0.005, help="コマンド受信から応答開始までの時間（秒）")
+    parser.add_argument('--print-delay', type=float, default=0.0002,
+                        help="コンソールへの1回の表示にかかる時間（秒）")
+    args = parser.parse_args()
+
+    tags = make_tag_population(args.tags)
+
+    with contextlib.redirect_stdout(SlowConsole(args.print_delay)):
+        ser = EmulatedSerial(UtrEmulator(tags, seed=0), args.baud, args.delay)
+        sequential, sequential_io = run_sequential(ser, args.cycles)
+
+        ser = EmulatedSerial(UtrEmulator(tags, seed=0), args.baud, args.delay)
+        store = TagStore()
+        statistics = InventoryPipeline(ser, tag_store=store, print_tags=True).run(cycles=args.cycles)
+
+    assert statistics.tags == args.tags * args.cycles, statistics
+
+    print(f"タグ枚数: {args.tags} 枚/回, 回数: {args.cycles}, ボーレート: {args.baud}")
+    print(f"順次実行      : {args.cycles / sequential:8.2f} 回/秒, 通信時間の割合 {sequential_io / sequential:6.1%}")
+    print(f"パイプライン  : {statistics.cycles_per_second:8.2f} 回/秒, 通信時間の割合 {statistics.duty_cycle:6.1%}"
+          f" (解析待ちの最大 {statistics.max_queue_depth} 件)")
+    print(f"速度比: {sequential / statistics.elapsed:.2f} 倍")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+タグの在/不在判定 (utr_presence.PresenceTracker) のベンチマーク
+
+在と判定しているタグの数を変えて、1回の読み取りあたりの処理時間を計測する。
+タイミングホイールで期限を確認するため、タグの数が増えても1回あたりの時間はほぼ変わらない。
+比較として、インベントリのたびに全タグの最終読み取り時刻を確認する方式も計測する。
+
+実行例:
+    python benchmarks/bench_presence.py --tags 1000 10000 50000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+from typing import Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from utr_presence import PresenceTracker  # noqa: E402
+
+
+def simulate(tag_count: int, cycles: int, reads_per_cycle: int, full_scan: bool) -> float:
+    """
+    tag_count 枚のタグのうち、毎回 reads_per_cycle 枚を読み取るインベントリを cycles 回行い、
+    1回の読み取りあたりの処理時間（秒）を返す。
+    """
+    rng = random.Random(0)
+    tags = [rng.getrandbits(112).to_bytes(14, 'big') for _ in range(tag_count)]
+    cycle_time = 0.05
+    expiry = 5.0
+    tracker = PresenceTracker(hold_off=0.0, expiry=expiry, resolution=0.1)
+    last_seen: Dict[bytes, float] = {}
+
+    # 全タグを一度読み取り、在の状態にしておく
+    tracker.update(tags, 0.0)
+    for pc_uii in tags:
+        last_seen[pc_uii] = 0.0
+
+    batches: List[List[bytes]] = [rng.sample(tags, reads_per_cycle) for _ in range(16)]
+    start = time.perf_counter()
+    for cycle in range(1, cycles + 1):
+        now = cycle * cycle_time
+        batch = batches[cycle % len(batches)]
+        if full_scan:
+            # 比較用: 毎回全タグの最終読み取り時刻を確認する
+            departed = [pc_uii for pc_uii, seen in last_seen.items() if seen + expiry <= now]
+            for pc_uii in departed:
+                del last_seen[pc_uii]
+            for pc_uii in batch:
+                last_seen[pc_uii] = now
+        else:
+            tracker.update(batch, now)
+    return (time.perf_counter() - start) / (cycles * reads_per_cycle)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="タグの在/不在判定のベンチマーク")
+    parser.add_argument('--tags', type=int, nargs='+', default=[1000, 10000, 50000], help="在のタグ数")
+    parser.add_argument('--cycles', type=int, default=400, help="インベントリの回数")
+    parser.add_argument('--reads', type=int, default=200, help="1回のインベントリで読み取るタグ数")
+    args = parser.parse_args()
+
+    print(f"インベントリ {args.cycles} 回、1回あたり {args.reads} 枚読み取り")
+    for tag_count in args.tags:
+        wheel = simulate(tag_count, args.cycles, args.reads, full_scan=False)
+        scan = simulate(tag_count, args.cycles, args.reads, full_scan=True)
+        print(f"タグ {tag_count:6d} 枚: タイミングホイール {wheel * 1e6:7.2f} us/読み取り, "
+              f"毎回全件確認 {scan * 1e6:8.2f} us/読み取り")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+通信記録の再生 (utr_capture.ReplaySerial) による受信処理全体のベンチマーク
+
+疑似シリアルとの通信を CaptureSerial で記録し、その記録ファイルを ReplaySerial で
+再生しながら communicate() と received_data_parse() を実行する。
+記録時と同じ解析結果が得られること(再現性)と、1秒あたりのサイクル数を確認する。
+記録ファイルを指定した場合は、その記録を再生する (現場で記録したデータの再現など)。
+
+実行例:
+    python benchmarks/bench_replay.py --tags 100 --cycles 200
+    python benchmarks/bench_replay.py --capture field.utrcap
+    python benchmarks/bench_replay.py --capture field.utrcap --realtime
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import utr_protocol as utr  # noqa: E402
+from bench_communicate import FakeSerial, build_inventory_response  # noqa: E402
+from utr_capture import CaptureSerial, CaptureWriter, ReplaySerial  # noqa: E402
+
+
+def run_cycles(ser, cycles: int, timeout: float):
+    """インベントリを cycles 回実行し、各サイクルのPC+UIIリストを返す。"""
+    results = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(cycles):
+            response = utr.communicate(ser, utr.COMMANDS['UHF_INVENTORY'], timeout)
+            pc_uii_list, _, _ = utr.received_data_parse(response)
+            results.append(pc_uii_list)
+    return results
+
+
+def count_commands(path: str) -> int:
+    """記録ファイルに含まれる送信コマンドの数を返す。"""
+    from utr_capture import DIRECTION_TX, iter_capture, open_capture
+    buffer, _, _ = open_capture(path)
+    return sum(1 for record in iter_capture(buffer) if record.direction == DIRECTION_TX)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="通信記録の再生による受信処理全体のベンチマーク")
+    parser.add_argument('--capture', help="再生する記録ファイル。省略時は疑似データを記録して再生")
+    parser.add_argument('--tags', type=int, default=100, help="疑似データの1サイクルあたりのタグ枚数")
+    parser.add_argument('--cycles', type=int, default=200, help="疑似データのサイクル数")
+    parser.add_argument('--realtime', action='store_true', help="記録時のタイミングで再生する")
+    args = parser.parse_args()
+
+    expected = None
+    path = args.capture
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), 'bench.utrcap')
+        with CaptureWriter(path) as writer:
+            ser = CaptureSerial(FakeSerial(build_inventory_response(args.tags)), writer)
+            expected = run_cycles(ser, args.cycles, 1.0)
+
+    cycles = count_commands(path)
+    replay = ReplaySerial(path, realtime=args.realtime)
+    start = time.perf_counter()
+    results = run_cycles(replay, cycles, 1.0)
+    elapsed = time.perf_counter() - start
+
+    tags = sum(len(pc_uii_list) for pc_uii_list in results)
+    print(f"記録ファイル: {path} ({os.path.getsize(path):,} バイト)")
+    print(f"サイクル数  : {cycles}, タグ数: {tags:,}")
+    print(f"処理時間    : {elapsed:.3f} 秒 ({cycles / elapsed:,.0f} サイクル/秒, {tags / elapsed:,.0f} タグ/秒)")
+    if replay.command_mismatches:
+        print(f"記録と異なる送信コマンド: {replay.command_mismatches} 回")
+    if expected is not None:
+        if results != expected:
+            print("NG: 記録時と再生時の解析結果が一致しません")
+            sys.exit(1)
+        print("OK: 記録時と再生時の解析結果が一致しました")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+起動時間のベンチマーク (リーダライタ不要、Linux/macOS)
+
+新しいPythonのプロセスで、次の時間を計測する (それぞれ --repeat 回の中央値)。
+- import      : utr_usb_sample を読み込むまでの時間 (python -c pass との差)
+- 初回インベントリ: プロセスの起動から、最初のインベントリが終わるまでの時間
+                  疑似リーダライタ (utr_emulator.serve_pty) に対して
+                  `utr_usb_sample.py --port ... --cycles 1 --quiet` を実行し、
+                  集計の表示 (「現在の合計読み取り時間」) が出力された時刻で計測する
+- 同 (--state-file): 前回の状態を再利用した場合 (utr_session.py)
+
+--importtime を指定すると、python -X importtime で読み込みに時間のかかるモジュールを表示する。
+
+実行例:
+    python benchmarks/bench_startup.py --repeat 10 --baud 115200
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from typing import List
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC_DIR)
+
+from utr_emulator import UtrEmulator, make_tag_population, serve_pty  # noqa: E402
+
+# 最初のインベントリが終わった後に main() が表示する行
+FIRST_INVENTORY_MARKER = "現在の合計読み取り時間".encode('utf-8')
+
+
+def measure_command(arguments: List[str], repeat: int) -> List[float]:
+    """プロセスの起動から終了までの時間（秒）を repeat 回計測する。"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + arguments, check=True, cwd=SRC_DIR)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def measure_first_inventory(device: str, baud_rate: int, extra: List[str], work_dir: str) -> float:
+    """プロセスの起動から、最初のインベントリの集計が表示されるまでの時間（秒）を返す。"""
+    arguments = [sys.executable, 'utr_usb_sample.py', '--port', device, '--baud', str(baud_rate),
+                 '--cycles', '1', '--quiet', '--no-buzzer',
+                 '--log-dir', os.path.join(work_dir, 'logs'),
+                 '--results-file', os.path.join(work_dir, 'results.txt')] + extra
+    start = time.perf_counter()
+    process = subprocess.Popen(arguments, cwd=SRC_DIR, stdout=subprocess.PIPE)
+    elapsed = None
+    for line in process.stdout:
+        if elapsed is None and FIRST_INVENTORY_MARKER in line:
+            elapsed = time.perf_counter() - start
+    process.wait()
+    if elapsed is None:
+        raise RuntimeError("インベントリの結果が表示されませんでした")
+    return elapsed
+
+
+def show_importtime(limit: int) -> None:
+    """python -X importtime の結果から、読み込みに時間のかかったモジュールを表示する。"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import utr_usb_sample'],
+                            cwd=SRC_DIR, stderr=subprocess.PIPE, check=True)
+    rows = []
+    for line in result.stderr.decode('utf-8').splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        fields = line[len('import time:'):].split('|')
+        rows.append((int(fields[1]), int(fields[0]), fields[2].rstrip()))
+    print(f"読み込みに時間のかかったモジュール (上位 {limit} 件、累計/自身 us):")
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:limit]:
+        print(f"  {cumulative_us:8d} {self_us:8d} {name}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="起動時間のベンチマーク")
+    parser.add_argument('--repeat', type=int, default=10, help="計測の回数")
+    parser.add_argument('--baud', type=int, default=115200, help="疑似リーダライタのボーレート")
+    parser.add_argument('--tags', type=int, default=30, help="疑似リーダライタのタグ枚数")
+    parser.add_argument('--importtime', action='store_true', help="読み込みに時間のかかるモジュールを表示する")
+    args = parser.parse_args()
+
+    baseline = statistics.median(measure_command(['-c', 'pass'], args.repeat))
+    imported = statistics.median(measure_command(['-c', 'import utr_usb_sample'], args.repeat))
+    print(f"python -c pass        : {baseline * 1000:8.1f} ms")
+    print(f"import utr_usb_sample : {imported * 1000:8.1f} ms (差 {(imported - baseline) * 1000:.1f} ms)")
+
+    device = serve_pty(UtrEmulator(make_tag_population(args.tags), seed=0), args.baud)
+    with tempfile.TemporaryDirectory() as work_dir:
+        first = [measure_first_inventory(device, args.baud, [], work_dir) for _ in range(args.repeat)]
+        print(f"初回インベントリまで  : {statistics.median(first) * 1000:8.1f} ms (最小 {min(first) * 1000:.1f} ms)")
+
+        state_file = os.path.join(work_dir, 'reader_state.json')
+        measure_first_inventory(device, args.baud, ['--state-file', state_file], work_dir)  # 状態を保存
+        resumed = [measure_first_inventory(device, args.baud, ['--state-file', state_file], work_dir)
+                   for _ in range(args.repeat)]
+        print(f"同 (--state-file)     : {statistics.median(resumed) * 1000:8.1f} ms (最小 {min(resumed) * 1000:.1f} ms)")
+
+    if args.importtime:
+        show_importtime(15)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+プロトコル処理のベンチマーク一式
+
+次の2種類を計測し、結果をJSONで出力する (バージョン間の性能比較用)。
+リーダライタは不要 (疑似リーダライタ utr_emulator をメモリ上で使用)。
+
+- 関数単位の計測 (1回あたりの処理時間)
+    communicate, parse_data_frame, received_data_parse, verify_sum_value,
+    calculate_sum_value, convert_rssi, parse_inventory_frames, iter_inventory_tags
+- インベントリ全体の計測 (送信 → 受信 → 解析 → 集計)
+    タグ枚数 1, 30, 300, 3000 と、応答フレームの破損率ごとに、
+    サイクル/秒、フレーム/秒、タグ1枚あたりのCPU時間 を計測する。
+
+実行例:
+    python benchmarks/bench_suite.py --output result.json
+    python benchmarks/bench_suite.py --quick --compare result.json   # 前回の結果と比較
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import timeit
+
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import utr_protocol as utr  # noqa: E402
+from bench_communicate import FakeSerial, build_frame, build_inventory_response  # noqa: E402
+from utr_emulator import EmulatedSerial, UtrEmulator, make_tag_population  # noqa: E402
+from utr_responses import iter_inventory_tags  # noqa: E402
+from utr_tags import TagStore  # noqa: E402
+
+
+RESULT_FORMAT_VERSION = 1
+DEFAULT_TAG_COUNTS = (1, 30, 300, 3000)
+DEFAULT_CORRUPTION_RATES = (0.0, 0.01)
+
+# 比較時に「大きいほど良い」項目 (それ以外は小さいほど良い)
+HIGHER_IS_BETTER = ('cycles_per_sec', 'frames_per_sec')
+
+
+def time_per_call(func: Callable[[], object], min_time: float, repeat: int) -> Dict[str, float]:
+    """
+    func() を min_time 秒以上かかる回数ずつ repeat 回実行し、最も速かった回の1回あたりの時間を返す。
+    """
+    timer = timeit.Timer(func)
+    number, elapsed = timer.autorange()   # 0.2秒以上かかる回数
+    number = max(int(number * min_time / elapsed), 1)
+    best = min(timer.repeat(repeat, number)) / number
+    return {'ns_per_op': best * 1e9, 'loops': number}
+
+
+def run_micro(min_time: float, repeat: int) -> Dict[str, Dict[str, float]]:
+    """関数単位の計測を行う。"""
+    tag_frame = build_frame(0x6C, bytes([0x09, 0xFC, 0x18, 0x00, 0x0E, 0x30, 0x00]) + bytes(12))
+    response_30 = build_inventory_response(30)
+    rom_response = build_frame(0x30, bytes([0x90]) + b'EMU1.0')
+    rom_serial = FakeSerial(rom_response, chunk_size=len(rom_response))
+    inventory_serial = FakeSerial(response_30, chunk_size=4096)
+    command = utr.COMMANDS['UHF_INVENTORY']
+    receiver = utr.FrameReceiver()
+    receiver.feed(response_30)
+    frames_30 = list(receiver.frames())
+
+    benches = {
+        'calculate_sum_value': lambda: utr.calculate_sum_value(tag_frame[:-2]),
+        'verify_sum_value': lambda: utr.verify_sum_value(tag_frame),
+        'convert_rssi': lambda: utr.convert_rssi('fc18'),
+        'decode_rssi': lambda: utr.decode_rssi(tag_frame),
+        'parse_data_frame': lambda: utr.parse_data_frame(response_30, 0),
+        'received_data_parse[30]': lambda: utr.received_data_parse(response_30),
+        'parse_inventory_frames[30]': lambda: utr.parse_inventory_frames(frames_30),
+        'iter_inventory_tags[30]': lambda: [(tag.pc_uii, tag.rssi) for tag in iter_inventory_tags(frames_30)],
+        'communicate[ack]': lambda: utr.communicate(rom_serial, utr.COMMANDS['ROM_VERSION_CHECK']),
+        'communicate[30]': lambda: utr.communicate(inventory_serial, command),
+    }
+    results = {}
+    for name, func in benches.items():
+        results[name] = time_per_call(func, min_time, repeat)
+        print(f"  {name:26s} {results[name]['ns_per_op']:12,.0f} ns/回")
+    return results
+
+
+def run_end_to_end(tag_count: int, corruption_rate: float, cycles: int) -> Dict[str, float]:
+    """
+    疑似リーダライタに対してインベントリを cycles 回実行し、main() と同じ解析・集計を行う。
+    """
+    emulator = UtrEmulator(make_tag_population(tag_count), corruption_rate=corruption_rate, seed=0)
+    ser = EmulatedSerial(emulator)
+    store = TagStore()
+    command = utr.COMMANDS['UHF_INVENTORY']
+    # ACKが壊れた場合はタイムアウトまで待つため、短めにする
+    timeout = 0.05
+
+    tags_parsed = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        for _ in range(cycles):
+            frames = utr.communicate_frames(ser, command, timeout)
+            pc_uii_list, rssi_list, _ = utr.parse_inventory_frames(frames)
+            store.add_many(pc_uii_list, rssi_list)
+            tags_parsed += len(pc_uii_list)
+        cpu = time.process_time() - cpu_start
+        wall = time.perf_counter() - wall_start
+
+    frames = (tag_count + 1) * cycles
+    return {
+        'tags': tag_count,
+        'corruption_rate': corruption_rate,
+        'cycles': cycles,
+        'wall_seconds': wall,
+        'cpu_seconds': cpu,
+        'cycles_per_sec': cycles / wall,
+        'frames_per_sec': frames / wall,
+        'cpu_us_per_tag': cpu / max(tag_count * cycles, 1) * 1e6,
+        'tags_expected': tag_count * cycles,
+        'tags_parsed': tags_parsed,
+    }
+
+
+def git_revision() -> Optional[str]:
+    """計測したソースのコミット (gitが使えない場合はNone)。"""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> int:
+    """
+    前回の結果と比較して表示し、threshold (割合) を超えて遅くなった項目の数を返す。
+    """
+    regressions = 0
+    print(f"\n前回の結果 ({baseline.get('revision')}) との比較 (+は改善、-は悪化):")
+
+    def show(name: str, key: str, now: float, before: float) -> None:
+        nonlocal regressions
+        if not before or not now:
+            return
+        change = (now / before - 1) if key in HIGHER_IS_BETTER else (before / now - 1)
+        mark = ''
+        if change < -threshold:
+            regressions += 1
+            mark = '  <-- 悪化'
+        print(f"  {name:40s} {key:15s} {change * 100:+7.1f}%{mark}")
+
+    for name, result in current['micro'].items():
+        before = baseline.get('micro', {}).get(name)
+        if before:
+            show(name, 'ns_per_op', result['ns_per_op'], before['ns_per_op'])
+    baseline_runs = {(run['tags'], run['corruption_rate']): run for run in baseline.get('end_to_end', [])}
+    for run in current['end_to_end']:
+        before = baseline_runs.get((run['tags'], run['corruption_rate']))
+        if before:
+            name = f"inventory[tags={run['tags']}, corrupt={run['corruption_rate']}]"
+            for key in ('frames_per_sec', 'cpu_us_per_tag'):
+                show(name, key, run[key], before[key])
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="プロトコル処理のベンチマーク一式")
+    parser.add_argument('--tags', type=int, nargs='+', default=list(DEFAULT_TAG_COUNTS),
+                        help="インベントリ全体の計測に使うタグ枚数")
+    parser.add_argument('--corruption', type=float, nargs='+', default=list(DEFAULT_CORRUPTION_RATES),
+                        help="応答フレームの破損率")
+    parser.add_argument('--frames', type=int, default=30000,
+                        help="インベントリ全体の計測で、1条件あたりに受信するフレーム数の目安")
+    parser.add_argument('--quick', action='store_true', help="計測時間を短くする (傾向の確認用)")
+    parser.add_argument('--output', help="結果を書き出すJSONファイル")
+    parser.add_argument('--compare', help="比較する前回の結果(JSONファイル)")
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help="悪化とみなす割合 (デフォルト: 0.1 = 10%%)")
+    args = parser.parse_args()
+
+    min_time, repeat, frames = (0.05, 3, args.frames // 10) if args.quick else (0.2, 5, args.frames)
+
+    print("関数単位の計測:")
+    micro = run_micro(min_time, repeat)
+
+    print("インベントリ全体の計測:")
+    end_to_end: List[Dict[str, float]] = []
+    for corruption_rate in args.corruption:
+        for tag_count in args.tags:
+            cycles = max(frames // (tag_count + 1), 3)
+            run = run_end_to_end(tag_count, corruption_rate, cycles)
+            end_to_end.append(run)
+            print(f"  タグ {tag_count:5d} 枚, 破損率 {corruption_rate:5.3f}: "
+                  f"{run['cycles_per_sec']:9,.1f} サイクル/秒, {run['frames_per_sec']:10,.0f} フレーム/秒, "
+                  f"{run['cpu_us_per_tag']:7.2f} us/タグ (CPU), 解析 {run['tags_parsed']}/{run['tags_expected']}")
+
+    result = {
+        'format_version': RESULT_FORMAT_VERSION,
+        'revision': git_revision(),
+        'timestamp': time.time(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'micro': micro,
+        'end_to_end': end_to_end,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"\n結果を {args.output} に保存しました")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(result, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
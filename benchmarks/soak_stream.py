@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+連続インベントリモード受信 (utr_stream) のリプレイ耐久試験
+
+記録した受信データ(または生成した疑似データ)を、パケットの途中から、
+ばらばらの大きさのかたまりで繰り返し流し込み、以下を確認する。
+- 取りこぼし無く全てのタグ情報が得られること (フレーム数の一致)
+- 長時間流し続けてもメモリ使用量が増えないこと (立ち上がり後からの増加が --max-growth 以下)
+- 1秒あたりに処理できるタグ数
+
+実行例:
+    python benchmarks/soak_stream.py --passes 2000
+    python benchmarks/soak_stream.py --capture recorded_stream.bin --passes 100
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+from typing import Iterator
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from bench_communicate import build_frame   # noqa: E402
+from utr_stream import StreamStatistics, iter_inventory_records  # noqa: E402
+
+
+def build_stream(tag_count: int) -> bytes:
+    """連続インベントリモードを模した、tag_count 枚分の0x6Cフレームの連続データを作る。"""
+    frames = []
+    for i in range(tag_count):
+        pc_uii = bytes([0x30, 0x00]) + i.to_bytes(12, 'big')
+        frames.append(build_frame(0x6C, bytes([0x09, 0xFC, 0x18, i & 0xFF, len(pc_uii)]) + pc_uii))
+    return b''.join(frames)
+
+
+def replay_chunks(stream: bytes, passes: int, seed: int) -> Iterator[bytes]:
+    """記録データを passes 回、ランダムな大きさ(1～512バイト)のかたまりで返す。"""
+    rng = random.Random(seed)
+    # 途中のパケットから受信を開始した状態を再現 (先頭フレームの途中から)
+    yield stream[5:]
+    for _ in range(passes - 1):
+        pos = 0
+        while pos < len(stream):
+            size = rng.randint(1, 512)
+            yield stream[pos:pos + size]
+            pos += size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="連続インベントリモード受信のリプレイ耐久試験")
+    parser.add_argument('--capture', help="記録した受信データ(生バイト列)のファイル。省略時は疑似データを生成")
+    parser.add_argument('--tags', type=int, default=200, help="疑似データのタグ枚数")
+    parser.add_argument('--passes', type=int, default=1000, help="記録データを流す回数")
+    parser.add_argument('--seed', type=int, default=0, help="かたまりの大きさを決める乱数シード")
+    parser.add_argument('--max-growth', type=int, default=64 * 1024,
+                        help="立ち上がり後からのメモリ使用量の増加の上限 (バイト)。超えたらNG")
+    args = parser.parse_args()
+
+    if args.capture:
+        with open(args.capture, 'rb') as f:
+            stream = f.read()
+    else:
+        stream = build_stream(args.tags)
+
+    # 1回分に含まれるフレーム数を数えておく
+    frames_per_pass = sum(1 for _ in iter_inventory_records([stream]))
+
+    statistics = StreamStatistics()
+    tracemalloc.start()
+    start = time.perf_counter()
+    snapshot_size = None
+    records = 0
+    for records, _ in enumerate(iter_inventory_records(replay_chunks(stream, args.passes, args.seed),
+                                                       statistics), 1):
+        if records == frames_per_pass * 10:
+            # 立ち上がり後のメモリ使用量を基準にする
+            snapshot_size = tracemalloc.get_traced_memory()[0]
+    elapsed = time.perf_counter() - start
+    final_size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    # 先頭の途中から始まるフレーム1つ分は欠ける
+    expected = frames_per_pass * args.passes - 1
+    print(f"受信バイト数      : {statistics.received_bytes}")
+    print(f"タグ情報の数      : {records} (期待値 {expected})")
+    print(f"読み飛ばしバイト数: {statistics.discarded_bytes}")
+    print(f"処理速度          : {records / elapsed:,.0f} タグ/秒")
+    failed = False
+    if snapshot_size is not None:
+        growth = final_size - snapshot_size
+        print(f"メモリ使用量      : {snapshot_size} -> {final_size} バイト (増加 {growth} バイト)")
+        if growth > args.max_growth:
+            print(f"NG: メモリ使用量が上限 ({args.max_growth} バイト) を超えて増えています")
+            failed = True
+    if records != expected:
+        print("NG: 取りこぼしがあります")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+UTR-S201 シリーズ asyncio 版クライアント（無保証）
+
+【概要】
+1つのイベントループで複数台のリーダライタを同時に制御するための asyncio 版クライアント。
+`communicate()` のようにスレッドを止めて受信を待つのではなく、受信データは
+UtrProtocol.data_received() に届いた分だけ解析し、ACK/NACKの受信で応答を返す。
+
+【使用例】
+    client = await open_serial_client('COM3', 115200)
+    print(await client.rom_version())
+    pc_uii_list, rssi_list, expected_count = await client.inventory()
+    tags, expected_count = await client.inventory_tags()   # ANGLEも参照する場合
+
+    # 複数台を同時に読み取り
+    results = await asyncio.gather(*(c.inventory() for c in clients))
+
+【前提】
+- シリアルポートに接続する場合は pyserial-asyncio のインストールが必要です。
+  (pip install pyserial-asyncio)
+- ソケット接続 (open_socket_client) は標準ライブラリのみで動作します。
+  ソケットやptyで動作する疑似リーダライタを相手に動作確認ができます。
+"""
+
+import argparse
+import asyncio
+
+from typing import List, Optional, Tuple
+
+from utr_protocol import ACK, COMMANDS, NACK, Frame, FrameReceiver
+from utr_responses import FrequencyChannel, InventoryTag, Nack, OutputPower, RomVersion, parse_inventory_tags
+
+
+class UtrResponseError(Exception):
+    """
+    リーダライタからNACK応答、または想定外の応答を受信したときの例外。
+
+    Attributes:
+        response (bytes): 受信した応答フレーム。
+    """
+
+    def __init__(self, message: str, response: bytes = b'') -> None:
+        super().__init__(message)
+        self.response = response
+
+
+class UtrProtocol(asyncio.Protocol):
+    """
+    STX/ADD/CMD/LEN フレームを解析する asyncio プロトコル。
+    request_frames()で送信したコマンドに対し、ACK/NACKを受信するまでの
+    確認済みのフレームを返す (`communicate_frames()` と同じ戻り値)。
+    request()はそれを連結して返す (`communicate()` と同じ戻り値)。
+    """
+
+    def __init__(self) -> None:
+        self._transport: Optional[asyncio.Transport] = None
+        self._receiver = FrameReceiver()    # 受信バイトを一時的に保持するバッファ
+        self._frames: List[Frame] = []      # 解析後の正常レスポンス
+        self._waiter: Optional[asyncio.Future] = None
+        self._lock = asyncio.Lock()         # 1台のリーダライタには1コマンドずつ送信
+        self._closed: Optional[asyncio.Future] = None
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self._transport = transport  # type: ignore[assignment]
+        self._closed = asyncio.get_running_loop().create_future()
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self._transport = None
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_exception(exc or ConnectionError("接続が切断されました"))
+        if self._closed is not None and not self._closed.done():
+            self._closed.set_result(None)
+
+    def data_received(self, data: bytes) -> None:
+        self._receiver.feed(data)
+        for frame in self._receiver.frames():
+            # 応答待ちのコマンドが無いときに届いたフレームは破棄する
+            if self._waiter is None or self._waiter.done():
+                continue
+
+            self._frames.append(frame)
+            # ACK, NACK受信していたら応答を返す
+            if frame.is_end():
+                self._waiter.set_result(self._frames)
+
+    async def request_frames(self, command: bytes, timeout: float = 1.0) -> List[Frame]:
+        """
+        コマンドを送信し、ACK/NACKを受信するまでの応答フレームを返す。
+
+        Args:
+            command (bytes): 送信するコマンドバイト列。
+            timeout (float): 受信タイムアウト時間（秒）。
+
+        Returns:
+            List[Frame]: 受信した確認済みのフレーム。ACK/NACKを受信した場合は、最後がACK/NACK。
+                         タイムアウトした場合は、それまでに受信したフレームのみ。
+        """
+        async with self._lock:
+            if self._transport is None:
+                raise ConnectionError("接続されていません")
+
+            self._receiver.clear()
+            self._frames = []
+            self._waiter = asyncio.get_running_loop().create_future()
+            # コマンド送信 (上位 -> RW)
+            self._transport.write(command)
+            try:
+                return await asyncio.wait_for(asyncio.shield(self._waiter), timeout)
+            except asyncio.TimeoutError:
+                return self._frames
+            finally:
+                self._waiter = None
+
+    async def request(self, command: bytes, timeout: float = 1.0) -> bytes:
+        """
+        コマンドを送信し、ACK/NACKを受信するまでの応答を返す。
+
+        Args:
+            command (bytes): 送信するコマンドバイト列。
+            timeout (float): 受信タイムアウト時間（秒）。
+
+        Returns:
+            bytes: 受信した完全な応答フレームのバイト列。
+                   タイムアウトした場合は、それまでに受信した正常なフレームのみ。
+        """
+        return b''.join([frame.raw for frame in await self.request_frames(command, timeout)])
+
+    def close(self) -> None:
+        """接続を閉じる。"""
+        if self._transport is not None:
+            self._transport.close()
+
+    async def wait_closed(self) -> None:
+        """接続が閉じられるまで待つ。"""
+        if self._closed is not None:
+            await self._closed
+
+
+class AsyncUtrClient:
+    """
+    UtrProtocol を使ってリーダライタのコマンドを実行するクライアント。
+    各メソッドはNACKや応答なしの場合に UtrResponseError を送出する。
+    """
+
+    def __init__(self, protocol: UtrProtocol, name: str = '') -> None:
+        self.protocol = protocol
+        self.name = name
+
+    async def execute_frames(self, command: bytes, timeout: float = 1.0) -> List[Frame]:
+        """
+        コマンドを送信し、ACK応答を確認してから応答のフレームを返す。
+
+        Args:
+            command (bytes): 送信するコマンドバイト列。
+            timeout (float): 受信タイムアウト時間（秒）。
+
+        Returns:
+            List[Frame]: ACKまでの応答フレーム (最後のフレームがACK)。
+        """
+        frames = await self.protocol.request_frames(command, timeout)
+        # ACK/NACKは応答の最後のフレーム
+        if frames and frames[-1].command == NACK[0]:
+            raise UtrResponseError(f"{self.name}: {Nack(frames[-1].raw).message}",
+                                   b''.join([frame.raw for frame in frames]))
+        if not frames or frames[-1].command != ACK[0]:
+            raise UtrResponseError(f"{self.name}: ACK/NACK なし", b''.join([frame.raw for frame in frames]))
+        return frames
+
+    async def execute(self, command: bytes, timeout: float = 1.0) -> bytes:
+        """
+        コマンドを送信し、ACK応答を確認してから応答全体を返す。
+
+        Args:
+            command (bytes): 送信するコマンドバイト列。
+            timeout (float): 受信タイムアウト時間（秒）。
+
+        Returns:
+            bytes: ACKまでの応答フレームのバイト列。
+        """
+        return b''.join([frame.raw for frame in await self.execute_frames(command, timeout)])
+
+    async def rom_version(self) -> bytes:
+        """ROMバージョンを読み取り、ACK応答のデータ部(詳細コマンドより後)を返す。"""
+        frames = await self.execute_frames(COMMANDS['ROM_VERSION_CHECK'])
+        return RomVersion(frames[-1].raw).version
+
+    async def set_command_mode(self) -> None:
+        """リーダライタをコマンドモードに切り替える。"""
+        await self.execute(COMMANDS['COMMAND_MODE_SET'])
+
+    async def read_output_power(self) -> float:
+        """送信出力値（dBm）を読み取る。"""
+        frames = await self.execute_frames(COMMANDS['UHF_READ_OUTPUT_POWER'])
+        return OutputPower(frames[-1].raw).dbm
+
+    async def read_frequency_channel(self) -> Tuple[int, Optional[float]]:
+        """送信周波数チャンネル番号と、対応する周波数（MHz、不明ならNone）を読み取る。"""
+        frames = await self.execute_frames(COMMANDS['UHF_READ_FREQ_CH'])
+        response = FrequencyChannel(frames[-1].raw)
+        return response.channel, response.frequency
+
+    async def buzzer(self, pattern: str = 'pi') -> None:
+        """ブザーを鳴らす ('pi': ピー, 'pipipi': ピッピッピ)。"""
+        await self.execute(COMMANDS['UHF_BUZZER_' + pattern])
+
+    async def inventory_tags(self, timeout: float = 1.0) -> Tuple[List[InventoryTag], Optional[int]]:
+        """
+        インベントリを実行し、parse_inventory_tags()の結果を返す。
+
+        Returns:
+            Tuple[List[InventoryTag], Optional[int]]: 読み取ったタグ (PC+UII, RSSI, ANGLE)、期待される読み取り枚数。
+        """
+        frames = await self.protocol.request_frames(COMMANDS['UHF_INVENTORY'], timeout)
+        return parse_inventory_tags(frames)
+
+    async def inventory(self, timeout: float = 1.0) -> Tuple[List[bytes], List[float], Optional[int]]:
+        """
+        インベントリを実行し、parse_inventory_frames()と同じ形式で結果を返す。
+
+        Returns:
+            Tuple[List[bytes], List[float], Optional[int]]:
+                PC+UIIリスト、RSSIリスト、期待される読み取り枚数。
+        """
+        tags, expected_count = await self.inventory_tags(timeout)
+        return [tag.pc_uii for tag in tags], [tag.rssi for tag in tags], expected_count
+
+    def close(self) -> None:
+        """接続を閉じる。"""
+        self.protocol.close()
+
+
+# シリアルポートに接続する (pyserial-asyncio が必要)
+async def open_serial_client(port: str, baud_rate: int = 19200) -> AsyncUtrClient:
+    """
+    シリアルポートに接続し、AsyncUtrClient を返す。
+    pty のデバイスパスや、pyserialのURL (socket://host:port など) も指定できる。
+
+    Args:
+        port (str): ポート名 (例: 'COM3', '/dev/ttyUSB0')。
+        baud_rate (int): ボーレート。
+    """
+    try:
+        import serial_asyncio
+    except ImportError as e:
+        raise ImportError("シリアルポートへの接続には pyserial-asyncio が必要です"
+                          " (pip install pyserial-asyncio)") from e
+
+    loop = asyncio.get_running_loop()
+    _, protocol = await serial_asyncio.create_serial_connection(loop, UtrProtocol, port, baudrate=baud_rate)
+    return AsyncUtrClient(protocol, port)
+
+
+# ソケットに接続する (疑似リーダライタ、シリアル-LAN変換器など)
+async def open_socket_client(host: str, port: int) -> AsyncUtrClient:
+    """
+    TCPソケットに接続し、AsyncUtrClient を返す。
+
+    Args:
+        host (str): 接続先ホスト名。
+        port (int): 接続先ポート番号。
+    """
+    loop = asyncio.get_running_loop()
+    _, protocol = await loop.create_connection(UtrProtocol, host, port)
+    return AsyncUtrClient(protocol, f"{host}:{port}")
+
+
+# 複数台のリーダライタで同時にインベントリを実行
+async def run_inventory(clients: List[AsyncUtrClient], repeat_count: int) -> None:
+    """
+    接続済みの全リーダライタで、repeat_count 回インベントリを同時に実行し結果を表示する。
+
+    Args:
+        clients (List[AsyncUtrClient]): 接続済みのクライアント。
+        repeat_count (int): 繰り返し回数。
+    """
+    async def inventory_loop(client: AsyncUtrClient) -> int:
+        total_read_count = 0
+        for _ in range(repeat_count):
+            pc_uii_list, _, _ = await client.inventory()
+            for pc_uii in pc_uii_list:
+                print(f"[{client.name}] PC+UII: {pc_uii.hex().upper()}")
+            total_read_count += len(pc_uii_list)
+        return total_read_count
+
+    counts = await asyncio.gather(*(inventory_loop(client) for client in clients))
+    for client, count in zip(clients, counts):
+        print(f"[{client.name}] 合計読み取り枚数: {count} 枚")
+
+
+async def _main(ports: List[str], baud_rate: int, repeat_count: int) -> None:
+    clients = await asyncio.gather(*(open_serial_client(port, baud_rate) for port in ports))
+    try:
+        for client in clients:
+            print(f"[{client.name}] ROMバージョン: {(await client.rom_version()).hex()}")
+            await client.set_command_mode()
+        await run_inventory(list(clients), repeat_count)
+    finally:
+        for client in clients:
+            client.close()
+
+
+def main() -> None:
+    """複数のシリアルポートを指定して、同時にインベントリを実行する。"""
+    parser = argparse.ArgumentParser(description="複数台のUTRで同時にインベントリを実行します")
+    parser.add_argument('ports', nargs='+', help="シリアルポート (例: COM3 COM4)")
+    parser.add_argument('--baud', type=int, default=19200, help="ボーレート (デフォルト: 19200)")
+    parser.add_argument('--repeat', type=int, default=10, help="繰り返し回数 (デフォルト: 10)")
+    args = parser.parse_args()
+    asyncio.run(_main(args.ports, args.baud, args.repeat))
+
+
+if __name__ == '__main__':
+    main()
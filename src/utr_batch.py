@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+UTR-S201 シリーズ 受信データ一括解析モジュール（無保証）
+
+【概要】
+記録した受信データ(キャプチャ)をまとめて解析し、フレームごとの情報を
+列ごとの配列(カラム形式)で返す。`received_data_parse()` のように1フレームずつ
+リストへ追加するのではなく、フレーム位置の探索とSUM値の確認をまとめて行う。
+
+【処理の流れ】
+1. STXとデータ長からフレームの候補(開始位置, 終了位置)を順に求める (ETX, CRも確認)
+2. 候補のSUM値をまとめて確認する
+   NumPyがあれば、バッファ全体の累積和(mod 256)から全候補を一度に計算する
+3. SUM値が正しくない候補があれば、その先頭の次のバイトから次の候補の先頭までの範囲だけを
+   探し直す (後ろの候補はそのまま使い、確認し直さない)。探し直したフレームが次の候補と重なった
+   場合のみ、そのフレームの後ろから探し直す (FrameReceiver と同じフレームを返すため)
+4. コマンド、RSSI、ANGLE、PC+UIIの位置・長さを列ごとの配列に格納する
+   (NumPyがあれば、全フレーム分をまとめて取り出す)
+
+【使用例】
+    frames = parse_capture_file('capture.bin')      # 生バイト列のファイル
+    frames = parse_capture_log('capture.utrcap')    # utr_capture の記録ファイル
+    for i in frames.inventory_indexes():
+        print(frames.pc_uii(i).hex().upper(), frames.rssi[i] / 10.0)
+
+【前提】
+- NumPyは任意です。インストールされていない場合は標準ライブラリのみで解析します。
+"""
+
+import mmap
+import os
+
+from array  import array
+from bisect import bisect_right
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from utr_capture    import load_received_data
+from utr_protocol import (ANGLE_LOCATION, CMD_LOCATION, CR, DETAIL_LOCATION, ETX, FOOTER_LENGTH, HEADER_LENGTH, INV,
+                          PC_UII_LEN_LOCATION, PC_UII_LOCATION, RSSI_LOCATION, STX)
+
+try:
+    import numpy as np
+except ImportError:  # NumPyが無い場合は標準ライブラリのみで解析
+    np = None
+
+
+# SUM値をまとめて確認する候補の数
+VERIFY_BATCH_SIZE = 65536
+
+
+class CaptureFrames:
+    """
+    一括解析したフレームの情報 (列ごとの配列)。
+    i番目の要素が、i番目の正常なフレームに対応する。
+    インベントリ応答(0x6C)以外のフレームと、PC+UIIのバイト数がデータ長と合わない0x6Cのフレーム
+    (inventory_pc_uii_length() と同じ条件) では、RSSI以降の列は0となる。
+
+    Attributes:
+        buffer: 解析したバッファ (PC+UIIはこのバッファを参照する)。
+        offset (array): フレームの開始位置。
+        command (array): コマンド。
+        detail (array): 詳細コマンド (データ部が無い場合は0)。
+        rssi (array): RSSI値 (符号付き16ビット、0.1dBm単位)。
+        angle (array): ANGLEの値。
+        pc_uii_offset (array): PC+UIIの開始位置。
+        pc_uii_length (array): PC+UIIのバイト数。
+        timestamp (array): 受信時刻 (時刻情報が無い場合は0.0)。
+        sum_errors (int): SUM値が正しくなかったフレーム候補の数。
+        discarded_bytes (int): フレームとして解析できなかったバイト数。
+    """
+
+    __slots__ = ('buffer', 'offset', 'command', 'detail', 'rssi', 'angle',
+                 'pc_uii_offset', 'pc_uii_length', 'timestamp', 'sum_errors', 'discarded_bytes')
+
+    def __init__(self, buffer) -> None:
+        self.buffer = buffer
+        self.offset = array('Q')
+        self.command = array('B')
+        self.detail = array('B')
+        self.rssi = array('h')
+        self.angle = array('B')
+        self.pc_uii_offset = array('Q')
+        self.pc_uii_length = array('B')
+        self.timestamp = array('d')
+        self.sum_errors = 0
+        self.discarded_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self.offset)
+
+    def pc_uii(self, index: int) -> bytes:
+        """index番目のフレームのPC+UIIデータを返す。"""
+        start = self.pc_uii_offset[index]
+        return bytes(self.buffer[start:start + self.pc_uii_length[index]])
+
+    def inventory_indexes(self) -> Iterator[int]:
+        """インベントリ応答(0x6C)のフレームの番号を順に返す (PC+UIIのバイト数がデータ長と合わないフレームを除く)。"""
+        inv = INV[0]
+        pc_uii_offset = self.pc_uii_offset
+        return (i for i, command in enumerate(self.command) if command == inv and pc_uii_offset[i])
+
+    def as_numpy(self) -> dict:
+        """
+        各列をNumPy配列(コピーなし)に変換した辞書を返す。
+
+        Returns:
+            dict: 列名とNumPy配列の辞書。
+        """
+        if np is None:
+            raise ImportError("as_numpy() には NumPy が必要です (pip install numpy)")
+        return {name: np.frombuffer(getattr(self, name), dtype=getattr(self, name).typecode)
+                for name in ('offset', 'command', 'detail', 'rssi', 'angle',
+                             'pc_uii_offset', 'pc_uii_length', 'timestamp')}
+
+
+# フレームの候補を探す (STX, データ長, ETX, CRのみ確認)
+def _find_frame_candidates(buffer, position: int, end: int, limit: int,
+                           buffer_end: Optional[int] = None) -> Tuple[List[Tuple[int, int]], int]:
+    """
+    position から end までの範囲で始まるフレームの候補を、最大 limit 個探す。
+    受信データは buffer_end (省略時は end) で終わっているものとし、データ長が buffer_end を越えるSTXは
+    読み飛ばす。フレームは buffer_end までに収まっていればよく、end を越える候補が見つかった場合は
+    その候補で探索を終える (SUM値が違った候補の後ろを探し直す場合、次の候補と重なることがある)。
+
+    Returns:
+        Tuple[List[Tuple[int, int]], int]:
+            - 候補の (開始位置, 終了位置) のリスト。
+            - 次の探索開始位置 (end を越える候補で終えた場合は、その終了位置)。
+    """
+    candidates: List[Tuple[int, int]] = []
+    if buffer_end is None:
+        buffer_end = end
+    etx = ETX[0]
+    cr = CR[0]
+    frame_overhead = HEADER_LENGTH + FOOTER_LENGTH
+
+    stx = STX[0]
+    append = candidates.append
+
+    while len(candidates) < limit:
+        # 正常なデータでは、前のフレームの直後が次のフレームのSTXとなる
+        if position < end and buffer[position] == stx:
+            start = position
+        else:
+            start = buffer.find(STX, position, end)
+        if start < 0:
+            position = end
+            break
+
+        if buffer_end - start < HEADER_LENGTH:
+            position = buffer_end
+            break
+        frame_end = start + buffer[start + HEADER_LENGTH - 1] + frame_overhead
+        if frame_end > buffer_end:
+            # 受信データの終わりを越えるため、フレームではない (先頭バイトを読み飛ばし、再同期を試みる)
+            position = start + 1
+            continue
+
+        if buffer[frame_end - 1] == cr and buffer[frame_end - FOOTER_LENGTH] == etx:
+            append((start, frame_end))
+            position = frame_end
+            if frame_end > end:
+                break
+        else:
+            # ETX, CRが違ったので先頭バイトを読み飛ばし、再同期を試みる
+            position = start + 1
+
+    return candidates, position
+
+
+# フレーム候補のSUM値をまとめて確認し、不一致となった候補の番号を返す
+def _sum_errors(buffer, candidates: List[Tuple[int, int]]) -> List[int]:
+    """
+    候補のSUM値をまとめて確認する。
+
+    Returns:
+        List[int]: SUM値が一致しなかった候補の番号 (昇順)。全て一致した場合は空のリスト。
+    """
+    if not candidates:
+        return []
+
+    if np is not None:
+        first = candidates[0][0]
+        last = candidates[-1][1]
+        window = np.frombuffer(buffer, dtype=np.uint8, count=last - first, offset=first)
+        # 累積和(mod 256): prefix[i] = window[:i]の合計の下位1バイト
+        prefix = np.zeros(len(window) + 1, dtype=np.uint8)
+        np.cumsum(window, dtype=np.uint8, out=prefix[1:])
+        spans = np.array(candidates, dtype=np.int64) - first
+        starts = spans[:, 0]
+        sum_locations = spans[:, 1] - 2
+        calculated = prefix[sum_locations] - prefix[starts]   # uint8 の引き算は mod 256
+        return np.flatnonzero(calculated != window[sum_locations]).tolist()
+
+    with memoryview(buffer) as view:
+        return [index for index, (start, frame_end) in enumerate(candidates)
+                if (sum(view[start:frame_end - 2]) & 0xFF) != view[frame_end - 2]]
+
+
+# SUM値を確認した候補を取り出し、SUM値が違った候補の範囲だけを探し直す
+def _collect_verified(frames: CaptureFrames, buffer, candidates: List[Tuple[int, int]],
+                      verified: List[Tuple[int, int]]) -> Optional[int]:
+    """
+    候補のSUM値をまとめて確認し、正しい候補を verified に追加する。
+    SUM値が違った候補は先頭バイトを読み飛ばし、次の候補の先頭までの範囲だけで探し直す
+    (後ろの候補は探し直さず、そのまま確認を続ける)。
+
+    Returns:
+        Optional[int]: 探し直す開始位置。最後の候補のSUM値が違った場合はその候補の先頭の次、
+                       探し直して見つけたフレームが次の候補と重なった場合はそのフレームの終了位置
+                       (後ろの候補は使わない)。それ以外はNone。
+    """
+    previous = 0
+    for index in _sum_errors(buffer, candidates):
+        verified.extend(candidates[previous:index])
+        frames.sum_errors += 1
+        position = candidates[index][0] + 1
+        previous = index + 1
+        if previous == len(candidates):
+            return position
+        overlap_end = _resync(frames, buffer, position, candidates[previous][0], verified)
+        if overlap_end is not None:
+            return overlap_end
+    verified.extend(candidates[previous:])
+    return None
+
+
+# SUM値が違った候補の範囲からフレームを探し直す
+def _resync(frames: CaptureFrames, buffer, position: int, end: int,
+            verified: List[Tuple[int, int]]) -> Optional[int]:
+    """
+    position から end までの範囲 (フレーム1つ分程度) で始まるフレームを探し、確認して verified に追加する。
+    FrameReceiver と同じく、フレームの長さはバッファの終わりまでで確認する。
+
+    Returns:
+        Optional[int]: 見つけたフレームが end を越えた (次の候補と重なった) 場合は、その終了位置。
+                       それ以外はNone。
+    """
+    buffer_end = len(buffer)
+    while True:
+        candidates, next_position = _find_frame_candidates(buffer, position, end, VERIFY_BATCH_SIZE, buffer_end)
+        resume = _collect_verified(frames, buffer, candidates, verified) if candidates else None
+        if resume is None:
+            return next_position if next_position > end else None
+        if resume > end:
+            return resume
+        # 最後の候補のSUMが違った場合は、その後ろ (end まで) を探し直す
+        position = resume
+
+
+# フレームの情報を列ごとの配列に格納する
+def _append_columns(frames: CaptureFrames, buffer, candidates: List[Tuple[int, int]],
+                    chunk_offsets: Optional[Sequence[int]], chunk_times: Optional[Sequence[float]]) -> None:
+    """SUM値を確認済みのフレームの情報を、frames の各列の末尾に追加する。"""
+    if not candidates:
+        return
+    if np is not None:
+        _append_columns_numpy(frames, buffer, candidates, chunk_offsets, chunk_times)
+        return
+
+    inv = INV[0]
+    for start, frame_end in candidates:
+        command = buffer[start + CMD_LOCATION]
+        frames.offset.append(start)
+        frames.command.append(command)
+        frames.detail.append(buffer[start + DETAIL_LOCATION] if frame_end - start > HEADER_LENGTH + FOOTER_LENGTH else 0)
+        # PC+UIIのバイト数の位置までデータがあり、PC+UIIがデータ部に収まるフレームのみ解析
+        if (command == inv and frame_end - start >= PC_UII_LOCATION + FOOTER_LENGTH
+                and start + PC_UII_LOCATION + buffer[start + PC_UII_LEN_LOCATION] <= frame_end - FOOTER_LENGTH):
+            rssi = (buffer[start + RSSI_LOCATION] << 8) | buffer[start + RSSI_LOCATION + 1]
+            frames.rssi.append(rssi - 0x10000 if rssi & 0x8000 else rssi)
+            frames.angle.append(buffer[start + ANGLE_LOCATION])
+            frames.pc_uii_offset.append(start + PC_UII_LOCATION)
+            frames.pc_uii_length.append(buffer[start + PC_UII_LEN_LOCATION])
+        else:
+            frames.rssi.append(0)
+            frames.angle.append(0)
+            frames.pc_uii_offset.append(0)
+            frames.pc_uii_length.append(0)
+        if chunk_offsets:
+            # フレームの先頭を含むかたまりの受信時刻
+            frames.timestamp.append(chunk_times[max(bisect_right(chunk_offsets, start) - 1, 0)])
+        else:
+            frames.timestamp.append(0.0)
+
+
+# フレームの情報を列ごとの配列に格納する (NumPy版、全フレームをまとめて処理)
+def _append_columns_numpy(frames: CaptureFrames, buffer, candidates: List[Tuple[int, int]],
+                          chunk_offsets: Optional[Sequence[int]], chunk_times: Optional[Sequence[float]]) -> None:
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    spans = np.array(candidates, dtype=np.int64)
+    starts = spans[:, 0]
+    lengths = spans[:, 1] - starts
+
+    commands = data[starts + CMD_LOCATION]
+    has_detail = lengths > HEADER_LENGTH + FOOTER_LENGTH
+    details = np.where(has_detail, data[np.where(has_detail, starts + DETAIL_LOCATION, starts)], 0)
+    # インベントリ応答(0x6C)かつ、PC+UIIの長さまで含むフレームのみ解析
+    is_inventory = (commands == INV[0]) & (lengths >= PC_UII_LOCATION + FOOTER_LENGTH)
+    base = np.where(is_inventory, starts, 0)
+    last = len(data) - 1
+
+    def take(location: int):
+        # インベントリ応答以外のフレームは先頭(位置0)付近を参照するため、範囲外にならないよう制限
+        return data[np.minimum(base + location, last)]
+
+    # PC+UIIがデータ部に収まらないフレームも除く (inventory_pc_uii_length() と同じ条件)
+    is_inventory &= take(PC_UII_LEN_LOCATION).astype(np.int64) + (PC_UII_LOCATION + FOOTER_LENGTH) <= lengths
+
+    rssi = ((take(RSSI_LOCATION).astype(np.uint16) << 8) | take(RSSI_LOCATION + 1)).view(np.int16)
+
+    frames.offset.frombytes(starts.astype(np.uint64).tobytes())
+    frames.command.frombytes(commands.tobytes())
+    frames.detail.frombytes(details.astype(np.uint8).tobytes())
+    frames.rssi.frombytes(np.where(is_inventory, rssi, 0).astype(np.int16).tobytes())
+    frames.angle.frombytes(np.where(is_inventory, take(ANGLE_LOCATION), 0).astype(np.uint8).tobytes())
+    frames.pc_uii_offset.frombytes(np.where(is_inventory, starts + PC_UII_LOCATION, 0).astype(np.uint64).tobytes())
+    frames.pc_uii_length.frombytes(np.where(is_inventory, take(PC_UII_LEN_LOCATION), 0).astype(np.uint8).tobytes())
+    if chunk_offsets:
+        chunk_index = np.maximum(np.searchsorted(np.asarray(chunk_offsets), starts, side='right') - 1, 0)
+        frames.timestamp.frombytes(np.asarray(chunk_times, dtype=np.float64)[chunk_index].tobytes())
+    else:
+        frames.timestamp.frombytes(np.zeros(len(starts), dtype=np.float64).tobytes())
+
+
+# 受信データ(キャプチャ)を一括解析する
+def parse_capture(buffer, chunk_offsets: Optional[Sequence[int]] = None,
+                  chunk_times: Optional[Sequence[float]] = None) -> CaptureFrames:
+    """
+    受信データのバッファ全体からフレームを探し、SUM値をまとめて確認して
+    列ごとの配列(CaptureFrames)に格納する。
+
+    Args:
+        buffer: 受信データ (bytes, bytearray, mmap など、find()と添字アクセスができるもの)。
+        chunk_offsets (Optional[Sequence[int]]): 受信したかたまりの開始位置 (昇順)。
+        chunk_times (Optional[Sequence[float]]): 受信したかたまりの受信時刻 (chunk_offsetsと同じ順)。
+
+    Returns:
+        CaptureFrames: 解析結果。
+    """
+    frames = CaptureFrames(buffer)
+    position = 0
+    end = len(buffer)
+    frame_bytes = 0   # 正常なフレームのバイト数の合計
+
+    while position < end:
+        candidates, next_position = _find_frame_candidates(buffer, position, end, VERIFY_BATCH_SIZE)
+        if not candidates:
+            break
+
+        verified: List[Tuple[int, int]] = []
+        resume = _collect_verified(frames, buffer, candidates, verified)
+        _append_columns(frames, buffer, verified, chunk_offsets, chunk_times)
+        frame_bytes += sum(frame_end for _, frame_end in verified) - sum(start for start, _ in verified)
+        # 最後の候補のSUMが違った場合などは、resume から探し直す
+        position = next_position if resume is None else resume
+
+    # 正常なフレーム以外のバイト (再同期で読み飛ばしたバイトと、最後の途中で切れたフレーム)
+    frames.discarded_bytes = end - frame_bytes
+    return frames
+
+
+# 受信データのファイルをメモリマップして一括解析する
+def parse_capture_file(path: str) -> CaptureFrames:
+    """
+    受信データ(生バイト列)のファイルをメモリマップし、parse_capture()で一括解析する。
+    ファイル全体を読み込まないため、大きなファイルでもメモリ使用量を抑えられる。
+
+    Args:
+        path (str): 受信データのファイル名。
+
+    Returns:
+        CaptureFrames: 解析結果 (bufferはメモリマップしたファイル)。
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return parse_capture(b'')
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return parse_capture(buffer)
+
+
+# 通信記録ファイル(utr_capture)の受信データを一括解析する
+def parse_capture_log(path: str) -> CaptureFrames:
+    """
+    utr_capture の記録ファイルから受信データを取り出し、parse_capture()で一括解析する。
+    timestamp 列には、フレームの先頭を受信した時刻 (time.time()換算) が入る。
+
+    Args:
+        path (str): 記録ファイル名。
+
+    Returns:
+        CaptureFrames: 解析結果。
+    """
+    data, chunk_offsets, chunk_times = load_received_data(path)
+    return parse_capture(data, chunk_offsets, chunk_times)
@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+UTR-S201 シリーズ 通信記録(キャプチャ)・再生モジュール（無保証）
+
+【概要】
+現場で発生した不具合 (「タグの読み取り数とpc_uii_listの個数が一致しません」など) を
+リーダライタ無しで再現するため、シリアル通信の生データを記録・再生する。
+
+- CaptureSerial : シリアル通信オブジェクトを包み、送受信データを記録ファイルへ追記する。
+                  communicate() や utr_stream などにそのまま渡せる。
+- ReplaySerial  : 記録ファイルをメモリマップし、シリアル通信オブジェクトの代わりに
+                  受信データを返す。全速 または 記録時のタイミングで再生できる。
+- iter_capture  : 記録ファイルのレコードを、コピーせずに順に返す。
+
+【記録ファイルの形式】 (数値はリトルエンディアン)
+- ヘッダー (24バイト)
+    マジック        8バイト  b'UTRCAP1\\x00'
+    記録開始時刻    8バイト  time.time() (double)
+    記録開始時刻    8バイト  time.monotonic_ns() (uint64)
+- レコード (13バイト + データ長) の繰り返し
+    方向            1バイト  0: 受信 (RW -> 上位)、1: 送信 (上位 -> RW)、2: 記録の再開
+    時刻            8バイト  time.monotonic_ns() (uint64)
+    データ長        4バイト  (uint32)
+    データ          データ長バイト
+- 記録の再開レコードのデータ (16バイト)
+    既存の記録ファイルへ追記した場合に、追記を始めた時点で1つ書き込む。
+    time.monotonic_ns() は起動ごとに基準が異なるため、以降のレコードの時刻はこの基準で換算する。
+    記録開始時刻    8バイト  time.time() (double)
+    記録開始時刻    8バイト  time.monotonic_ns() (uint64)
+
+【使用例】
+    # 記録
+    with CaptureWriter('capture.utrcap') as writer:
+        ser = CaptureSerial(serial.Serial(port, baud_rate, timeout=0), writer)
+        result = communicate(ser, COMMANDS['UHF_INVENTORY'])
+
+    # 再生 (送信したコマンドごとに、記録した応答を返す)
+    ser = ReplaySerial('capture.utrcap')
+    result = communicate(ser, COMMANDS['UHF_INVENTORY'])
+"""
+
+import mmap
+import os
+import struct
+import threading
+import time
+
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+
+CAPTURE_MAGIC = b'UTRCAP1\x00'
+HEADER_FORMAT = struct.Struct('<8sdQ')   # マジック, 記録開始時刻(time.time), 記録開始時刻(monotonic_ns)
+RECORD_FORMAT = struct.Struct('<BQI')    # 方向, 時刻(monotonic_ns), データ長
+SESSION_FORMAT = struct.Struct('<dQ')    # 記録開始時刻(time.time), 記録開始時刻(monotonic_ns)
+
+DIRECTION_RX = 0        # 受信 (RW -> 上位)
+DIRECTION_TX = 1        # 送信 (上位 -> RW)
+DIRECTION_SESSION = 2   # 記録の再開 (追記を始めた時点の基準時刻)
+
+
+class CaptureRecord(NamedTuple):
+    """
+    記録ファイルの1レコード。
+
+    Attributes:
+        direction (int): DIRECTION_RX、DIRECTION_TX または DIRECTION_SESSION。
+        timestamp_ns (int): 記録時刻 (time.monotonic_ns())。
+        data (memoryview): 送受信データ (記録ファイルを参照、コピーなし)。
+            DIRECTION_SESSION の場合は SESSION_FORMAT の基準時刻。
+    """
+    direction: int
+    timestamp_ns: int
+    data: memoryview
+
+
+class CaptureWriter:
+    """
+    送受信データを記録ファイルへ追記する。
+    複数のスレッドから呼び出しても、レコードが混ざらないように書き込む。
+    既存の記録ファイルへ追記する場合は、記録の再開レコード (基準時刻) を書き込んでから追記する。
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'ab')
+        start_time, start_ns = time.time(), time.monotonic_ns()
+        if self._file.tell() == 0:
+            self._file.write(HEADER_FORMAT.pack(CAPTURE_MAGIC, start_time, start_ns))
+            return
+        with open(path, 'rb') as f:
+            magic = f.read(len(CAPTURE_MAGIC))
+        if magic != CAPTURE_MAGIC:
+            self._file.close()
+            raise ValueError(f"記録ファイルではないため追記できません: {path}")
+        # 前回の記録とは monotonic_ns() の基準が異なるため、ここからの基準時刻を残す
+        self._file.write(RECORD_FORMAT.pack(DIRECTION_SESSION, start_ns, SESSION_FORMAT.size))
+        self._file.write(SESSION_FORMAT.pack(start_time, start_ns))
+
+    def record(self, direction: int, data: bytes) -> None:
+        """
+        送受信データを1レコードとして追記する。
+
+        Args:
+            direction (int): DIRECTION_RX または DIRECTION_TX。
+            data (bytes): 送受信データ。
+        """
+        if not data:
+            return
+        header = RECORD_FORMAT.pack(direction, time.monotonic_ns(), len(data))
+        with self._lock:
+            self._file.write(header)
+            self._file.write(data)
+
+    def flush(self) -> None:
+        """書き込み途中のデータをファイルへ出力する。"""
+        with self._lock:
+            self._file.flush()
+
+    def close(self) -> None:
+        """記録ファイルを閉じる。"""
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self) -> 'CaptureWriter':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class CaptureSerial:
+    """
+    シリアル通信オブジェクトを包み、write()した送信データと、read()した受信データを
+    CaptureWriterへ記録する。その他の属性・メソッドは元のオブジェクトへそのまま渡す。
+    """
+
+    def __init__(self, ser, writer: CaptureWriter) -> None:
+        self.__dict__['_ser'] = ser
+        self.__dict__['_writer'] = writer
+
+    def write(self, data: bytes) -> Optional[int]:
+        self._writer.record(DIRECTION_TX, bytes(data))
+        return self._ser.write(data)
+
+    def read(self, size: int = 1) -> bytes:
+        data = self._ser.read(size)
+        self._writer.record(DIRECTION_RX, data)
+        return data
+
+    def __getattr__(self, name: str):
+        return getattr(self._ser, name)
+
+    def __setattr__(self, name: str, value) -> None:
+        # timeout などの設定は元のシリアル通信オブジェクトへ反映する
+        setattr(self._ser, name, value)
+
+
+# 記録ファイルを開き、メモリマップを返す
+def open_capture(path: str) -> Tuple[mmap.mmap, float, int]:
+    """
+    記録ファイルをメモリマップで開く。
+
+    Args:
+        path (str): 記録ファイル名。
+
+    Returns:
+        Tuple[mmap.mmap, float, int]: メモリマップ、記録開始時刻(time.time)、記録開始時刻(monotonic_ns)。
+
+    Raises:
+        ValueError: 記録ファイルの形式が正しくない場合。
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < HEADER_FORMAT.size:
+            raise ValueError(f"記録ファイルではありません: {path}")
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, start_time, start_ns = HEADER_FORMAT.unpack_from(buffer, 0)
+    if magic != CAPTURE_MAGIC:
+        buffer.close()
+        raise ValueError(f"記録ファイルではありません: {path}")
+    return buffer, start_time, start_ns
+
+
+# 記録ファイルのレコードを順に返す
+def iter_capture(buffer: mmap.mmap) -> Iterator[CaptureRecord]:
+    """
+    メモリマップした記録ファイルのレコードを、データをコピーせずに順に返す。
+    書き込み途中で終わっている最後のレコードは無視する。
+
+    Args:
+        buffer (mmap.mmap): open_capture() で開いた記録ファイル。
+
+    Yields:
+        CaptureRecord: 記録ファイルのレコード。
+    """
+    view = memoryview(buffer)
+    position = HEADER_FORMAT.size
+    end = len(buffer)
+    while position + RECORD_FORMAT.size <= end:
+        direction, timestamp_ns, length = RECORD_FORMAT.unpack_from(buffer, position)
+        position += RECORD_FORMAT.size
+        if position + length > end:
+            break
+        yield CaptureRecord(direction, timestamp_ns, view[position:position + length])
+        position += length
+
+
+# 受信データのみを連結して返す (一括解析用)
+def load_received_data(path: str) -> Tuple[bytes, List[int], List[float]]:
+    """
+    記録ファイルの受信データを連結し、各レコードの開始位置と受信時刻とともに返す。
+    utr_batch.parse_capture() の引数としてそのまま使える。
+
+    Args:
+        path (str): 記録ファイル名。
+
+    Returns:
+        Tuple[bytes, List[int], List[float]]:
+            連結した受信データ、各レコードの開始位置、各レコードの受信時刻 (time.time()換算)。
+    """
+    buffer, start_time, start_ns = open_capture(path)
+    data = bytearray()
+    offsets: List[int] = []
+    times: List[float] = []
+    records = iter_capture(buffer)
+    record = None
+    try:
+        for record in records:
+            if record.direction == DIRECTION_SESSION:
+                start_time, start_ns = SESSION_FORMAT.unpack(record.data)
+                continue
+            if record.direction != DIRECTION_RX:
+                continue
+            offsets.append(len(data))
+            times.append(start_time + (record.timestamp_ns - start_ns) / 1e9)
+            data += record.data
+    finally:
+        # メモリマップを参照しているデータを手放してから閉じる
+        record = None
+        records.close()
+        buffer.close()
+    return bytes(data), offsets, times
+
+
+class ReplaySerial:
+    """
+    記録ファイルの受信データを返す、シリアル通信オブジェクトの代わり。
+
+    follow_commands=True の場合、記録された送信データ(コマンド)ごとに区切り、
+    write()が呼ばれるたびに、次のコマンドに続く受信データを返す。
+    realtime=True の場合、コマンド送信(または再生開始)からの経過時間が
+    記録時と同じになるまで受信データを返さない (speed で再生速度を変更可)。
+    記録の再開レコードの後は、そこから再び経過時間を数える。
+
+    Attributes:
+        timeout (Optional[float]): read()のタイムアウト時間（秒）。pyserialと同じ扱い。
+        command_mismatches (int): write()されたデータが記録された送信データと異なった回数。
+    """
+
+    def __init__(self, path: str, realtime: bool = False, speed: float = 1.0,
+                 follow_commands: bool = True, timeout: Optional[float] = 0) -> None:
+        self._buffer, _, _ = open_capture(path)
+        self._records = iter_capture(self._buffer)
+        self._next: Optional[CaptureRecord] = None  # 先読みしたレコード
+        self._pending = memoryview(b'')             # 返していない受信データ
+        self._pending_due = 0.0                     # _pending を返せるようになる時刻
+        self._writes: List[bytes] = []              # まだ記録と照合していない送信データ
+        self._base_wall = time.monotonic()          # 再生の基準時刻 (実時間)
+        self._base_ns: Optional[int] = None         # 再生の基準時刻 (記録時刻)
+        self.realtime = realtime
+        self.speed = speed
+        self.follow_commands = follow_commands
+        self.timeout = timeout
+        self.command_mismatches = 0
+        self.is_open = True
+        self._condition = threading.Condition()     # write() / close() を read() へ知らせる
+
+    def write(self, data: bytes) -> int:
+        with self._condition:
+            self._writes.append(bytes(data))
+            self._condition.notify_all()
+        return len(data)
+
+    def _peek(self) -> Optional[CaptureRecord]:
+        if self._next is None:
+            self._next = next(self._records, None)
+        return self._next
+
+    def _fill(self) -> bool:
+        """返せる受信データを _pending に用意する。用意できればTrue。"""
+        while not self._pending:
+            record = self._peek()
+            if record is None:
+                return False
+            if record.direction == DIRECTION_TX:
+                if self.follow_commands:
+                    if not self._writes:
+                        # コマンドが送信されるまで、続く受信データは返さない
+                        return False
+                    if self._writes.pop(0) != record.data:
+                        self.command_mismatches += 1
+                # コマンド送信時刻を再生の基準にする
+                self._base_wall = time.monotonic()
+                self._base_ns = record.timestamp_ns
+                self._next = None
+                continue
+            if record.direction == DIRECTION_SESSION:
+                # 前回の記録とは時刻の基準が異なるため、次のレコードから数え直す
+                self._base_wall = time.monotonic()
+                self._base_ns = None
+                self._next = None
+                continue
+            if self._base_ns is None:
+                self._base_ns = record.timestamp_ns
+            self._pending = record.data
+            self._pending_due = self._base_wall + (record.timestamp_ns - self._base_ns) / 1e9 / self.speed
+            self._next = None
+        return True
+
+    def _available(self) -> int:
+        if not self._fill():
+            return 0
+        if self.realtime and time.monotonic() < self._pending_due:
+            return 0
+        return len(self._pending)
+
+    @property
+    def in_waiting(self) -> int:
+        """今すぐ返せる受信データのバイト数。"""
+        with self._condition:
+            return self._available() if self.is_open else 0
+
+    def read(self, size: int = 1) -> bytes:
+        """
+        受信データを最大 size バイト返す。timeout の扱いは pyserial と同じ
+        (0: 待たない、None: size バイト揃うまで待つ、正の数: 最大その時間待つ)。
+        記録ファイルの終わりやコマンド送信待ちでは、記録時と同じく応答が無い状態になる
+        (timeout=None の場合は、別のスレッドから write() か close() が呼ばれるまで待つ)。
+        """
+        data = bytearray()
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        with self._condition:
+            while len(data) < size and self.is_open:
+                available = self._available()
+                if available:
+                    count = min(available, size - len(data))
+                    data += self._pending[:count]
+                    self._pending = self._pending[count:]
+                    continue
+                now = time.monotonic()
+                if deadline is not None and now >= deadline:
+                    break
+                # 受信データがあれば返せる時刻まで、無ければ write() / close() まで待つ
+                wait = self._pending_due - now if self._pending else None
+                if deadline is not None:
+                    wait = deadline - now if wait is None else min(wait, deadline - now)
+                self._condition.wait(wait)
+        return bytes(data)
+
+    def reset_input_buffer(self) -> None:
+        pass
+
+    def reset_output_buffer(self) -> None:
+        pass
+
+    def close(self) -> None:
+        """再生を終了し、記録ファイルのメモリマップを閉じる。read() で待っている場合は戻る。"""
+        with self._condition:
+            if not self.is_open:
+                return
+            self.is_open = False
+            # メモリマップを参照しているデータを手放してから閉じる
+            self._pending = memoryview(b'')
+            self._next = None
+            self._records.close()
+            self._buffer.close()
+            self._condition.notify_all()
+
+    def __enter__(self) -> 'ReplaySerial':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,525 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+UTR-S201 シリーズ 疑似リーダライタ (エミュレータ)（無保証）
+
+【概要】
+リーダライタ無しで受信処理の動作確認・負荷試験を行うための、ソフトウェアの疑似リーダライタ。
+コマンドのフレーム(STX～CR)を受け取り、プロトコルに沿った応答を返す。
+
+【対応コマンド】
+- ROMバージョンの読み取り          0x4F / 0x90
+- コマンドモードへの切り替え        0x4E
+- UHF_Inventory                    0x55 / 0x10  (N枚分の0x6Cフレーム + 読み取り枚数入りのACK)
+- UHF_GetInventoryParam            0x55 / 0x41
+- UHF_SetInventoryParam            0x55 / 0x30
+- 送信出力・周波数チャンネルの読み取り 0x55 / 0x43 (0x01: 送信出力、0x02: 周波数チャンネル)
+- UHF_Write                        0x55 / 0x16  (utr_writer.build_write_command() の並び。EPCバンクへの書き込みは
+                                                以降のインベントリのPC+UIIに反映し、他のバンクは memories に保持する)
+- ブザー制御                        0x42
+上記以外のコマンドには FORMAT_ERROR(0x44)、SUMが違うコマンドには SUM_ERROR(0x42) のNACKを返す。
+
+【接続方法】
+- EmulatedSerial : メモリ上で動作するシリアル通信オブジェクトの代わり (communicate()などにそのまま渡せる)
+- serve_pty      : 疑似端末(pty)で待ち受ける (Linux/macOS、pyserialで開けるデバイス名を返す)
+- serve_socket   : TCPソケットで待ち受ける (utr_async.open_socket_client、pyserialの socket:// で接続)
+
+【試験用の設定】
+- タグの母集団 (PC+UIIのリスト) と、各タグが1回のインベントリで読み取られる確率
+- ボーレートに合わせた送信速度 (baud_rate、Noneなら待ち時間なし)
+- 応答フレームの破損 (corruption_rate)、フレーム間へのノイズ挿入 (noise_rate)
+- NACK応答 (nack_rate、nack_codes)
+
+【使用例】
+    emulator = UtrEmulator(make_tag_population(1000))
+    ser = EmulatedSerial(emulator, baud_rate=115200)
+    result = communicate(ser, COMMANDS['UHF_INVENTORY'], timeout=10)
+
+    # 別のプログラムから接続する場合
+    python src/utr_emulator.py --pty --tags 300 --baud 115200
+"""
+
+import argparse
+import os
+import random
+import socket
+import threading
+import time
+
+from collections import deque
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+
+from utr_protocol import (ACK, ADD, BUZ, CMD_LOCATION, CR, DETAIL_GET_INVENTORY_PARAM, DETAIL_INV, DETAIL_LOCATION,
+                          DETAIL_READ_SETTING, DETAIL_ROM, DETAIL_SET_INVENTORY_PARAM, DETAIL_WRITE, ETX, INV,
+                          MEMORY_BANK_EPC, NACK, NACK_FORMAT_ERROR, NACK_LBT_ERROR, NACK_RXBUSY_ERROR, NACK_SUM_ERROR,
+                          SETTING_FREQ_CH, SETTING_OUTPUT_POWER, STX, FrameReceiver, calculate_sum_value)
+
+
+# フレームを組み立てる (応答はタグごとに内容が変わるため、キャッシュは使わない)
+def make_frame(command: int, data: bytes, address: int = ADD[0]) -> bytes:
+    """
+    コマンドとデータ部から、STX～CRのフレームを組み立てる。
+
+    Args:
+        command (int): コマンド。
+        data (bytes): データ部 (詳細コマンドを含む)。
+        address (int): アドレス。
+
+    Returns:
+        bytes: フレームのバイト列。
+    """
+    frame = bytearray((STX[0], address, command, len(data)))
+    frame += data
+    frame += ETX
+    frame.append(calculate_sum_value(frame))
+    frame += CR
+    return bytes(frame)
+
+
+# タグの母集団を作る
+def make_tag_population(count: int, seed: int = 0) -> List[bytes]:
+    """
+    PC(0x3000) + 12バイトのUIIからなる、count枚分のPC+UIIのリストを作る。
+
+    Args:
+        count (int): タグの枚数。
+        seed (int): UIIを決める乱数シード。
+
+    Returns:
+        List[bytes]: PC+UIIのリスト。
+    """
+    rng = random.Random(seed)
+    return [bytes([0x30, 0x00]) + rng.getrandbits(96).to_bytes(12, 'big') for _ in range(count)]
+
+
+class UtrEmulator:
+    """
+    コマンドを受け取り、応答を返す疑似リーダライタ。
+
+    Attributes:
+        tags (List[bytes]): タグの母集団 (PC+UIIのリスト、EPCバンクへの書き込みで書き換わる)。
+        memories (Dict[Tuple[int, int], bytearray]): EPCバンク以外に書き込んだデータ
+                                                     ((tagsの番号, メモリバンク) ごと、先頭はワードアドレス0)。
+        inventory_count (int): 実行したインベントリの回数。
+    """
+
+    def __init__(self, tags: Sequence[bytes] = (), read_probability: float = 1.0,
+                 rssi_range: Tuple[float, float] = (-70.0, -40.0), address: int = ADD[0],
+                 rom_version: bytes = b'EMU1.0', output_power: float = 25.0, channel: int = 1,
+                 inventory_params: bytes = bytes([0x00, 0x81, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00]),
+                 corruption_rate: float = 0.0, noise_rate: float = 0.0,
+                 nack_rate: float = 0.0, nack_codes: Sequence[int] = (NACK_LBT_ERROR,),
+                 seed: Optional[int] = None) -> None:
+        """
+        Args:
+            tags (Sequence[bytes]): タグの母集団 (PC+UIIのリスト)。
+            read_probability (float): 各タグが1回のインベントリで読み取られる確率。
+            rssi_range (Tuple[float, float]): RSSIの範囲（dBm）。
+            address (int): リーダライタのアドレス。
+            rom_version (bytes): ROMバージョンとして返すデータ。
+            output_power (float): 送信出力値（dBm）。
+            channel (int): 送信周波数チャンネル番号。
+            inventory_params (bytes): インベントリパラメータ (UHF_SetInventoryParamで変更される)。
+            corruption_rate (float): 応答フレームの1バイトを壊す確率 (フレームごと)。
+            noise_rate (float): フレームの前にノイズ(STX以外のバイト)を挿入する確率 (フレームごと)。
+            nack_rate (float): ACKの代わりにNACKを返す確率 (コマンドごと)。
+            nack_codes (Sequence[int]): NACKを返すときのエラーコード (ランダムに選択)。
+            seed (Optional[int]): 乱数シード (Noneなら毎回異なる)。
+        """
+        self.tags = list(tags)
+        self.memories: Dict[Tuple[int, int], bytearray] = {}
+        self.read_probability = read_probability
+        self.rssi_range = rssi_range
+        self.address = address
+        self.rom_version = rom_version
+        self.output_power = output_power
+        self.channel = channel
+        self.inventory_params = inventory_params
+        self.corruption_rate = corruption_rate
+        self.noise_rate = noise_rate
+        self.nack_rate = nack_rate
+        self.nack_codes = list(nack_codes)
+        self.inventory_count = 0
+        self._rng = random.Random(seed)
+        self._receiver = FrameReceiver()
+        self._lock = threading.Lock()
+
+    def receive(self, data: bytes) -> bytes:
+        """
+        上位機器から受信したバイト列を解析し、完全なコマンドに対する応答を返す。
+        コマンドが途中までの場合は、残りを受信したときに応答する。
+
+        Args:
+            data (bytes): 受信したバイト列。
+
+        Returns:
+            bytes: 応答のバイト列 (応答が無い場合は空)。
+        """
+        responses = bytearray()
+        with self._lock:
+            self._receiver.feed(data)
+            for frame in self._receiver.frames():
+                responses += self.respond(frame.raw)
+            # SUMが違ったコマンドには SUM_ERROR を返す
+            if self._receiver.sum_errors:
+                self._receiver.sum_errors = 0
+                responses += self._nack(0x00, NACK_SUM_ERROR)
+        return bytes(responses)
+
+    def respond(self, command: bytes) -> bytes:
+        """
+        1つのコマンド(STX～CR、確認済み)に対する応答を返す。
+
+        Args:
+            command (bytes): コマンドのフレーム。
+
+        Returns:
+            bytes: 応答のバイト列。
+        """
+        if command[1] != self.address:
+            return b''   # 他のアドレス宛てのコマンドには応答しない
+
+        cmd = command[CMD_LOCATION]
+        detail = command[DETAIL_LOCATION] if len(command) > DETAIL_LOCATION + 3 else 0
+        payload = command[DETAIL_LOCATION + 1:-3]
+
+        if self.nack_codes and self.nack_rate and self._rng.random() < self.nack_rate:
+            return self._nack(detail, self._rng.choice(self.nack_codes))
+
+        if cmd == 0x4F and detail == DETAIL_ROM[0]:
+            return self._ack(bytes([detail]) + self.rom_version)
+        if cmd == 0x4E:
+            return self._ack(bytes([detail]))
+        if cmd == BUZ[0]:
+            return self._ack(bytes([detail]))
+        if cmd == 0x55:
+            if detail == DETAIL_INV[0]:
+                return self.inventory()
+            if detail == DETAIL_GET_INVENTORY_PARAM:
+                return self._ack(bytes([detail]) + self.inventory_params)
+            if detail == DETAIL_SET_INVENTORY_PARAM:
+                self.inventory_params = bytes(payload)
+                return self._ack(bytes([detail]))
+            if detail == DETAIL_READ_SETTING and payload[:1] == bytes([SETTING_OUTPUT_POWER]):
+                power = int(round(self.output_power * 10))
+                return self._ack(bytes([detail, SETTING_OUTPUT_POWER, 0x00]) + power.to_bytes(2, 'big'))
+            if detail == DETAIL_READ_SETTING and payload[:1] == bytes([SETTING_FREQ_CH]):
+                return self._ack(bytes([detail, SETTING_FREQ_CH, 0x00, self.channel]))
+            if detail == DETAIL_WRITE:
+                error_code = self.write(payload)
+                if error_code is not None:
+                    return self._nack(detail, error_code)
+                return self._ack(bytes([detail]))
+        return self._nack(detail, NACK_FORMAT_ERROR)
+
+    def write(self, payload: bytes) -> Optional[int]:
+        """
+        UHF_Write のデータ部 (メモリバンク, ワードアドレス 3バイト, データのバイト数, データ,
+        [書き込むタグのPC+UIIのバイト数, PC+UII]) を解析し、タグに書き込む。
+        書き込むタグを指定しない場合は、母集団のいずれかのタグに書き込む (複数あれば、どれになるかは不定)。
+
+        Args:
+            payload (bytes): コマンドのデータ部 (詳細コマンドの後ろ)。
+
+        Returns:
+            Optional[int]: 書き込めなかった場合はNACKのエラーコード、書き込んだ場合はNone。
+        """
+        if len(payload) < 5:
+            return NACK_FORMAT_ERROR
+        bank = payload[0]
+        word_address = int.from_bytes(payload[1:4], 'big')
+        length = payload[4]
+        data = bytes(payload[5:5 + length])
+        target = payload[5 + length:]
+        if not length or length % 2 or len(data) != length:
+            return NACK_FORMAT_ERROR
+        if target:
+            if target[0] != len(target) - 1:
+                return NACK_FORMAT_ERROR
+            indexes = [index for index, pc_uii in enumerate(self.tags) if pc_uii == target[1:]]
+        else:
+            indexes = list(range(len(self.tags)))
+        if not indexes:
+            return NACK_RXBUSY_ERROR   # 書き込むタグが読み取り範囲に無い
+        index = indexes[0] if len(indexes) == 1 else self._rng.choice(indexes)
+
+        if bank == MEMORY_BANK_EPC:
+            # PC+UIIは、EPCバンクのワードアドレス1 (PC) から始まる
+            pc_uii = self.tags[index]
+            offset = (word_address - 1) * 2
+            if word_address < 1 or offset + length > len(pc_uii):
+                return NACK_FORMAT_ERROR
+            self.tags[index] = pc_uii[:offset] + data + pc_uii[offset + length:]
+        else:
+            memory = self.memories.setdefault((index, bank), bytearray())
+            offset = word_address * 2
+            if len(memory) < offset + length:
+                memory.extend(bytes(offset + length - len(memory)))
+            memory[offset:offset + length] = data
+        return None
+
+    def inventory(self) -> bytes:
+        """
+        インベントリの応答 (読み取ったタグの0x6Cフレーム + 読み取り枚数入りのACK) を返す。
+
+        Returns:
+            bytes: 応答のバイト列。
+        """
+        self.inventory_count += 1
+        rng = self._rng
+        low, high = int(self.rssi_range[0] * 10), int(self.rssi_range[1] * 10)
+        frames = bytearray()
+        read_count = 0
+        for pc_uii in self.tags:
+            if self.read_probability < 1.0 and rng.random() >= self.read_probability:
+                continue
+            rssi = rng.randint(low, high) & 0xFFFF
+            data = bytes([0x09, rssi >> 8, rssi & 0xFF, rng.randrange(256), len(pc_uii)]) + pc_uii
+            frames += self._inject(make_frame(INV[0], data, self.address))
+            read_count += 1
+        frames += self._ack(bytes([DETAIL_INV[0], 0x00]) + read_count.to_bytes(2, 'little'))
+        return bytes(frames)
+
+    def _ack(self, data: bytes) -> bytes:
+        return self._inject(make_frame(ACK[0], data, self.address))
+
+    def _nack(self, detail: int, code: int) -> bytes:
+        return self._inject(make_frame(NACK[0], bytes([detail, code]), self.address))
+
+    def _inject(self, frame: bytes) -> bytes:
+        """設定に応じて、フレームの破損・ノイズの挿入を行う。"""
+        rng = self._rng
+        if self.corruption_rate and rng.random() < self.corruption_rate:
+            corrupted = bytearray(frame)
+            corrupted[rng.randrange(1, len(corrupted))] ^= 1 << rng.randrange(8)
+            frame = bytes(corrupted)
+        if self.noise_rate and rng.random() < self.noise_rate:
+            noise = bytes(rng.choice((0x00, 0x0D, 0x30, 0x6C, 0xFF)) for _ in range(rng.randint(1, 8)))
+            frame = noise + frame
+        return frame
+
+
+class EmulatedSerial:
+    """
+    UtrEmulator とメモリ上で通信する、シリアル通信オブジェクトの代わり。
+    baud_rate を指定すると、応答はそのボーレートの速度で少しずつ届く。
+
+    Attributes:
+        timeout (Optional[float]): read()のタイムアウト時間（秒）。pyserialと同じ扱い。
+    """
+
+    def __init__(self, emulator: UtrEmulator, baud_rate: Optional[int] = None,
+                 response_delay: float = 0.0, timeout: Optional[float] = 0) -> None:
+        """
+        Args:
+            emulator (UtrEmulator): 疑似リーダライタ。
+            baud_rate (Optional[int]): ボーレート (Noneなら応答は即座に届く)。
+            response_delay (float): コマンド受信から応答開始までの時間（秒）。
+            timeout (Optional[float]): read()のタイムアウト時間（秒）。
+        """
+        self.emulator = emulator
+        self.baudrate = baud_rate
+        self.response_delay = response_delay
+        self.timeout = timeout
+        self.is_open = True
+        self._rx = bytearray()    # 応答データ (未読分)
+        # 応答ごとの (未読分の先頭からの終了位置, 開始時刻) ※baud_rate指定時のみ使用
+        self._segments: Deque[List[float]] = deque()
+        self._last_end_time = 0.0
+
+    def write(self, data: bytes) -> int:
+        response = self.emulator.receive(bytes(data))
+        if response:
+            if self.baudrate:
+                now = time.monotonic()
+                start = max(now + self.response_delay, self._last_end_time)
+                self._last_end_time = start + len(response) * 10 / self.baudrate
+                self._segments.append([len(self._rx) + len(response), start, len(response)])
+            self._rx += response
+        return len(data)
+
+    def _available(self) -> int:
+        if not self.baudrate:
+            return len(self._rx)
+        # 1バイト = 10ビット (スタートビット + 8ビット + ストップビット)
+        now = time.monotonic()
+        bytes_per_second = self.baudrate / 10
+        available = 0
+        for end, start, length in self._segments:
+            arrived = min(int((now - start) * bytes_per_second), int(length))
+            if arrived <= 0:
+                break
+            available = int(end) - (int(length) - arrived)
+            if arrived < length:
+                break
+        return available
+
+    def _consume(self, count: int) -> bytes:
+        data = bytes(self._rx[:count])
+        del self._rx[:count]
+        for segment in self._segments:
+            segment[0] -= count
+        while self._segments and self._segments[0][0] <= 0:
+            self._segments.popleft()
+        return data
+
+    @property
+    def in_waiting(self) -> int:
+        return self._available()
+
+    def read(self, size: int = 1) -> bytes:
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        data = bytearray()
+        while len(data) < size:
+            available = self._available()
+            if available:
+                data += self._consume(min(available, size - len(data)))
+                continue
+            now = time.monotonic()
+            if not self._rx or (deadline is not None and now >= deadline):
+                # 応答が無い場合は、タイムアウトまで待って戻る (同じスレッドからは送信されないため)
+                if not self._rx and deadline is not None and now < deadline:
+                    time.sleep(deadline - now)
+                break
+            # 次の1バイトが届くまで待機
+            time.sleep(min(10 / self.baudrate, deadline - now if deadline is not None else 1.0))
+        return bytes(data)
+
+    def reset_input_buffer(self) -> None:
+        self._rx.clear()
+        self._segments.clear()
+
+    def reset_output_buffer(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.is_open = False
+
+
+# 応答をボーレートに合わせた速度で送信する
+def _paced_send(send, data: bytes, baud_rate: Optional[int], chunk_size: int = 64) -> None:
+    if not baud_rate:
+        send(data)
+        return
+    for index in range(0, len(data), chunk_size):
+        chunk = data[index:index + chunk_size]
+        send(chunk)
+        time.sleep(len(chunk) * 10 / baud_rate)
+
+
+# 疑似端末(pty)で待ち受ける
+def serve_pty(emulator: UtrEmulator, baud_rate: Optional[int] = None) -> str:
+    """
+    疑似端末(pty)を作成し、バックグラウンドのスレッドで疑似リーダライタとして応答する。
+    Linux/macOS のみ対応。
+
+    Args:
+        emulator (UtrEmulator): 疑似リーダライタ。
+        baud_rate (Optional[int]): 応答の送信速度 (Noneなら待ち時間なし)。
+
+    Returns:
+        str: 接続するデバイス名 (例: '/dev/pts/3')。serial.Serial() でそのまま開ける。
+    """
+    import pty
+    import tty
+
+    master_fd, slave_fd = pty.openpty()
+    tty.setraw(slave_fd)
+    device = os.ttyname(slave_fd)
+
+    def run() -> None:
+        while True:
+            try:
+                data = os.read(master_fd, 4096)
+            except OSError:
+                return
+            if not data:
+                return
+            response = emulator.receive(data)
+            if response:
+                _paced_send(lambda chunk: os.write(master_fd, chunk), response, baud_rate)
+
+    threading.Thread(target=run, name='UtrEmulatorPty', daemon=True).start()
+    return device
+
+
+# TCPソケットで待ち受ける
+def serve_socket(emulator: UtrEmulator, host: str = '127.0.0.1', port: int = 0,
+                 baud_rate: Optional[int] = None) -> Tuple[socket.socket, int]:
+    """
+    TCPソケットで待ち受け、接続ごとにバックグラウンドのスレッドで疑似リーダライタとして応答する。
+
+    Args:
+        emulator (UtrEmulator): 疑似リーダライタ。
+        host (str): 待ち受けアドレス。
+        port (int): 待ち受けポート番号 (0なら空いている番号)。
+        baud_rate (Optional[int]): 応答の送信速度 (Noneなら待ち時間なし)。
+
+    Returns:
+        Tuple[socket.socket, int]: 待ち受けソケット (close()で停止) と、ポート番号。
+    """
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind((host, port))
+    server.listen()
+
+    def handle(connection: socket.socket) -> None:
+        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with connection:
+            while True:
+                try:
+                    data = connection.recv(4096)
+                except OSError:
+                    return
+                if not data:
+                    return
+                response = emulator.receive(data)
+                if response:
+                    _paced_send(connection.sendall, response, baud_rate)
+
+    def accept() -> None:
+        while True:
+            try:
+                connection, _ = server.accept()
+            except OSError:
+                return
+            threading.Thread(target=handle, args=(connection,), name='UtrEmulatorSocket', daemon=True).start()
+
+    threading.Thread(target=accept, name='UtrEmulatorAccept', daemon=True).start()
+    return server, server.getsockname()[1]
+
+
+def main() -> None:
+    """疑似リーダライタを起動し、接続先を表示して待ち受ける。"""
+    parser = argparse.ArgumentParser(description="UTR-S201 疑似リーダライタ")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--pty', action='store_true', help="疑似端末(pty)で待ち受ける")
+    group.add_argument('--socket', type=int, metavar='PORT', help="TCPソケットで待ち受ける")
+    parser.add_argument('--tags', type=int, default=30, help="タグの枚数 (デフォルト: 30)")
+    parser.add_argument('--read-probability', type=float, default=1.0, help="各タグの読み取り確率")
+    parser.add_argument('--baud', type=int, default=None, help="応答の送信速度 (ボーレート)")
+    parser.add_argument('--corruption-rate', type=float, default=0.0, help="応答フレームを壊す確率")
+    parser.add_argument('--noise-rate', type=float, default=0.0, help="ノイズを挿入する確率")
+    parser.add_argument('--nack-rate', type=float, default=0.0, help="NACKを返す確率")
+    parser.add_argument('--seed', type=int, default=None, help="乱数シード")
+    args = parser.parse_args()
+
+    emulator = UtrEmulator(make_tag_population(args.tags), read_probability=args.read_probability,
+                           corruption_rate=args.corruption_rate, noise_rate=args.noise_rate,
+                           nack_rate=args.nack_rate, seed=args.seed)
+    if args.pty:
+        print(f"疑似リーダライタ: {serve_pty(emulator, args.baud)}")
+    else:
+        _, port = serve_socket(emulator, '127.0.0.1', args.socket, args.baud)
+        print(f"疑似リーダライタ: socket://127.0.0.1:{port}")
+    print("終了するには Ctrl+C を押してください。")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+UTR-S201 シリーズ 通信速度(ボーレート)の自動選択モジュール（無保証）
+
+【概要】
+リーダライタが応答するボーレートを調べ、実際のインベントリで最も速く通信できるものを選ぶ。
+リーダライタ側のボーレートは変更しない (RWManagerで設定した値のまま)。上位側で
+候補のボーレートを順に試し、結果を保存して次回からはそのボーレートで接続する。
+
+- probe_baud_rate(): ROM_VERSION_CHECK を送信し、ACKが返るかを確認する。
+- measure_link()   : インベントリを繰り返し、1秒あたりのフレーム数とエラー率を計測する。
+                     エラー率 = (ACKの読み取り枚数に対して受信できなかったタグ数 + タイムアウト回数)
+                              ÷ (ACKの読み取り枚数 + インベントリ回数)
+- tune_link()      : 全ての候補を計測し、エラー率が max_error_rate 以下で
+                     1秒あたりのフレーム数が最も多いボーレートを選ぶ。
+- LinkProfiles     : 結果をJSONファイルにポート名ごとに保存する。USBのシリアル番号も保存し、
+                     ポート名が変わった場合もシリアル番号で同じ機器の結果を探す。
+
+【使用例】
+    result = tune_link('/dev/ttyUSB0')
+    LinkProfiles('utr_link.json').save('/dev/ttyUSB0', result)
+    baud_rate = LinkProfiles('utr_link.json').best_baud_rate('/dev/ttyUSB0')   # 次回の起動時
+
+    python utr_link.py --port /dev/ttyUSB0 --cycles 20
+"""
+
+import os
+import time
+
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import serial
+
+from utr_protocol import (ACK, COMMANDS, DETAIL_INV, DETAIL_LOCATION, DETAIL_ROM, INV, InventoryTimeout,
+                          check_inventory_ack_response, communicate, communicate_frames, is_ack)
+from utr_reader import HandshakeError, handshake, open_reader
+
+
+# 試すボーレートの既定値 (速い順)
+BAUD_RATE_CANDIDATES = (115200, 57600, 38400, 19200, 9600)
+
+# 保存先のJSONファイルの既定値
+DEFAULT_LINK_FILE = 'utr_link.json'
+
+
+class LinkMeasurement:
+    """
+    1つのボーレートの計測結果。
+
+    Attributes:
+        baud_rate (int): ボーレート。
+        responded (bool): ROM_VERSION_CHECK にACKが返ればTrue。
+        probe_seconds (float): ROM_VERSION_CHECK の応答時間（秒、平均）。
+        cycles (int): 計測したインベントリの回数。
+        frames (int): 受信したフレーム数 (タグ + ACK)。
+        received_bytes (int): 受信したフレームのバイト数。
+        elapsed (float): インベントリの計測時間（秒）。
+        expected_tags (int): ACKの読み取り枚数の合計。
+        missing_tags (int): ACKの読み取り枚数に対して受信できなかったタグ数。
+        timeouts (int): ACK/NACKを受信できなかったインベントリの回数。
+    """
+
+    __slots__ = ('baud_rate', 'responded', 'probe_seconds', 'cycles', 'frames', 'received_bytes', 'elapsed',
+                 'expected_tags', 'missing_tags', 'timeouts')
+
+    def __init__(self, baud_rate: int) -> None:
+        self.baud_rate = baud_rate
+        self.responded = False
+        self.probe_seconds = 0.0
+        self.cycles = 0
+        self.frames = 0
+        self.received_bytes = 0
+        self.elapsed = 0.0
+        self.expected_tags = 0
+        self.missing_tags = 0
+        self.timeouts = 0
+
+    @property
+    def frames_per_second(self) -> float:
+        """1秒あたりの受信フレーム数。"""
+        return self.frames / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        """1秒あたりの受信バイト数。"""
+        return self.received_bytes / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def error_rate(self) -> float:
+        """エラー率 (0～1)。応答が無かった場合は1。"""
+        if not self.responded:
+            return 1.0
+        total = self.expected_tags + self.cycles
+        return (self.missing_tags + self.timeouts) / total if total > 0 else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        """JSONファイルへ保存する形式で返す。"""
+        return {'baud_rate': self.baud_rate, 'responded': self.responded,
+                'probe_seconds': round(self.probe_seconds, 6), 'cycles': self.cycles, 'frames': self.frames,
+                'frames_per_second': round(self.frames_per_second, 1),
+                'bytes_per_second': round(self.bytes_per_second, 1), 'error_rate': round(self.error_rate, 6)}
+
+    def __repr__(self) -> str:
+        return (f"LinkMeasurement(baud_rate={self.baud_rate}, responded={self.responded}, "
+                f"frames_per_second={self.frames_per_second:.1f}, error_rate={self.error_rate:.4f})")
+
+
+class LinkTuningResult:
+    """
+    tune_link() の結果。
+
+    Attributes:
+        best_baud_rate (Optional[int]): 選んだボーレート (どれも応答しなかった場合はNone)。
+        measurements (List[LinkMeasurement]): 候補ごとの計測結果 (試した順)。
+    """
+
+    __slots__ = ('best_baud_rate', 'measurements')
+
+    def __init__(self, best_baud_rate: Optional[int], measurements: List[LinkMeasurement]) -> None:
+        self.best_baud_rate = best_baud_rate
+        self.measurements = measurements
+
+    def __repr__(self) -> str:
+        return f"LinkTuningResult(best_baud_rate={self.best_baud_rate}, measurements={self.measurements})"
+
+
+# ROM_VERSION_CHECK でリーダライタが応答するかを確認する
+def probe_baud_rate(ser, attempts: int = 3, timeout: float = 0.3) -> LinkMeasurement:
+    """
+    開いたシリアルポートで ROM_VERSION_CHECK を attempts 回送信し、全てACKが返るかを確認する。
+
+    Args:
+        ser: シリアル通信オブジェクト (計測するボーレートで開いたもの)。
+        attempts (int): 送信する回数。
+        timeout (float): 1回あたりの応答待ち時間（秒）。
+
+    Returns:
+        LinkMeasurement: responded と probe_seconds を設定した計測結果。
+    """
+    measurement = LinkMeasurement(getattr(ser, 'baudrate', 0) or 0)
+    total = 0.0
+    for _ in range(attempts):
+        start = time.perf_counter()
+        result = communicate(ser, COMMANDS['ROM_VERSION_CHECK'], timeout)
+        total += time.perf_counter() - start
+        if not is_ack(result) or bytes([result[DETAIL_LOCATION]]) != DETAIL_ROM:
+            return measurement
+        # 別のボーレートで送信した分の応答が遅れて届いていないよう、受信バッファを空にする
+        ser.reset_input_buffer()
+    measurement.responded = True
+    measurement.probe_seconds = total / attempts
+    return measurement
+
+
+# インベントリを繰り返し、1秒あたりのフレーム数とエラー率を計測する
+def measure_link(ser, measurement: LinkMeasurement, cycles: int = 20) -> LinkMeasurement:
+    """
+    インベントリを cycles 回実行し、受信したフレーム数・バイト数と、受信できなかったタグ数を数える。
+    handshake() などで、インベントリを実行できる状態にしてから呼ぶ。
+
+    Args:
+        ser: シリアル通信オブジェクト。
+        measurement (LinkMeasurement): 結果を書き込む計測結果 (probe_baud_rate() の戻り値)。
+        cycles (int): インベントリの回数。
+
+    Returns:
+        LinkMeasurement: measurement (計測結果を書き込んだもの)。
+    """
+    timeout = InventoryTimeout(measurement.baud_rate or 19200)
+    inv = INV[0]
+    start = time.perf_counter()
+    for _ in range(cycles):
+        frames = communicate_frames(ser, COMMANDS['UHF_INVENTORY'], timeout.value)
+        measurement.cycles += 1
+        measurement.frames += len(frames)
+        measurement.received_bytes += sum(len(frame.raw) for frame in frames)
+        tags = sum(1 for frame in frames if frame.command == inv)
+        last = frames[-1] if frames else None
+        if last is not None and last.command == ACK[0] and last.detail == DETAIL_INV[0]:
+            expected = check_inventory_ack_response(last.raw)
+            measurement.expected_tags += expected
+            measurement.missing_tags += max(expected - tags, 0)
+            timeout.update(expected)
+        elif last is None or not last.is_end():
+            measurement.timeouts += 1
+            timeout.update(None)
+    measurement.elapsed = time.perf_counter() - start
+    return measurement
+
+
+# 候補のボーレートを全て計測し、最も速く通信できるものを選ぶ
+def tune_link(port_name: str, candidates: Sequence[int] = BAUD_RATE_CANDIDATES, cycles: int = 20,
+              max_error_rate: float = 0.01, verbose: bool = True,
+              opener: Callable[[str, int], Any] = open_reader) -> LinkTuningResult:
+    """
+    候補のボーレートごとにポートを開き直し、ROM_VERSION_CHECK で応答を確認してから
+    インベントリの速度とエラー率を計測する。
+
+    Args:
+        port_name (str): ポート名。
+        candidates (Sequence[int]): 試すボーレート。
+        cycles (int): 1つのボーレートあたりのインベントリの回数。
+        max_error_rate (float): 選ぶボーレートのエラー率の上限。
+        verbose (bool): Trueなら、計測結果を表示する。
+        opener (Callable[[str, int], Any]): シリアルポートを開く関数 (ポート名, ボーレート)。
+
+    Returns:
+        LinkTuningResult: 選んだボーレートと、候補ごとの計測結果。
+    """
+    measurements: List[LinkMeasurement] = []
+    for baud_rate in candidates:
+        try:
+            ser = opener(port_name, baud_rate)
+        except (serial.SerialException, OSError) as e:
+            if verbose:
+                print(f"{baud_rate:7d} bps: ポートを開けませんでした ({e})")
+            measurements.append(LinkMeasurement(baud_rate))
+            continue
+        try:
+            measurement = probe_baud_rate(ser)
+            measurement.baud_rate = baud_rate
+            if measurement.responded:
+                handshake(ser, verbose=False, set_inventory_param=False)
+                measure_link(ser, measurement, cycles)
+        except HandshakeError:
+            measurement = LinkMeasurement(baud_rate)
+        finally:
+            ser.close()
+        measurements.append(measurement)
+        if verbose:
+            if measurement.responded:
+                print(f"{baud_rate:7d} bps: {measurement.frames_per_second:9.1f} フレーム/秒, "
+                      f"{measurement.bytes_per_second:9.1f} バイト/秒, エラー率 {measurement.error_rate:.2%}")
+            else:
+                print(f"{baud_rate:7d} bps: 応答なし")
+
+    usable = [m for m in measurements if m.responded and m.error_rate <= max_error_rate]
+    best = max(usable, key=lambda m: (m.frames_per_second, m.baud_rate), default=None)
+    return LinkTuningResult(best.baud_rate if best is not None else None, measurements)
+
+
+class LinkProfiles:
+    """
+    tune_link() の結果を、ポート名ごとにJSONファイルへ保存・読み込みする。
+    """
+
+    def __init__(self, path: str = DEFAULT_LINK_FILE) -> None:
+        self.path = path
+
+    def _load(self) -> Dict[str, Any]:
+        if not os.path.exists(self.path):
+            return {}
+        import json
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}   # 壊れている場合は使わない (次回の保存で上書き)
+
+    def best_baud_rate(self, port_name: str) -> Optional[int]:
+        """
+        保存した結果から、ポートのボーレートを返す。
+
+        ポート名で見つからない場合は、接続されている機器のUSBシリアル番号で探す
+        (ポート名が変わった場合)。保存したファイルが無ければポートの列挙は行わない。
+
+        Args:
+            port_name (str): ポート名。
+
+        Returns:
+            Optional[int]: 保存したボーレート。無ければNone。
+        """
+        profiles = self._load()
+        if not profiles:
+            return None
+        entry = profiles.get(port_name)
+        if entry is None:
+            serial_number = _serial_number(port_name)
+            if serial_number:
+                entry = next((e for e in profiles.values() if e.get('serial_number') == serial_number), None)
+        return entry.get('best_baud_rate') if entry else None
+
+    def save(self, port_name: str, result: LinkTuningResult) -> None:
+        """
+        tune_link() の結果を保存する。
+
+        Args:
+            port_name (str): ポート名。
+            result (LinkTuningResult): tune_link() の結果。
+        """
+        import json
+
+        profiles = self._load()
+        profiles[port_name] = {
+            'serial_number': _serial_number(port_name),
+            'best_baud_rate': result.best_baud_rate,
+            'measurements': [m.as_dict() for m in result.measurements],
+            'updated': time.time(),
+        }
+        # 書き込み途中で終了しても壊れないように、別名で書いてから置き換える
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump(profiles, f, ensure_ascii=False, indent=2)
+        os.replace(temporary, self.path)
+
+
+# ポートに接続されているUSB機器のシリアル番号
+def _serial_number(port_name: str) -> Optional[str]:
+    from serial.tools import list_ports
+
+    for port in list_ports.comports():
+        if port.device == port_name:
+            return port.serial_number
+    return None
+
+
+# コマンドラインから実行する
+def main() -> None:
+    """ボーレートを計測し、最も速く通信できるものを保存する。"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="UTR-S201 通信速度(ボーレート)の自動選択")
+    parser.add_argument('--port', required=True, help="ポート名 (例: COM3, /dev/ttyUSB0)")
+    parser.add_argument('--candidates', type=int, nargs='+', default=list(BAUD_RATE_CANDIDATES),
+                        help="試すボーレート")
+    parser.add_argument('--cycles', type=int, default=20, help="1つのボーレートあたりのインベントリの回数")
+    parser.add_argument('--max-error-rate', type=float, default=0.01, help="選ぶボーレートのエラー率の上限")
+    parser.add_argument('--link-file', default=DEFAULT_LINK_FILE, help="結果を保存するJSONファイル")
+    args = parser.parse_args()
+
+    result = tune_link(args.port, args.candidates, args.cycles, args.max_error_rate)
+    if result.best_baud_rate is None:
+        print("応答のあるボーレートが見つかりませんでした。")
+        return
+    LinkProfiles(args.link_file).save(args.port, result)
+    print(f"選択したボーレート: {result.best_baud_rate} bps ({args.link_file} に保存しました)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+UTR-S201 シリーズ 計測(メトリクス)モジュール（無保証）
+
+【概要】
+タグの読み取り漏れの原因 (タイムアウト、SUMエラー、再同期、NACKなど) を調べるため、
+受信処理の各所で件数(カウンタ)と分布(ヒストグラム)を記録する。
+
+- 既定では無効 (METRICS が None)。受信処理側は `METRICS is not None` の確認のみで、
+  無効時の負荷はほぼ無い。
+- enable() で有効にすると、snapshot() で現在の値を取得できる。
+- start_http_server() で、Prometheus形式のテキストをHTTPで公開できる (任意)。
+
+【記録する項目】
+- bytes_received            受信バイト数
+- frames_parsed             正常に受信したフレーム数
+- frame_errors{type=...}    SUM, ETX, CRの不一致 (type=sum, etx, cr)、
+                            PC+UIIのバイト数とデータ長の不一致 (type=length)
+- resync_discarded_bytes    再同期のために読み飛ばしたバイト数
+- timeouts                  ACK/NACKを受信する前にタイムアウトした回数
+- nack{code=...}            NACKのエラーコード別の回数 (parse_nack_response()の名称)
+- command_latency_seconds   コマンド送信からACK/NACK受信までの時間 (command=コマンド+詳細コマンド)
+- inventory_tags            1回のインベントリで読み取ったタグ数
+- read_count_mismatch       インベントリACKの読み取り枚数と、解析したタグ数が一致しなかった回数
+
+【使用例】
+    import utr_metrics
+    metrics = utr_metrics.enable()
+    utr_metrics.start_http_server(9108)     # http://127.0.0.1:9108/metrics
+    ...
+    print(metrics.snapshot())
+"""
+
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+# 時間(秒)のヒストグラムの区切り
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# タグ数のヒストグラムの区切り
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+# ヒストグラムとして記録する項目と区切り (それ以外はカウンタ)
+HISTOGRAM_BUCKETS = {
+    'command_latency_seconds': LATENCY_BUCKETS,
+    'inventory_tags': COUNT_BUCKETS,
+}
+
+# 計測値のキー: (項目名, ラベル)  ラベルが無い場合は ''
+MetricKey = Tuple[str, str]
+
+
+class Histogram:
+    """
+    値の分布 (区切りごとの件数、合計、件数)。
+
+    Attributes:
+        bounds (Sequence[float]): 区切り (昇順)。
+        counts (List[int]): 各区切り以下(前の区切りより大きい)の件数。最後は区切りを超えた件数。
+        sum (float): 値の合計。
+        count (int): 件数。
+    """
+
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds: Sequence[float]) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """
+    カウンタとヒストグラムの集まり。
+    複数のスレッドから更新されても、値の更新はロックの中で行う。
+    """
+
+    def __init__(self) -> None:
+        # 計測を有効にした場合のみ読み込む (utr_protocol から読み込まれるため、無効時の起動を軽くする)
+        import threading
+        self._lock = threading.Lock()
+        self.counters: Dict[MetricKey, int] = {}
+        self.histograms: Dict[MetricKey, Histogram] = {}
+
+    def inc(self, name: str, value: int = 1, label: str = '') -> None:
+        """カウンタ name (ラベル label) に value を加える。"""
+        key = (name, label)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, label: str = '') -> None:
+        """ヒストグラム name (ラベル label) に値を記録する。"""
+        key = (name, label)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(HISTOGRAM_BUCKETS.get(name, LATENCY_BUCKETS))
+            histogram.observe(value)
+
+    def snapshot(self) -> Dict[str, object]:
+        """
+        現在の値を辞書で返す。
+
+        Returns:
+            Dict[str, object]: 'name' または 'name{label}' をキーとし、カウンタは件数、
+                               ヒストグラムは {'count', 'sum', 'buckets'} の辞書。
+        """
+        with self._lock:
+            result: Dict[str, object] = {}
+            for (name, label), value in self.counters.items():
+                result[_display_name(name, label)] = value
+            for (name, label), histogram in self.histograms.items():
+                result[_display_name(name, label)] = {
+                    'count': histogram.count,
+                    'sum': histogram.sum,
+                    'buckets': dict(zip([*histogram.bounds, float('inf')], histogram.counts)),
+                }
+            return result
+
+    def reset(self) -> None:
+        """全ての値を消去する。"""
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def render_prometheus(self, prefix: str = 'utr_') -> str:
+        """
+        現在の値をPrometheusのテキスト形式で返す。
+
+        Args:
+            prefix (str): 項目名の先頭に付ける文字列。
+
+        Returns:
+            str: Prometheusのテキスト形式。
+        """
+        lines: List[str] = []
+        with self._lock:
+            counter_names = sorted({name for name, _ in self.counters})
+            for name in counter_names:
+                lines.append(f"# TYPE {prefix}{name}_total counter")
+                for (key_name, label), value in sorted(self.counters.items()):
+                    if key_name == name:
+                        lines.append(f"{prefix}{name}_total{_prometheus_label(name, label)} {value}")
+
+            histogram_names = sorted({name for name, _ in self.histograms})
+            for name in histogram_names:
+                lines.append(f"# TYPE {prefix}{name} histogram")
+                for (key_name, label), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+                    if key_name != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip([*histogram.bounds, float('inf')], histogram.counts):
+                        cumulative += count
+                        le = '+Inf' if bound == float('inf') else repr(float(bound))
+                        lines.append(f"{prefix}{name}_bucket{_prometheus_label(name, label, le)} {cumulative}")
+                    lines.append(f"{prefix}{name}_sum{_prometheus_label(name, label)} {histogram.sum}")
+                    lines.append(f"{prefix}{name}_count{_prometheus_label(name, label)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+# ラベルの名称 (項目ごと)
+LABEL_NAMES = {
+    'frame_errors': 'type',
+    'nack': 'code',
+    'command_latency_seconds': 'command',
+}
+
+
+def _display_name(name: str, label: str) -> str:
+    return f"{name}{{{label}}}" if label else name
+
+
+def _prometheus_label(name: str, label: str, le: Optional[str] = None) -> str:
+    labels = []
+    if label:
+        labels.append(f'{LABEL_NAMES.get(name, "label")}="{label}"')
+    if le is not None:
+        labels.append(f'le="{le}"')
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+# 計測の有効/無効 (受信処理側は METRICS が None かどうかだけを確認する)
+METRICS: Optional[Metrics] = None
+
+
+def enable() -> Metrics:
+    """計測を有効にし、Metricsを返す (既に有効なら同じものを返す)。"""
+    global METRICS
+    if METRICS is None:
+        METRICS = Metrics()
+    return METRICS
+
+
+def disable() -> None:
+    """計測を無効にする。"""
+    global METRICS
+    METRICS = None
+
+
+# Prometheus形式のテキストをHTTPで公開する
+def start_http_server(port: int = 9108, host: str = '127.0.0.1'):
+    """
+    /metrics でPrometheus形式のテキストを返すHTTPサーバを、バックグラウンドのスレッドで起動する。
+    計測が無効の場合は有効にする。
+
+    Args:
+        port (int): 待ち受けポート番号。
+        host (str): 待ち受けアドレス (既定はローカルのみ)。
+
+    Returns:
+        http.server.ThreadingHTTPServer: 起動したサーバ (shutdown() で停止)。
+    """
+    # HTTPサーバを使う場合のみ読み込む
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    metrics = enable()
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split('?')[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = metrics.render_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args) -> None:
+            pass  # アクセスログは出力しない
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name='MetricsHTTPServer', daemon=True)
+    thread.start()
+    return server
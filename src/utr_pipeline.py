@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+UTR-S201 シリーズ インベントリのパイプライン実行モジュール（無保証）
+
+【概要】
+main() の読み取りループは「送信 → 受信 → 解析 → 表示・集計」を1つずつ順に行うため、
+解析や表示の間はリーダライタが待たされる。
+InventoryPipeline は処理を2段に分け、キューでつなぐ。
+
+- 通信段 (run()を呼んだスレッド): ACKを受信したら、すぐに次のUHF_INVENTORYを送信する。
+  受信したフレーム (communicate_frames()の戻り値) はそのままキューへ入れるだけで、解析は行わない。
+- 処理段 (ワーカースレッド): parse_inventory_tags() による解析、PC+UIIの表示、
+  TagStore・ResultSinkへの登録を行う。フレームは通信段で確認済みのため、再確認しない。
+
+キューには上限があり、処理段が追いつかない場合は通信段が待つ (受信データは破棄しない)。
+タイムアウトの調整 (InventoryTimeout) に必要な読み取り枚数は、通信段で
+最後のACKフレームだけを見て取り出す。
+
+rate (1秒あたりのインベントリ回数) を指定すると、RateScheduler で一定の間隔でインベントリを開始する
+(スループットを一定に保って計測する場合など)。
+
+【使用例】
+    pipeline = InventoryPipeline(ser, port_name, tag_store=TagStore(), print_tags=True)
+    statistics = pipeline.run(cycles=100)
+    print(statistics.cycles_per_second, statistics.duty_cycle)
+
+    statistics = pipeline.run(duration=60, rate=20)   # 20回/秒で60秒間
+"""
+
+import queue
+import threading
+import time
+
+from typing import Callable, List, Optional, Tuple
+
+from utr_protocol import (ACK, COMMANDS, DETAIL_INV, Frame, InventoryTimeout, check_inventory_ack_response,
+                          communicate_frames)
+from utr_responses import parse_inventory_tags
+from utr_sink import ResultSink
+from utr_tags import TagStore
+
+
+# 1回分の受信結果: (インベントリ番号, 受信完了時刻 time.time(), 受信したフレーム)
+InventoryResponse = Tuple[int, float, List[Frame]]
+
+
+# 受信したフレームの最後のインベントリACKから読み取り枚数を取り出す
+def inventory_ack_count(frames: List[Frame]) -> Optional[int]:
+    """
+    communicate_frames() の最後のフレームがインベントリACKであれば、読み取り枚数を返す。
+    タグのフレームは解析しない (通信段で次のコマンドをすぐに送信するため)。
+
+    Args:
+        frames (List[Frame]): communicate_frames() の戻り値。
+
+    Returns:
+        Optional[int]: 読み取り枚数。最後のフレームがインベントリACKでない場合はNone。
+    """
+    if frames and frames[-1].command == ACK[0] and frames[-1].detail == DETAIL_INV[0]:
+        return check_inventory_ack_response(frames[-1].raw)
+    return None
+
+
+class RateScheduler:
+    """
+    一定の間隔 (1 / rate 秒) で処理を開始するためのスケジューラ。
+    開始時刻は「最初の開始時刻 + 回数 × 間隔」で決めるため、待ち時間の誤差が積み重ならない。
+    time.sleep() は指定より長く眠ることがあるため (Windowsでは1～15ミリ秒程度)、
+    最後の spin 秒は time.perf_counter() を見ながら待つ。
+
+    Attributes:
+        interval (float): 開始の間隔（秒）。
+        late (int): 1間隔以上遅れて開始した回数 (この場合は遅れを取り戻さず、そこから数え直す)。
+        max_lateness (float): 開始時刻の最大の遅れ（秒）。
+    """
+
+    __slots__ = ('interval', 'spin', 'late', 'max_lateness', '_next')
+
+    def __init__(self, rate: float, spin: float = 0.002) -> None:
+        """
+        Args:
+            rate (float): 1秒あたりの開始回数。
+            spin (float): time.sleep() を使わずに待つ時間（秒）。
+        """
+        if rate <= 0:
+            raise ValueError("rate は正の値を指定してください")
+        self.interval = 1.0 / rate
+        self.spin = spin
+        self.late = 0
+        self.max_lateness = 0.0
+        self._next: Optional[float] = None
+
+    def wait(self) -> float:
+        """
+        次の開始時刻まで待つ。
+
+        Returns:
+            float: 開始時刻からの遅れ（秒）。
+        """
+        now = time.perf_counter()
+        if self._next is None:
+            self._next = now
+        remaining = self._next - now
+        if remaining > self.spin:
+            time.sleep(remaining - self.spin)
+        while time.perf_counter() < self._next:
+            pass
+        now = time.perf_counter()
+        lateness = now - self._next
+        self.max_lateness = max(self.max_lateness, lateness)
+        if lateness >= self.interval:
+            # 遅れを取り戻すためにまとめて実行せず、ここから数え直す
+            self.late += 1
+            self._next = now
+        self._next += self.interval
+        return lateness
+
+
+class PipelineStatistics:
+    """
+    パイプライン実行の統計。
+
+    Attributes:
+        cycles (int): 実行したインベントリの回数。
+        empty_responses (int): 応答が無かった回数。
+        tags (int): 解析したタグ数 (延べ)。
+        elapsed (float): 実行時間（秒）。
+        io_seconds (float): 通信段がcommunicate()を実行していた時間（秒）。
+        worker_seconds (float): 処理段が解析・集計していた時間（秒）。
+        max_queue_depth (int): キューに溜まった受信結果の最大数。
+        late_cycles (int): rate を指定した場合に、1間隔以上遅れて開始した回数。
+        max_lateness (float): rate を指定した場合の、開始時刻の最大の遅れ（秒）。
+        interrupted (bool): Ctrl+C (KeyboardInterrupt) で中断した場合はTrue。
+    """
+
+    __slots__ = ('cycles', 'empty_responses', 'tags', 'elapsed', 'io_seconds', 'worker_seconds',
+                 'max_queue_depth', 'late_cycles', 'max_lateness', 'interrupted')
+
+    def __init__(self) -> None:
+        self.cycles = 0
+        self.empty_responses = 0
+        self.tags = 0
+        self.elapsed = 0.0
+        self.io_seconds = 0.0
+        self.worker_seconds = 0.0
+        self.max_queue_depth = 0
+        self.late_cycles = 0
+        self.max_lateness = 0.0
+        self.interrupted = False
+
+    @property
+    def cycles_per_second(self) -> float:
+        """1秒あたりのインベントリ回数。"""
+        return self.cycles / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def duty_cycle(self) -> float:
+        """実行時間のうち、リーダライタと通信していた時間の割合 (0～1)。"""
+        return self.io_seconds / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __repr__(self) -> str:
+        return (f"PipelineStatistics(cycles={self.cycles}, tags={self.tags}, elapsed={self.elapsed:.3f}, "
+                f"cycles_per_second={self.cycles_per_second:.1f}, duty_cycle={self.duty_cycle:.2f})")
+
+
+class InventoryPipeline:
+    """
+    インベントリの通信と、解析・表示・集計を別スレッドで並行して行う。
+    """
+
+    def __init__(self, ser, reader: str = '', tag_store: Optional[TagStore] = None,
+                 sink: Optional[ResultSink] = None, timeout: Optional[InventoryTimeout] = None,
+                 print_tags: bool = False, max_queue: int = 64,
+                 on_result: Optional[Callable[[int, float, List[bytes], List[float], Optional[int]], None]] = None,
+                 command: bytes = COMMANDS['UHF_INVENTORY']) -> None:
+        """
+        Args:
+            ser: シリアル通信オブジェクト。
+            reader (str): リーダライタ名 (ResultSinkへ書き出す名前、ポート名など)。
+            tag_store (Optional[TagStore]): 読み取り結果を集計するTagStore。
+            sink (Optional[ResultSink]): 読み取り結果を書き出すResultSink。
+            timeout (Optional[InventoryTimeout]): タイムアウトの調整。省略時はボーレートから作成。
+            print_tags (bool): Trueなら、main()と同様に読み取ったPC+UIIを表示する。
+            max_queue (int): 解析待ちの受信結果を溜められる数。
+            on_result (Optional[Callable]): 解析後に処理段から呼ぶ関数
+                                            (インベントリ番号, 時刻, PC+UIIリスト, RSSIリスト, 読み取り枚数)。
+            command (bytes): 送信するインベントリコマンド。
+        """
+        self.ser = ser
+        self.reader = reader
+        self.tag_store = tag_store
+        self.sink = sink
+        self.timeout = timeout if timeout is not None else InventoryTimeout(getattr(ser, 'baudrate', None) or 19200)
+        self.print_tags = print_tags
+        self.max_queue = max_queue
+        self.on_result = on_result
+        self.command = command
+        self._error: Optional[BaseException] = None
+
+    def run(self, cycles: Optional[int] = None, duration: Optional[float] = None,
+            stop_event: Optional[threading.Event] = None, rate: Optional[float] = None) -> PipelineStatistics:
+        """
+        インベントリを繰り返し実行し、全ての受信結果の処理が終わってから戻る。
+        Ctrl+C (KeyboardInterrupt) で中断した場合も、それまでに受信した結果を処理してから
+        statistics.interrupted をTrueにして戻る (中断までの統計を返す)。
+
+        Args:
+            cycles (Optional[int]): 実行するインベントリの回数。
+            duration (Optional[float]): 実行する時間（秒）。
+            stop_event (Optional[threading.Event]): セットされたら終了する。
+            いずれも指定しない場合は、stop_event がセットされるまで実行する。
+            rate (Optional[float]): 1秒あたりのインベントリ回数。Noneなら待たずに次を送信する。
+
+        Returns:
+            PipelineStatistics: 実行の統計。
+
+        Raises:
+            Exception: 処理段 (解析・集計) で発生したエラー。
+        """
+        self._error = None
+        statistics = PipelineStatistics()
+        responses: 'queue.Queue[Optional[InventoryResponse]]' = queue.Queue(self.max_queue)
+        worker = threading.Thread(target=self._work, args=(responses, statistics),
+                                  name='InventoryPipelineWorker', daemon=True)
+        worker.start()
+
+        scheduler = RateScheduler(rate) if rate else None
+        start = time.monotonic()
+        deadline = None if duration is None else start + duration
+        try:
+            while cycles is None or statistics.cycles < cycles:
+                if stop_event is not None and stop_event.is_set():
+                    break
+                if deadline is not None and time.monotonic() >= deadline:
+                    break
+                if self._error is not None:
+                    break
+                if scheduler is not None:
+                    scheduler.wait()
+                    if deadline is not None and time.monotonic() >= deadline:
+                        break
+                io_start = time.monotonic()
+                response = communicate_frames(self.ser, self.command, self.timeout.value)
+                statistics.io_seconds += time.monotonic() - io_start
+                self.timeout.update(inventory_ack_count(response))
+                # 処理段が追いついていない場合は、空きができるまで待つ
+                responses.put((statistics.cycles, time.time(), response))
+                statistics.cycles += 1
+                statistics.max_queue_depth = max(statistics.max_queue_depth, responses.qsize())
+        except KeyboardInterrupt:
+            # 受信途中の1回分は破棄し、それまでの受信結果と統計は残す
+            statistics.interrupted = True
+        finally:
+            responses.put(None)
+            worker.join()
+            statistics.elapsed = time.monotonic() - start
+            if scheduler is not None:
+                statistics.late_cycles = scheduler.late
+                statistics.max_lateness = scheduler.max_lateness
+        if self._error is not None:
+            raise self._error
+        return statistics
+
+    # --- 以下、処理段 (ワーカースレッド) ---
+
+    def _work(self, responses: 'queue.Queue[Optional[InventoryResponse]]',
+              statistics: PipelineStatistics) -> None:
+        while True:
+            item = responses.get()
+            if item is None:
+                return
+            if self._error is not None:
+                continue   # 処理段でエラーが発生した後は、通信段を止めないように読み捨てる
+            try:
+                self._process(item, statistics)
+            except Exception as e:
+                self._error = e
+
+    def _process(self, item: InventoryResponse, statistics: PipelineStatistics) -> None:
+        work_start = time.monotonic()
+        index, read_time, response = item
+        if not response:
+            statistics.empty_responses += 1
+            if self.print_tags:
+                print("インベントリ応答がありませんでした。")
+            statistics.worker_seconds += time.monotonic() - work_start
+            return
+
+        tags, expected_count = parse_inventory_tags(response)
+        pc_uii_list = [tag.pc_uii for tag in tags]
+        rssi_list = [tag.rssi for tag in tags]
+        if self.print_tags:
+            for pc_uii in pc_uii_list:
+                print(f"PC+UII: {pc_uii.hex().upper()}")
+        if self.tag_store is not None:
+            self.tag_store.add_many(pc_uii_list, rssi_list, read_time, angle_list=[tag.angle for tag in tags])
+        if self.sink is not None:
+            self.sink.put_many(read_time, self.reader, pc_uii_list, rssi_list)
+        if self.on_result is not None:
+            self.on_result(index, read_time, pc_uii_list, rssi_list, expected_count)
+        statistics.tags += len(pc_uii_list)
+        statistics.worker_seconds += time.monotonic() - work_start
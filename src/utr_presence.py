@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+UTR-S201 シリーズ タグの在/不在判定モジュール（無保証）
+
+【概要】
+インベントリの読み取り結果 (毎回の PC+UII) から、タグが「現れた(arrive)」
+「いなくなった(depart)」のイベントだけを取り出す。
+
+- hold_off : 最初に読み取ってから、この時間（秒）以上たって再び読み取ったときに arrive とする。
+             一瞬だけ読めたタグ(通りすがり・誤読)を除外する。0なら最初の読み取りで arrive。
+- expiry   : 最後に読み取ってから、この時間（秒）読み取れなければ depart とする。
+
+最後に読み取った時刻はタグごとに上書きするだけで、期限の確認はタイミングホイール
+(resolution 秒ごとのバケツを環状に並べたもの) で行う。
+- 読み取り1回あたりの処理は O(1) (辞書の参照と時刻の上書きのみ、バケツの移動はしない)。
+- 期限の確認は、時刻が進んだバケツに入っているタグだけを見る (全タグの走査はしない)。
+  バケツの時刻になっても期限が延びていたタグは、その時点で新しい期限のバケツへ入れ直す。
+
+【使用例】
+    tracker = PresenceTracker(hold_off=0.5, expiry=3.0)
+    for event in tracker.update(pc_uii_list, time.time()):
+        print(event.kind, event.pc_uii.hex().upper())
+    ...
+    events = tracker.advance(time.time())   # 読み取りが無い間も depart を判定する
+"""
+
+import math
+
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+
+ARRIVE = 'arrive'
+DEPART = 'depart'
+
+
+class PresenceEvent:
+    """
+    在/不在のイベント。
+
+    Attributes:
+        kind (str): ARRIVE または DEPART。
+        pc_uii (bytes): PC+UIIデータ。
+        timestamp (float): イベントの時刻 (arrive: 読み取った時刻、depart: 期限の時刻)。
+        first_seen (float): 最初に読み取った時刻。
+        last_seen (float): 最後に読み取った時刻。
+        reads (int): 読み取り回数 (最初の読み取りから)。
+    """
+
+    __slots__ = ('kind', 'pc_uii', 'timestamp', 'first_seen', 'last_seen', 'reads')
+
+    def __init__(self, kind: str, pc_uii: bytes, timestamp: float, first_seen: float,
+                 last_seen: float, reads: int) -> None:
+        self.kind = kind
+        self.pc_uii = pc_uii
+        self.timestamp = timestamp
+        self.first_seen = first_seen
+        self.last_seen = last_seen
+        self.reads = reads
+
+    def __repr__(self) -> str:
+        return (f"PresenceEvent({self.kind}, pc_uii={self.pc_uii.hex().upper()}, "
+                f"timestamp={self.timestamp:.3f}, reads={self.reads})")
+
+
+class _TagPresence:
+    """1タグ分の状態。"""
+
+    __slots__ = ('first_seen', 'last_seen', 'reads', 'arrived')
+
+    def __init__(self, timestamp: float) -> None:
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.reads = 1
+        self.arrived = False
+
+
+class PresenceTracker:
+    """
+    タイミングホイールを使って、タグの arrive/depart を判定する。
+
+    Attributes:
+        hold_off (float): arrive とするまでの時間（秒）。
+        expiry (float): depart とするまでの時間（秒）。
+        resolution (float): タイミングホイールのバケツの幅（秒）。depart の判定はこの幅だけ遅れることがある。
+    """
+
+    def __init__(self, hold_off: float = 0.0, expiry: float = 5.0, resolution: float = 0.1) -> None:
+        if expiry <= 0 or resolution <= 0:
+            raise ValueError("expiry と resolution は正の値を指定してください")
+        if hold_off < 0:
+            raise ValueError("hold_off は0以上を指定してください")
+        self.hold_off = hold_off
+        self.expiry = expiry
+        self.resolution = resolution
+
+        self._tags: Dict[bytes, _TagPresence] = {}
+        # 期限(expiry後)を含むバケツ。期限は最大でも expiry 先のため、この数で一周する
+        self._wheel: List[Set[bytes]] = [set() for _ in range(int(math.ceil(expiry / resolution)) + 2)]
+        self._tick: Optional[int] = None   # 現在のバケツの番号 (時刻 / resolution)、これより前は確認済み
+        self._present = 0
+
+    def __len__(self) -> int:
+        """在と判定しているタグの数。"""
+        return self._present
+
+    def __contains__(self, pc_uii: bytes) -> bool:
+        tag = self._tags.get(pc_uii)
+        return tag is not None and tag.arrived
+
+    def present(self) -> Iterator[bytes]:
+        """在と判定しているタグのPC+UIIを返す。"""
+        return (pc_uii for pc_uii, tag in self._tags.items() if tag.arrived)
+
+    def _schedule(self, pc_uii: bytes, deadline: float) -> None:
+        # 確認済みのバケツには入れない (現在のバケツは、次の確認時にも見直す)
+        tick = max(int(deadline / self.resolution), self._tick)
+        self._wheel[tick % len(self._wheel)].add(pc_uii)
+
+    def read(self, pc_uii: bytes, timestamp: float) -> Optional[PresenceEvent]:
+        """
+        1回分の読み取りを登録する。時刻は単調に増加すること。
+
+        Args:
+            pc_uii (bytes): PC+UIIデータ。
+            timestamp (float): 読み取った時刻。
+
+        Returns:
+            Optional[PresenceEvent]: arrive となった場合はそのイベント、それ以外はNone。
+        """
+        if self._tick is None:
+            self._tick = int(timestamp / self.resolution)
+
+        tag = self._tags.get(pc_uii)
+        if tag is None:
+            tag = self._tags[pc_uii] = _TagPresence(timestamp)
+            self._schedule(pc_uii, timestamp + self.expiry)
+        else:
+            # 最後に読み取った時刻を上書きするだけ (バケツは期限の確認時に入れ直す)
+            tag.last_seen = timestamp
+            tag.reads += 1
+
+        if not tag.arrived and timestamp - tag.first_seen >= self.hold_off:
+            tag.arrived = True
+            self._present += 1
+            return PresenceEvent(ARRIVE, pc_uii, timestamp, tag.first_seen, timestamp, tag.reads)
+        return None
+
+    def advance(self, now: float) -> List[PresenceEvent]:
+        """
+        時刻を now まで進め、期限が過ぎたタグの depart イベントを返す。
+        arrive となる前に期限が過ぎたタグは、イベントを出さずに削除する。
+
+        Args:
+            now (float): 現在の時刻。
+
+        Returns:
+            List[PresenceEvent]: depart イベント (期限の古い順)。
+        """
+        events: List[PresenceEvent] = []
+        if self._tick is None:
+            self._tick = int(now / self.resolution)
+            return events
+
+        target = max(int(now / self.resolution), self._tick)
+        wheel = self._wheel
+        size = len(wheel)
+        if target - self._tick >= size:
+            # 一周以上進んだ場合は、全てのバケツをまとめて確認する
+            due: Iterable[bytes] = [pc_uii for bucket in wheel for pc_uii in bucket]
+            for bucket in wheel:
+                bucket.clear()
+            self._tick = target
+            self._expire(due, now, events)
+        else:
+            # 現在のバケツ(期限がまだ来ていないタグが残っている)から、now を含むバケツまで
+            for tick in range(self._tick, target + 1):
+                self._tick = tick
+                bucket = wheel[tick % size]
+                if bucket:
+                    due = list(bucket)
+                    bucket.clear()
+                    self._expire(due, now, events)
+        events.sort(key=lambda event: event.timestamp)
+        return events
+
+    def _expire(self, due: Iterable[bytes], now: float, events: List[PresenceEvent]) -> None:
+        tags = self._tags
+        expiry = self.expiry
+        for pc_uii in due:
+            tag = tags.get(pc_uii)
+            if tag is None:
+                continue
+            deadline = tag.last_seen + expiry
+            if deadline > now:
+                # 期限までに再び読み取られていたので、新しい期限のバケツへ入れ直す
+                self._schedule(pc_uii, deadline)
+                continue
+            del tags[pc_uii]
+            if tag.arrived:
+                self._present -= 1
+                events.append(PresenceEvent(DEPART, pc_uii, deadline, tag.first_seen, tag.last_seen, tag.reads))
+
+    def update(self, pc_uii_list: Iterable[bytes], timestamp: float) -> List[PresenceEvent]:
+        """
+        1回分のインベントリ結果を登録し、depart と arrive のイベントを返す。
+        received_data_parse() / parse_inventory_frames() の PC+UIIリストをそのまま渡せる。
+
+        Args:
+            pc_uii_list (Iterable[bytes]): PC+UIIデータのリスト。
+            timestamp (float): 読み取った時刻。
+
+        Returns:
+            List[PresenceEvent]: depart イベント (先に時刻を進めた分)、続けて arrive イベント。
+        """
+        events = self.advance(timestamp)
+        read = self.read
+        for pc_uii in pc_uii_list:
+            event = read(pc_uii, timestamp)
+            if event is not None:
+                events.append(event)
+        return events
+
+    def flush(self, now: float) -> List[PresenceEvent]:
+        """
+        在と判定している全タグの depart イベントを返し、状態を消去する (終了時用)。
+
+        Args:
+            now (float): depart の時刻。
+
+        Returns:
+            List[PresenceEvent]: depart イベント。
+        """
+        events = [PresenceEvent(DEPART, pc_uii, now, tag.first_seen, tag.last_seen, tag.reads)
+                  for pc_uii, tag in self._tags.items() if tag.arrived]
+        self._tags.clear()
+        for bucket in self._wheel:
+            bucket.clear()
+        self._present = 0
+        return events
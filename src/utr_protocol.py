@@ -0,0 +1,992 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+UTR-S201 シリーズ 通信プロトコル処理モジュール（無保証）
+
+【概要】
+リーダライタとの通信に使う定数、コマンドの組み立て、応答フレームの受信・確認・解析をまとめたモジュール。
+utr_usb_sample.py (サンプルプログラム) と、utr_pipeline.py, utr_session.py などの各モジュールから
+共通で使用する。本モジュールはそれらのモジュールを読み込まない。
+
+- 定数           : STX, ACK, INV などのバイト、フレーム内の位置、詳細コマンド、NACKのエラーコード
+- コマンド       : build_command() (SUM値の計算、キャッシュ)、COMMANDS (本サンプルで使用するコマンド)
+- 受信           : Frame, FrameReceiver (STX, データ長, ETX, SUM, CR の確認)
+- 通信           : communicate_frames(), communicate() (コマンドの送信と、ACK/NACKまでの受信)
+- タイムアウト   : InventoryTimeout (読み取り枚数に合わせたインベントリのタイムアウト)
+- 解析           : parse_inventory_frames(), received_data_parse(), parse_nack_response(),
+                   inventory_pc_uii_length(), verify_sum_value(), decode_rssi() など
+
+[コマンド、レスポンスの基本フォーマット]
+- STX(02h) 1バイト #Start Text
+- アドレス  1バイト (RWのIDなど、デフォルトは 00h)
+- コマンド  1バイト
+- データ長  1バイト
+- データ部  0～255バイト
+- ETX(03h) 1バイト  #End Text
+- SUM      1バイト　STXからETXまで
+- CR(0Dh)  1バイト  '/r' キャリッジリターン
+"""
+
+import struct
+import time
+
+from   functools    import lru_cache
+
+import serial
+
+from   typing       import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import utr_metrics
+
+
+
+# 定数の定義 (プロトコル仕様に準拠)
+HEADER_LENGTH     = 4        # STX, アドレス, コマンド, データ長 (各1バイト) の合計長
+FOOTER_LENGTH     = 3        # ETX, SUM, CR (各1バイト) の合計長
+STX : bytes       = b'\x02'  # Start Text: フレーム開始を示すバイト
+ADD : bytes       = b'\x00'  # アドレス: リーダライタIDなど (設定により変化することあり)
+ETX : bytes       = b'\x03'  # End Text: データ部の終了を示すバイト
+CR  : bytes       = b'\x0D'  # Carriage Return: フレームの終端を示すバイト
+ACK : bytes       = b'\x30'  # ACK (Acknowledgment): 正常応答
+NACK: bytes       = b'\x31'  # NACK (Negative Acknowledgment): エラー応答
+INV : bytes       = b'\x6C'  # インベントリコマンド: RFタグ読み取りコマンド
+BUZ : bytes       = b'\x42'  # ブザーコマンド: ブザー制御コマンド
+CMD_LOCATION      = 2        # フレーム内のコマンドバイトの位置 (0-indexed)
+DETAIL_LOCATION   = 4        # フレーム内の詳細コマンドバイトの位置 (0-indexed)
+DETAIL_ROM: bytes = b'\x90'  # ROMバージョン読み取りの詳細コマンド
+DETAIL_INV: bytes = b'\x10'  # インベントリの詳細コマンド
+
+# 応答フレーム内の位置 (0-indexed)
+RSSI_LOCATION          = 5   # インベントリ応答: RSSI (2バイト、符号付き、0.1dBm単位)
+ANGLE_LOCATION         = 7   # インベントリ応答: ANGLE (1バイト)
+PC_UII_LEN_LOCATION    = 8   # インベントリ応答: PC+UIIのバイト数 (1バイト)
+PC_UII_LOCATION        = 9   # インベントリ応答: PC+UII (nバイト)
+READ_COUNT_LOCATION    = 6   # インベントリACK: 読み取り枚数 (2バイト、リトルエンディアン)
+ERROR_CODE_LOCATION    = 5   # NACK: エラーコード (1バイト)
+SETTING_LOCATION       = 5   # 設定読み取りACK: 読み取った設定の種類 (0x01: 送信出力、0x02: 周波数チャンネル)
+SETTING_VALUE_LOCATION = 7   # 設定読み取りACK: 設定値
+
+# コマンド 0x55 の詳細コマンド (1バイトの整数)
+DETAIL_WRITE               = 0x16   # UHF_WRITE
+DETAIL_SET_INVENTORY_PARAM = 0x30   # UHF_SET_INVENTORY_PARAM
+DETAIL_GET_INVENTORY_PARAM = 0x41   # UHF_GET_INVENTORY_PARAM
+DETAIL_READ_SETTING        = 0x43   # 送信出力・周波数チャンネルの読み取り
+SETTING_OUTPUT_POWER       = 0x01   # 設定の種類: 送信出力
+SETTING_FREQ_CH            = 0x02   # 設定の種類: 周波数チャンネル
+
+# UHF_WRITE のメモリバンク (EPC Gen2)
+MEMORY_BANK_RESERVED = 0x00
+MEMORY_BANK_EPC      = 0x01
+MEMORY_BANK_TID      = 0x02
+MEMORY_BANK_USER     = 0x03
+EPC_WORD_ADDRESS     = 2      # EPCバンクのEPCの先頭ワードアドレス (0: CRC、1: PC、2～: EPC)
+
+# NACKのエラーコード (parse_nack_response() のうち、処理を分けるもの)
+NACK_RXBUSY_ERROR = 0x04   # CMD_RXBUSY_ERROR: RFタグからの応答がない
+NACK_UHF_IC_ERROR = 0x0A   # CMD_UHF_IC_ERROR: RFタグアクセス時の内蔵チップエラー
+NACK_SUM_ERROR    = 0x42   # SUM_ERROR: 送信したコマンドのSUM値が正しくない
+NACK_FORMAT_ERROR = 0x44   # FORMAT_ERROR: 送信したコマンドのフォーマットまたはパラメータが正しくない
+NACK_LBT_ERROR    = 0x60   # CMD_LBT_ERROR: キャリアセンス時のタイムアウトエラー
+
+# ACK/NACKの判定用 (1バイトの整数で比較する)
+_STX_CODE  = STX[0]
+_ACK_CODE  = ACK[0]
+_NACK_CODE = NACK[0]
+
+
+# 応答がACKかどうかを判定
+def is_ack(response: bytes) -> bool:
+    """
+    応答の先頭のフレームがACKであればTrueを返す。
+    re.match(STX + b'.' + ACK, response) と同じ判定 (アドレスが 0Ah の場合も正しく判定する)。
+
+    Args:
+        response (bytes): communicate() の戻り値。
+
+    Returns:
+        bool: ACKであればTrue。
+    """
+    return len(response) > CMD_LOCATION and response[0] == _STX_CODE and response[CMD_LOCATION] == _ACK_CODE
+
+
+# 応答がNACKかどうかを判定
+def is_nack(response: bytes) -> bool:
+    """
+    応答の先頭のフレームがNACKであればTrueを返す。
+    re.match(STX + b'.' + NACK, response) と同じ判定 (アドレスが 0Ah の場合も正しく判定する)。
+
+    Args:
+        response (bytes): communicate() の戻り値。
+
+    Returns:
+        bool: NACKであればTrue。
+    """
+    return len(response) > CMD_LOCATION and response[0] == _STX_CODE and response[CMD_LOCATION] == _NACK_CODE
+
+
+# SUM値計算
+def calculate_sum_value(data: bytes) -> int:
+    """
+    バイト列の合計値（チェックサム）を計算する。
+    STXからETXまでのバイトの合計の下位1バイトを返す。
+
+    Args:
+        data (bytes): チェックサムを計算するデータのバイト列 (STX-ETXまで)。
+
+    Returns:
+        int: 計算されたチェックサム（下位1バイト）。
+    """
+    # 組み込みの sum() で合計し、下位1バイトに制限 (256で割った余り)
+    return sum(data) & 0xFF
+
+
+# コマンドの組み立て
+# STX, アドレス, コマンド, データ長, データ部, ETX, SUM, CR の順に並べ、SUM値を計算して付加する。
+# 同じ引数で組み立てたコマンドはキャッシュ(LRU)から返すため、繰り返し送信するコマンドの
+# 組み立て(SUM値の計算)は初回のみとなる。
+@lru_cache(maxsize=256)
+def build_command(command: int, detail: int, payload: bytes = b'', address: int = ADD[0]) -> bytes:
+    """
+    コマンド、詳細コマンド、パラメータから送信コマンド(STXからCRまで)を組み立てる。
+
+    Args:
+        command (int): コマンド (例: 0x55)。
+        detail (int): 詳細コマンド (データ部の1バイト目、例: 0x10)。
+        payload (bytes): 詳細コマンドに続くデータ部のパラメータ。
+                         キャッシュのキーとなるため、bytes(変更不可)で指定すること。
+        address (int): リーダライタのアドレス (マルチドロップ接続時に指定、デフォルトは 00h)。
+
+    Returns:
+        bytes: 送信コマンドのバイト列。
+
+    Raises:
+        ValueError: データ長が255バイトを超える場合、または値が1バイトに収まらない場合。
+    """
+    data_length = 1 + len(payload)
+    if data_length > 0xFF:
+        raise ValueError(f"データ部が長すぎます ({data_length} バイト)")
+    if not (0 <= command <= 0xFF and 0 <= detail <= 0xFF and 0 <= address <= 0xFF):
+        raise ValueError("コマンド、詳細コマンド、アドレスは 00h～FFh で指定してください")
+
+    frame = bytearray((STX[0], address, command, data_length, detail))
+    frame += payload
+    frame += ETX
+    frame.append(calculate_sum_value(frame))
+    frame += CR
+    return bytes(frame)
+
+
+# UHF_SET_INVENTORY_PARAM で設定するインベントリパラメータの既定値 (8バイト)
+DEFAULT_INVENTORY_PARAM = bytes([0x00, 0x81, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00])
+
+
+# UTR用 シリアル送信コマンドの一覧を組み立てる
+def build_commands(address: int = ADD[0]) -> Dict[str, bytes]:
+    """
+    指定したアドレスのリーダライタ向けに、送信コマンドの一覧を組み立てる。
+
+    Args:
+        address (int): リーダライタのアドレス (デフォルトは 00h)。
+
+    Returns:
+        Dict[str, bytes]: コマンド名と送信コマンドのバイト列の辞書。
+    """
+    return {
+        # ROMバージョンの読み取りコマンド: リーダライタのファームウェアバージョンを確認
+        'ROM_VERSION_CHECK': build_command(0x4F, DETAIL_ROM[0], address=address),
+        # コマンドモードへの切り替えコマンド: リーダライタをコマンド制御可能な状態に設定
+        'COMMAND_MODE_SET': build_command(0x4E, 0x00, bytes([0x00, 0x00, 0x10, 0x00, 0x00, 0x00]), address),
+        # UHF_Inventoryコマンド: RFタグを読み取るためのインベントリ操作を開始
+        'UHF_INVENTORY': build_command(0x55, DETAIL_INV[0], address=address),
+        # UHF_GetInventoryParam: RFタグ読み取り時のインベントリ処理に使用するパラメータの取得
+        'UHF_GET_INVENTORY_PARAM': build_command(0x55, 0x41, bytes([0x00]), address),
+        # UHF_SetInventoryParamコマンド: インベントリパラメータの設定 (必要に応じて変更)
+        'UHF_SET_INVENTORY_PARAM': build_command(0x55, 0x30, DEFAULT_INVENTORY_PARAM, address),
+        # UHF送信出力設定読み取りコマンド: リーダライタの送信出力レベルを読み取り
+        'UHF_READ_OUTPUT_POWER': build_command(0x55, 0x43, bytes([0x01, 0x00]), address),
+        # UHF送信周波数チャンネル読み取りコマンド: リーダライタの送信周波数チャンネルを読み取り
+        'UHF_READ_FREQ_CH': build_command(0x55, 0x43, bytes([0x02, 0x00]), address),
+        # UHFブザー制御コマンド:応答要求＋ピー音
+        'UHF_BUZZER_pi': build_command(BUZ[0], 0x01, bytes([0x00]), address),
+        # UHFブザー制御コマンド:応答要求＋ピッピッピ音
+        'UHF_BUZZER_pipipi': build_command(BUZ[0], 0x01, bytes([0x01]), address),
+        # UHF書き込みコマンド（一例）: RFタグへのデータ書き込み (このサンプルでは未使用)
+        # 書き込むデータを指定する場合は utr_writer.build_write_command()、一括書き込みは utr_writer.BatchWriter
+        'UHF_WRITE': build_command(0x55, 0x16, bytes([0x01, 0x00, 0x00, 0x00, 0x02, 0x04, 0x56]), address),
+    }
+
+
+# UTR用 シリアル送信コマンドの定義 (アドレス 00h)
+# 各コマンドはバイト列として定義されており、そのまま送信可能
+COMMANDS = build_commands()
+
+# 出力チャンネルと周波数のマッピングリスト (MHz)
+OUTPUT_CH_FREQ_LIST = [916.0, 916.2, 916.4, 916.6, 916.8, 917.0, 917.2, 917.4, 917.6, 917.8, 918.0, 918.2, 918.4, 918.6, 918.8, 919.0, 919.2, 919.4, 919.6, 919.8, 920.0, 920.2, 920.4, 920.6, 920.8, 921.0, 921.2, 921.4, 921.6, 921.8, 922.0, 922.2, 922.4, 922.6, 922.8, 923.0, 923.2, 923.4]
+
+#【受信フレーム】
+# FrameReceiverで確認済み(STX, ETX, SUM, CR)のフレーム1つ分。
+# フレームのバイト列を1つだけ持ち、データ部はコピーせずにmemoryviewで参照する。
+class Frame:
+    """
+    確認済みの応答フレーム (STXからCRまで)。
+
+    Attributes:
+        raw (bytes): フレームのバイト列 (STXからCRまで)。
+        command (int): コマンド (例: 0x30 ACK, 0x31 NACK, 0x6C インベントリ応答)。
+        detail (Optional[int]): 詳細コマンド (データ部の1バイト目、データ部が無い場合はNone)。
+    """
+
+    __slots__ = ('raw', 'command', 'detail')
+
+    def __init__(self, raw: bytes) -> None:
+        self.raw = raw
+        self.command = raw[CMD_LOCATION]
+        self.detail = raw[DETAIL_LOCATION] if len(raw) > HEADER_LENGTH + FOOTER_LENGTH else None
+
+    @property
+    def address(self) -> int:
+        """アドレス (2バイト目)。"""
+        return self.raw[1]
+
+    @property
+    def payload(self) -> memoryview:
+        """詳細コマンドより後のデータ部 (コピーせずに参照)。"""
+        return memoryview(self.raw)[DETAIL_LOCATION + 1:-FOOTER_LENGTH]
+
+    def is_end(self) -> bool:
+        """ACK/NACK (応答の最後のフレーム) であればTrue。"""
+        return self.command == ACK[0] or self.command == NACK[0]
+
+    def __bytes__(self) -> bytes:
+        return self.raw
+
+    def __len__(self) -> int:
+        return len(self.raw)
+
+    def __repr__(self) -> str:
+        detail = 'None' if self.detail is None else f"0x{self.detail:02X}"
+        return f"Frame(command=0x{self.command:02X}, detail={detail}, raw={self.raw.hex().upper()})"
+
+
+#【受信バッファ】
+# 受信したバイト列をbytearrayにまとめて溜め込み、STX～CRのフレームを
+# オフセット(開始位置, 終了位置)で切り出す。
+# リストのスライス(receive_buffer[1:] など)でバッファを作り直さないため、
+# タグ枚数が多い場合でもCPU負荷が小さくなる。
+class FrameReceiver:
+    """
+    受信データからSTX～CRの完全なフレームをオフセットで切り出す受信バッファ。
+    feed()で受信バイト列を追加し、next_frame()でSTX, ETX, SUM, CRの確認済みの
+    フレーム位置を1つずつ取り出す。フレームの内容はview()でコピーせずに参照する。
+    pop_frame()/frames()は、確認済みのフレームをFrameとして1回ずつ返す。
+    communicate()、received_data_parse()、utr_stream、utr_async はいずれもこの受信バッファで
+    フレームを確認し、以降の処理ではSUM値などを再確認しない。
+    """
+
+    # 解析済み領域がこのバイト数を超えたら、バッファの先頭を詰める
+    COMPACT_THRESHOLD = 4096
+
+    def __init__(self) -> None:
+        self._buffer = bytearray()  # 受信バイトを保持するバッファ
+        self._start = 0             # 未解析データの先頭位置
+        self._wait_end = 0          # 受信待ち中のフレームの終了位置 (揃うまで再解析しない)
+        self.received_bytes = 0     # 受信したバイト数 (累計)
+        self.discarded_bytes = 0    # 再同期のために読み飛ばしたバイト数 (累計)
+        self.sum_errors = 0         # SUM値が一致しなかった回数 (累計)
+        self.etx_errors = 0         # ETXの位置にETXが無かった回数 (累計)
+        self.cr_errors = 0          # 最後位がCRでなかった回数 (累計)
+
+    def __len__(self) -> int:
+        """未解析のバイト数を返す。"""
+        return len(self._buffer) - self._start
+
+    def feed(self, data: bytes) -> None:
+        """
+        受信したバイト列をバッファの末尾に追加する。
+
+        Args:
+            data (bytes): 受信したバイト列。
+        """
+        # 解析済み領域が大きくなった(または全て解析済みの)場合のみ先頭を詰める
+        if self._start and (self._start >= self.COMPACT_THRESHOLD or self._start == len(self._buffer)):
+            del self._buffer[:self._start]
+            self._wait_end = max(0, self._wait_end - self._start)
+            self._start = 0
+        self._buffer += data
+        self.received_bytes += len(data)
+
+    def clear(self) -> None:
+        """バッファを空にする。"""
+        del self._buffer[:]
+        self._start = 0
+        self._wait_end = 0
+
+    def next_frame(self) -> Optional[Tuple[int, int]]:
+        """
+        バッファから次の完全なフレームを探し、その位置を返す。
+        STX, ETX, SUM, CRのいずれかが正しくない場合は先頭バイトを読み飛ばして再同期する。
+
+        Returns:
+            Optional[Tuple[int, int]]: フレームの (開始位置, 終了位置)。
+                                       完全なフレームがまだ無い場合はNone。
+        """
+        buffer = self._buffer
+        buffer_length = len(buffer)
+
+        # 受信待ち中のフレームがまだ揃っていなければ、再解析せずに戻る
+        if buffer_length < self._wait_end:
+            return None
+
+        while True:
+            # STX(0x02)を探索し、それより前のデータは読み飛ばす
+            start = buffer.find(STX, self._start)
+            if start < 0:
+                self.discarded_bytes += buffer_length - self._start
+                self._start = buffer_length
+                return None
+            self.discarded_bytes += start - self._start
+            self._start = start
+
+            # ヘッダー(4バイト)が揃っていなければ、受信を継続
+            if buffer_length - start < HEADER_LENGTH:
+                return None
+
+            # データ長(4バイト目)から、フレーム全体の終了位置を算出
+            end = start + buffer[start + HEADER_LENGTH - 1] + HEADER_LENGTH + FOOTER_LENGTH
+            # フレーム全体が揃っていなければ、受信を継続
+            if buffer_length < end:
+                self._wait_end = end
+                return None
+
+            # CR, ETX, SUMの確認
+            if buffer[end - 1] != CR[0]:
+                self.cr_errors += 1
+            elif buffer[end - FOOTER_LENGTH] != ETX[0]:
+                self.etx_errors += 1
+            else:
+                # verify_sum_value() と同じ確認 (フレームを切り出さずにバッファ上で合計する)
+                with memoryview(buffer) as view:
+                    sum_ok = (sum(view[start:end - 2]) & 0xFF) == buffer[end - 2]
+                if sum_ok:
+                    self._start = end
+                    return start, end
+                self.sum_errors += 1
+
+            # CR, ETX, SUMのいずれかが違ったので先頭バイトを読み飛ばし、再同期を試みる
+            self.discarded_bytes += 1
+            self._start = start + 1
+
+    def view(self, start: int, end: int) -> memoryview:
+        """
+        next_frame()で得たフレームをコピーせずに参照するmemoryviewを返す。
+        バッファのサイズを変更するため、次のfeed()の前に必ず解放(release)すること。
+        (with文で使用すると自動的に解放される)
+
+        Args:
+            start (int): フレームの開始位置。
+            end (int): フレームの終了位置。
+
+        Returns:
+            memoryview: フレーム (STXからCRまで) を参照するmemoryview。
+        """
+        return memoryview(self._buffer)[start:end]
+
+    def pop_frame(self) -> Optional[Frame]:
+        """
+        次の完全なフレームをFrameとして返す。
+
+        Returns:
+            Optional[Frame]: 確認済みのフレーム。完全なフレームがまだ無い場合はNone。
+        """
+        frame_span = self.next_frame()
+        if frame_span is None:
+            return None
+        start, end = frame_span
+        return Frame(bytes(self._buffer[start:end]))
+
+    def frames(self) -> Iterator[Frame]:
+        """
+        バッファ内の完全なフレームを、Frameとして順に返す。
+
+        Yields:
+            Frame: 確認済みのフレーム。
+        """
+        while True:
+            frame = self.pop_frame()
+            if frame is None:
+                return
+            yield frame
+
+
+class ReaderReconnected(Exception):
+    """
+    受信中にシリアルポートを開き直した (utr_session.ReaderSession が送出する)。
+    送信したコマンドの応答は失われているため、communicate_frames() はコマンドを送り直す。
+    """
+
+
+#【シリアルデータ通信関数】
+# データ送信後に、受信データ解析を実施
+# 制御フロー参照: https://www.product.takaya.co.jp/dcms_media/other/TDR-OTH-PROGRAMMING-103.pdf
+# タイムアウトもしくは、ACK, NACKを受信したらループを抜ける
+# 受信待ちはOS側で行う(シリアルのタイムアウトを READ_WAIT_STEP 秒に設定して読み取り)ため、CPUを占有しない。
+# シリアルのタイムアウトの設定 (tcsetattr/SetCommTimeouts) は1回の通信につき、最初と期限の直前の最大2回だけ行う。
+# 経過時間は time.monotonic() で計測する(時刻の変更の影響を受けない)。
+# 受信データが多い(たくさんのタグ:30枚以上を読み取りする場合など)は、
+# タイムアウト時間を多くする必要あり。InventoryTimeoutで読み取り枚数に応じて調整できる。
+READ_WAIT_STEP = 0.02   # 受信データが無いときに1回の読み取りで待機する最大時間（秒）
+
+
+def communicate_frames(ser: serial.Serial, command: bytes, timeout: float = 1.0) -> List[Frame]:
+    """
+    コマンドをシリアルポートに送信し、応答を受信して解析する。
+    受信済みのデータをまとめて読み取り、FrameReceiverでフレーム(STX, CR, ETX, SUM)を
+    確認しながら、正常なレスポンスフレームを受信順に返す。
+    ACK/NACKを受信するか、タイムアウトが発生したら処理を終了する。
+
+    Args:
+        ser (serial.Serial): シリアル通信オブジェクト。
+        command (bytes): 送信するコマンドバイト列。
+        timeout (float): 受信タイムアウト時間（秒）。デフォルトは1秒。
+
+    Returns:
+        List[Frame]: 受信した確認済みのフレーム。ACK/NACKを受信した場合は、最後がACK/NACK。
+    """
+    frames: List[Frame] = []        # 解析後の正常レスポンス
+    receiver = FrameReceiver()      # 受信バイトを一時的に保持するバッファ
+    metrics = utr_metrics.METRICS   # 計測 (無効ならNone)
+    end_frame: Optional[Frame] = None  # 受信したACK/NACKのフレーム
+
+    # タイムアウトの期限（単調増加する時計で計測）
+    start_time = time.monotonic()
+    deadline = start_time + timeout
+
+    if ser is None:
+        # 送受信なし: タイムアウトまで待機
+        time.sleep(timeout)
+        print("タイムアウト: レスポンスが一定時間内に受信されませんでした。")
+        if metrics is not None:
+            metrics.inc('timeouts')
+        return frames
+
+    # コマンド送信 (上位 -> RW)
+    ser.write(command)
+
+    # 待機の時間は固定し、期限の直前の1回だけ残り時間に縮める (期限を過ぎて待機しないように)
+    original_timeout = ser.timeout
+    wait_step = min(timeout, READ_WAIT_STEP)
+    if original_timeout != wait_step:
+        ser.timeout = wait_step
+    last_step = False   # 残り時間に縮めた後ならTrue
+    try:
+        # シリアル受信、データ解析処理
+        while True:
+            # タイムアウト処理
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                print("タイムアウト: レスポンスが一定時間内に受信されませんでした。")
+                return frames
+            if remaining < wait_step and not last_step:
+                ser.timeout = remaining
+                last_step = True
+
+            try:
+                waiting = ser.in_waiting
+                if waiting:
+                    # 受信バッファにあるデータをまとめて読み取り
+                    chunk = ser.read(waiting)
+                else:
+                    # 受信データが無ければ、データが届くか wait_step 秒経つまでOS側で待機
+                    chunk = ser.read(1)
+            except ReaderReconnected:
+                # 開き直す前に受信した分は破棄し、コマンドを送り直す (タイムアウトも数え直す)
+                frames.clear()
+                receiver = FrameReceiver()
+                deadline = time.monotonic() + timeout
+                if last_step:
+                    ser.timeout = wait_step
+                    last_step = False
+                ser.write(command)
+                continue
+            if not chunk:
+                continue
+            receiver.feed(chunk)
+
+            # 受信バッファ内の完全なフレームを順に取り出す
+            for frame in receiver.frames():
+                frames.append(frame)
+                # ACK, NACK受信していたら抜ける
+                if frame.is_end():
+                    end_frame = frame
+                    return frames
+    finally:
+        # シリアルのタイムアウト設定を元に戻す
+        if ser.timeout != original_timeout:
+            ser.timeout = original_timeout
+        # 計測が有効なら、受信結果を記録 (1回の通信につき1回のみ)
+        if metrics is not None:
+            _record_communicate_metrics(metrics, command, receiver, len(frames), end_frame,
+                                        time.monotonic() - start_time)
+
+
+# コマンドを送信し、応答をバイト列で返す
+def communicate(ser: serial.Serial, command: bytes, timeout: float = 1.0) -> bytes:
+    """
+    コマンドをシリアルポートに送信し、応答を受信して解析する。
+    communicate_frames() で確認した正常なレスポンスフレームを連結して返す。
+    ACK/NACKを受信するか、タイムアウトが発生したら処理を終了する。
+
+    Args:
+        ser (serial.Serial): シリアル通信オブジェクト。
+        command (bytes): 送信するコマンドバイト列。
+        timeout (float): 受信タイムアウト時間（秒）。デフォルトは1秒。
+
+    Returns:
+        bytes: 受信した完全な応答フレームのバイト列。
+    """
+    return b''.join([frame.raw for frame in communicate_frames(ser, command, timeout)])
+
+
+# communicate() 1回分の受信結果を計測値に記録する
+def _record_communicate_metrics(metrics: 'utr_metrics.Metrics', command: bytes, receiver: FrameReceiver,
+                                frame_count: int, end_frame: Optional[Frame], elapsed: float) -> None:
+    metrics.inc('bytes_received', receiver.received_bytes)
+    metrics.inc('frames_parsed', frame_count)
+    metrics.inc('resync_discarded_bytes', receiver.discarded_bytes)
+    for error_type, count in (('sum', receiver.sum_errors), ('etx', receiver.etx_errors),
+                              ('cr', receiver.cr_errors)):
+        if count:
+            metrics.inc('frame_errors', count, error_type)
+
+    if end_frame is None:
+        metrics.inc('timeouts')
+        return
+
+    if end_frame.command == NACK[0]:
+        # NACKのエラーコードを、parse_nack_response() の名称で数える
+        message = parse_nack_response(end_frame.raw)
+        if ':' in message:
+            metrics.inc('nack', 1, message.split(':')[0])
+        else:
+            metrics.inc('nack', 1, f"0x{end_frame.raw[ERROR_CODE_LOCATION]:02X}"
+                        if len(end_frame) > ERROR_CODE_LOCATION else 'invalid')
+
+    # コマンド送信からACK/NACK受信までの時間 (コマンド+詳細コマンド別)
+    label = command[CMD_LOCATION:DETAIL_LOCATION + 1:2].hex().upper()
+    metrics.observe('command_latency_seconds', elapsed, label)
+
+
+#【インベントリのタイムアウト調整】
+# インベントリ応答は読み取ったタグの枚数分のフレームが続くため、
+# 固定のタイムアウト(1秒)ではタグが多いときに受信しきれない。
+# 前回のACKで通知された読み取り枚数と、ボーレートから必要な受信時間を見積もる。
+INVENTORY_FRAME_BYTES = 26   # インベントリ応答(0x6C)1フレームのバイト数の目安 (PC+UII 14バイトの場合)
+INVENTORY_TIME_MARGIN = 2.0  # 見積もった受信時間に掛ける余裕
+
+
+# インベントリのタイムアウト時間を見積もる
+def estimate_inventory_timeout(expected_count: int, baud_rate: int, base_timeout: float = 1.0) -> float:
+    """
+    読み取り枚数とボーレートから、インベントリ応答を受信しきるまでのタイムアウト時間を見積もる。
+
+    Args:
+        expected_count (int): 読み取り枚数 (インベントリACKで通知された値)。
+        baud_rate (int): ボーレート。
+        base_timeout (float): タグが無い場合のタイムアウト時間（秒）。
+
+    Returns:
+        float: タイムアウト時間（秒）。
+    """
+    # 1バイト = スタートビット + 8ビット + ストップビット = 10ビット
+    transfer_time = expected_count * INVENTORY_FRAME_BYTES * 10 / baud_rate
+    return base_timeout + transfer_time * INVENTORY_TIME_MARGIN
+
+
+class InventoryTimeout:
+    """
+    インベントリのタイムアウト時間を、直前の読み取り枚数に合わせて調整する。
+    ACKを受信できなかった(タイムアウトした)場合は、上限まで2倍ずつ延長する。
+
+    Attributes:
+        value (float): 次のインベントリで使うタイムアウト時間（秒）。
+    """
+
+    def __init__(self, baud_rate: int, base_timeout: float = 1.0, max_timeout: float = 30.0) -> None:
+        self.baud_rate = baud_rate
+        self.base_timeout = base_timeout
+        self.max_timeout = max_timeout
+        self.value = base_timeout
+
+    def update(self, expected_count: Optional[int]) -> float:
+        """
+        インベントリACKの読み取り枚数から、次のタイムアウト時間を更新する。
+
+        Args:
+            expected_count (Optional[int]): 読み取り枚数。ACKを受信できなかった場合はNone。
+
+        Returns:
+            float: 更新後のタイムアウト時間（秒）。
+        """
+        if expected_count is None:
+            self.value = min(self.value * 2, self.max_timeout)
+        else:
+            self.value = min(estimate_inventory_timeout(expected_count, self.baud_rate, self.base_timeout),
+                             self.max_timeout)
+        return self.value
+
+
+# インベントリ応答(0x6C)のPC+UIIのバイト数を、データ長(LEN)と照合して取り出す
+def inventory_pc_uii_length(data_frame: bytes) -> Optional[int]:
+    """
+    インベントリ応答 (0x6C) 1フレームのPC+UIIのバイト数を返す。
+    SUM値が正しくても、PC+UIIのバイト数の位置までデータが無いフレームや、
+    PC+UIIがデータ部 (データ長 LEN の範囲) に収まらないフレームはNoneを返す。
+
+    Args:
+        data_frame (bytes): 確認済みのインベントリ応答フレーム（STXからCRまで）。
+
+    Returns:
+        Optional[int]: PC+UIIのバイト数。フレームの長さが合わない場合はNone。
+    """
+    if len(data_frame) < HEADER_LENGTH + FOOTER_LENGTH:
+        return None
+    # データ部の終わり (ETXの位置)
+    data_end = min(HEADER_LENGTH + data_frame[HEADER_LENGTH - 1], len(data_frame) - FOOTER_LENGTH)
+    if data_end < PC_UII_LOCATION:
+        return None
+    pc_uii_length = data_frame[PC_UII_LEN_LOCATION]
+    if PC_UII_LOCATION + pc_uii_length > data_end:
+        return None
+    return pc_uii_length
+
+
+# インベントリのレスポンスデータ(コマンドが0x6C)から、PC_UIIデータと、RSSI値を切り出す
+def handle_inventory_response(data_frame: bytes, pc_uii_list: List[bytes], rssi_list: List[float]) -> bool:
+    """
+    インベントリのレスポンス1フレームからPC+UIIデータとRSSI値を抽出し、リストに格納する。
+    PC+UIIのバイト数がデータ長と合わないフレームは格納しない。
+
+    Args:
+        data_frame (bytes): 受信したデータフレーム（STXからCRまで）。
+        pc_uii_list (List[bytes]): 抽出したPC+UIIデータを格納するリスト。
+        rssi_list (List[float]): 抽出したRSSI値を格納するリスト。
+
+    Returns:
+        bool: 格納した場合はTrue、フレームの長さが合わず読み飛ばした場合はFalse。
+    """
+    # [インベントリ ACKレスポンス フォーマット]
+    #  STX      0x02
+    #  アドレス  0x00 #固定では無い
+    #  コマンド  0x6C
+    #  データ長  5 + n
+    #  データ部  0x09   1バイト 詳細コマンド
+    #           RSSI   2バイト
+    #           RSSI
+    #           ANGLE  1バイト
+    #           n      1バイト　PC+UIIのバイト数
+    #           PC+UII nバイト
+    #  ETX      0x03
+    #  SUM      SUM
+    #  CR       0x0D
+
+    # 9バイト目の 'n' をPC+UIIのバイト数に入力 (データ長と合わなければ読み飛ばす)
+    pc_uii_length = inventory_pc_uii_length(data_frame)
+    if pc_uii_length is None:
+        return False
+    # pc_uii_lengthの長さだけデータをスライス（切り出し）します
+    pc_uii_data = data_frame[PC_UII_LOCATION:PC_UII_LOCATION + pc_uii_length]
+
+    # 切り出したデータをリストへ追加
+    pc_uii_list.append(pc_uii_data)
+
+    # RSSI値の計算 (フレームの6バイト目と7バイト目、RSSI_LOCATION から2バイトを使用)
+    rssi_value = decode_rssi(data_frame)
+    # RSSI値をリストへ追加
+    rssi_list.append(rssi_value)
+    return True
+
+
+# インベントリ時のACKのレスポンスデータから読み取り枚数を取得する。
+def check_inventory_ack_response(data_frame: bytes) -> int:
+    """
+    インベントリ時のACK応答フレームから、期待される読み取り枚数を抽出して返す。
+
+    Args:
+        data_frame (bytes): 受信したACK応答フレーム。
+
+    Returns:
+        int: 期待される読み取り枚数。
+    """
+    # 7バイト目と8バイト目（READ_COUNT_LOCATION から2バイト）が読み取り枚数
+    # リトルエンディアンの順序で整数に変換
+    read_count = int.from_bytes(data_frame[READ_COUNT_LOCATION:READ_COUNT_LOCATION + 2], byteorder='little')
+    return read_count
+
+
+# データフレームを解析し、STX-ETX-SUM-CRまでを抜き出す
+def parse_data_frame(data: bytes, index: int) -> Tuple[Optional[bytes], int]:
+    """
+    受信したデータバイト列から、STXからCRまでの完全な1フレームを抽出する。
+
+    Args:
+        data (bytes): 受信したデータバイト列。
+        index (int): 現在の解析開始位置。
+
+    Returns:
+        Tuple[Optional[bytes], int]: 
+            - 抽出されたフレーム (bytes)。完全なフレームが見つからない場合はNone。
+            - 次の解析開始位置 (int)。
+    """
+    # フレームの最小長をチェック (ヘッダー長 + フッター長)
+    if len(data) >= (index + HEADER_LENGTH + FOOTER_LENGTH):
+        # 4バイト目のデータ長を確認し、フレーム全体の長さを算出
+        data_length_in_frame = data[index + 3] # フレーム内のデータ長フィールド
+        total_frame_len = data_length_in_frame + HEADER_LENGTH + FOOTER_LENGTH
+
+        # フレーム全体がバッファに存在するかを確認
+        if len(data) >= (index + total_frame_len):
+            # データの最後がCR(0x0D)であれば
+            if data[(index + total_frame_len) - 1] == CR[0]:
+                # 解析したデータフレームと次の開始位置を戻す
+                return data[index:(index + total_frame_len)], (index + total_frame_len)
+
+    # データが短かったり、完全なフレームが見つからない場合は、元の開始位置のみを返す
+    return None, index
+
+
+# 確認済みのフレームの中からタグの情報などを抜き出す
+# インベントリコマンド用 (communicate_frames() の戻り値をそのまま渡せる)
+def parse_inventory_frames(frames: Iterable[Frame]) -> Tuple[List[bytes], List[float], Optional[int]]:
+    """
+    確認済みのフレームから、インベントリ結果を解析する。
+    フレームはFrameReceiverで確認済みのため、SUM値などは再確認しない。
+    PC+UIIのバイト数がデータ長と合わないインベントリ応答は読み飛ばす (例外にはしない)。
+    PC+UIIリスト、RSSIリスト、期待される読み取り枚数を抽出する。
+
+    Args:
+        frames (Iterable[Frame]): 確認済みのフレーム。
+
+    Returns:
+        Tuple[List[bytes], List[float], Optional[int]]: 
+            - pc_uii_list (List[bytes]): 読み取られたPC+UIIデータのリスト。
+            - rssi_list (List[float]): 読み取られたRSSI値のリスト。
+            - expected_read_count (Optional[int]): 期待される読み取りタグ数 (ACKフレームから取得)。
+    """
+    pc_uii_list: List[bytes] = []  # UII格納用
+    rssi_list: List[float] = []  # RSSI値格納用
+    expected_read_count: Optional[int] = None   # ACKレスポンスから取得した読み取り枚数
+    short_frames = 0   # PC+UIIのバイト数がデータ長と合わず読み飛ばしたフレーム数
+
+    for frame in frames:
+        command = frame.command
+        if command == INV[0]:
+            # コマンドがインベントリ応答 (0x6C) なら、タグ情報として処理
+            if not handle_inventory_response(frame.raw, pc_uii_list, rssi_list):
+                short_frames += 1
+
+        elif command == ACK[0]:
+            # コマンドがACK (0x30) なら、ACKの応答として処理
+            if frame.detail == DETAIL_INV[0]:
+                # 詳細コマンドがインベントリACK (0x10) なら、読み取り枚数を取得
+                expected_read_count = check_inventory_ack_response(frame.raw)
+            # else: 他のACK応答はここでは特に処理しない
+
+        elif command == NACK[0]:
+            # コマンドがNACK (0x31) なら、NACKの応答として処理
+            print(parse_nack_response(frame.raw)) # NACKエラーメッセージを表示
+
+    report_inventory_result(expected_read_count, len(pc_uii_list), short_frames)
+
+    # 解析したデータ(タグIDなど）を返す
+    return pc_uii_list, rssi_list, expected_read_count
+
+
+# 1回のインベントリの解析結果を計測値に記録し、不整合があれば表示する
+def report_inventory_result(expected_read_count: Optional[int], tag_count: int, short_frames: int = 0) -> None:
+    """
+    インベントリACKの読み取り枚数と、解析したタグ数を照合する。
+    parse_inventory_frames() と utr_responses.parse_inventory_tags() で共通に使用する。
+
+    Args:
+        expected_read_count (Optional[int]): インベントリACKの読み取り枚数 (ACKが無ければNone)。
+        tag_count (int): 解析したタグ数。
+        short_frames (int): PC+UIIのバイト数がデータ長と合わず読み飛ばしたフレーム数。
+    """
+    # 計測が有効なら、1回のインベントリで読み取ったタグ数を記録
+    metrics = utr_metrics.METRICS
+    if metrics is not None and short_frames:
+        metrics.inc('frame_errors', short_frames, 'length')
+    if metrics is not None and expected_read_count is not None:
+        metrics.observe('inventory_tags', tag_count)
+        if expected_read_count != tag_count:
+            metrics.inc('read_count_mismatch')
+
+    if short_frames:
+        print(f"PC+UIIのバイト数がデータ長と合わないフレームを読み飛ばしました ({short_frames} フレーム)")
+
+    # 期待される読み取り枚数と実際に読み取った枚数が一致しない場合の警告
+    if expected_read_count is not None:
+        if expected_read_count != tag_count:
+            # 以下、(受信経路や上位のノイズなどで)受信データの不整合が
+            # 発生したときに表示されます。(デバッグコードではありません)
+            print("タグの読み取り数とpc_uii_listの個数が一致しません")
+            print("タグの読み取り予定数: ", expected_read_count)
+            print("pc_uii_listの個数   : ",  tag_count)
+
+
+# シリアル受信したデータ(受信解析後)の中からタグの情報などを抜き出す
+# インベントリコマンド用
+def received_data_parse(data: bytes) -> Tuple[List[bytes], List[float], Optional[int]]:
+    """
+    受信したバイト列から複数のフレームを走査し、インベントリ結果を解析する。
+    フレームの確認はFrameReceiver (communicate()と同じ受信バッファ) で行い、
+    SUM値などが正しくないフレームは読み飛ばして、後続のフレームの解析を続ける。
+
+    Args:
+        data (bytes): 受信した生のデータバイト列。
+
+    Returns:
+        Tuple[List[bytes], List[float], Optional[int]]: 
+            - pc_uii_list (List[bytes]): 読み取られたPC+UIIデータのリスト。
+            - rssi_list (List[float]): 読み取られたRSSI値のリスト。
+            - expected_read_count (Optional[int]): 期待される読み取りタグ数 (ACKフレームから取得)。
+    """
+    receiver = FrameReceiver()
+    receiver.feed(data)
+    frames = list(receiver.frames())
+
+    if receiver.sum_errors:
+        print("サム値が正しくありません（正しくないフレームを読み飛ばしました）")
+    if len(receiver):
+        print("データがありません、または不完全なフレームです")
+
+    return parse_inventory_frames(frames)
+
+
+# NACK応答時のエラー解析(初歩、一例) 全部は網羅してません。
+def parse_nack_response(nack_response: bytes) -> str:
+    """
+    NACK応答フレームのエラーコードを解析し、対応するエラーメッセージを返す。
+
+    Args:
+        nack_response (bytes): 受信したNACK応答フレーム。
+
+    Returns:
+        str: エラーメッセージ。
+    """
+    if len(nack_response) < (HEADER_LENGTH + FOOTER_LENGTH):
+        return "Invalid NACK response" # NACK応答フレームが短すぎる場合
+
+    # エラーコードを取得 (通常はフレームの6バイト目、インデックス5)
+    error_code = nack_response[ERROR_CODE_LOCATION]
+
+    error_messages = {
+        0x01: "CMD_CRC_ERROR: データのCRCが一致しない",
+        0x02: "CMD_TIME_OVER: データが途中で途切れた",
+        0x03: "CMD_RX_ERROR: アンチコリジョン処理中にエラー",
+        0x04: "CMD_RXBUSY_ERROR: RFタグからの応答がない",
+        0x07: "CMD_ERROR: コマンド実行中にリーダライタ内部でエラー",
+        0x0A: "CMD_UHF_IC_ERROR: RFタグアクセス時の内蔵チップエラー",
+        0x60: "CMD_LBT_ERROR: キャリアセンス時のタイムアウトエラー",
+        0x64: "HARDWARE_ERROR: ハードウェア内部で異常が発生",
+        0x68: "CMD_ANT_ERROR: アンテナ断線検知エラー",
+        0x42: "SUM_ERROR: 上位機器から送信されたコマンドのSUM値が正しくない",
+        0x44: "FORMAT_ERROR: 上位機器から送信されたコマンドのフォーマットまたはパラメータが正しくない",
+    }
+
+    return error_messages.get(error_code, f"Unknown NACK error (0x{error_code:02X})")
+
+
+# サム値を検証する。
+def verify_sum_value(data_frame: bytes) -> bool:
+    """
+    データフレーム内のチェックサムが正しいか検証する。
+    STXからETXまでの合計値と、データ内にあるSUM値が一致するかを確認する。
+
+    Args:
+        data_frame (bytes): 検証するデータフレーム（STXからCRまで）。
+
+    Returns:
+        bool: チェックサムが正しい場合はTrue、そうでない場合はFalse。
+    """
+    # フレームの最後から2番目のバイトが期待されるSUM値
+    sum_location = len(data_frame) - 2
+
+    # STXからETXまでのバイトの合計を計算 (memoryviewの場合はコピーせずに合計する)
+    return data_frame[sum_location] == (sum(data_frame[:sum_location]) & 0xFF)
+
+
+# 複数フレームのSUM値をまとめて検証する
+def verify_sum_values(frames: Iterable[bytes]) -> List[bool]:
+    """
+    複数のフレームのチェックサムをまとめて検証する。verify_sum_value() を順に呼んだ結果と同じ。
+
+    Args:
+        frames (Iterable[bytes]): 検証するデータフレーム (STXからCRまで、bytes/bytearray/memoryview)。
+
+    Returns:
+        List[bool]: フレームごとの検証結果。
+    """
+    return [frame[len(frame) - 2] == (sum(frame[:len(frame) - 2]) & 0xFF) for frame in frames]
+
+
+# RSSI値計算
+def convert_rssi(rssi_hex_value: str) -> float:
+    """
+    RSSI値(無線信号強度の指標)を計算する。
+    レスポンスの6〜7バイト目を符号付き16ビットとして扱い、
+    10進数に変換してから10で割る。
+    ※詳しくは、プロトコル仕様書を参照
+
+    Args:
+        rssi_hex_value (str): RSSIの16進数文字列（例: "FFC0"）。
+
+    Returns:
+        float: 変換されたRSSI値（dBm）。
+    """
+    # 16進数文字列を整数に変換
+    rssi_int = int(rssi_hex_value, 16)
+
+    # 16ビット符号付き整数として扱う
+    if rssi_int & 0x8000:  # 最上位ビットが1の場合（負の数）
+        rssi_int = -(0x10000 - rssi_int)
+
+    # 10で割ってdBm値に変換
+    return rssi_int / 10.0
+
+
+# RSSI (符号付き16ビット、ビッグエンディアン)
+_RSSI_FORMAT = struct.Struct('>h')
+
+
+# RSSI値をフレームから直接取り出す
+def decode_rssi(data_frame: bytes, location: int = RSSI_LOCATION) -> float:
+    """
+    インベントリ応答フレームからRSSI値を取り出す。
+    convert_rssi(data_frame[5:7].hex()) と同じ値を、16進数文字列を作らずに計算する。
+
+    Args:
+        data_frame (bytes): インベントリ応答フレーム (bytes/bytearray/memoryview)。
+        location (int): RSSIの位置。
+
+    Returns:
+        float: RSSI値（dBm）。
+    """
+    return _RSSI_FORMAT.unpack_from(data_frame, location)[0] / 10.0
+
+
+# 複数フレームのRSSI値をまとめて取り出す
+def decode_rssi_values(frames: Iterable[bytes], location: int = RSSI_LOCATION) -> List[float]:
+    """
+    複数のインベントリ応答フレームから、RSSI値をまとめて取り出す。decode_rssi() を順に呼んだ結果と同じ。
+
+    Args:
+        frames (Iterable[bytes]): インベントリ応答フレーム (bytes/bytearray/memoryview)。
+        location (int): RSSIの位置。
+
+    Returns:
+        List[float]: フレームごとのRSSI値（dBm）。
+    """
+    unpack_from = _RSSI_FORMAT.unpack_from
+    return [unpack_from(frame, location)[0] / 10.0 for frame in frames]
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+UTR-S201 シリーズ リーダライタ接続モジュール（無保証）
+
+【概要】
+シリアルポートを開き (open_reader)、インベントリを実行できる状態にする (handshake) 処理。
+utr_usb_sample.py、utr_session.py、utr_supervisor.py などから共通で使用する。
+
+【使用例】
+    ser = open_reader('COM3', 115200)
+    info = handshake(ser, verbose=False)
+    print(info.rom_version, info.output_power, info.channel)
+"""
+
+from typing import Optional
+
+import serial
+
+from utr_protocol   import (COMMANDS, DEFAULT_INVENTORY_PARAM, DETAIL_LOCATION, DETAIL_ROM, FOOTER_LENGTH,
+                            build_command, communicate, is_ack, is_nack, parse_nack_response)
+from utr_responses  import FrequencyChannel, OutputPower, RomVersion
+
+
+# シリアルポートを開く
+def open_reader(port_name: str, baud_rate: int = 19200) -> serial.Serial:
+    """
+    リーダライタのシリアルポートを開き、送受信バッファをクリアする。
+
+    Args:
+        port_name (str): ポート名 (例: 'COM3', '/dev/ttyUSB0')。
+        baud_rate (int): ボーレート。
+
+    Returns:
+        serial.Serial: シリアル通信オブジェクト。
+
+    Raises:
+        serial.SerialException: ポートを開けなかった場合。
+    """
+    # シリアルポートを開く (timeout=0 でノンブロッキング読み取り)
+    ser = serial.Serial(
+        port=port_name,
+        baudrate=baud_rate,
+        timeout=0,
+        bytesize=serial.EIGHTBITS,
+        parity=serial.PARITY_NONE,
+        stopbits=serial.STOPBITS_ONE,
+    )
+    ser.reset_input_buffer()  # 入力バッファをクリア
+    ser.reset_output_buffer() # 出力バッファをクリア
+    return ser
+
+
+class HandshakeError(Exception):
+    """
+    接続時の確認 (handshake) でACK/NACKを受信できなかった。
+
+    Attributes:
+        response (bytes): 受信した応答 (無ければ空)。
+    """
+
+    def __init__(self, message: str, response: bytes = b'') -> None:
+        super().__init__(message)
+        self.response = response
+
+
+class ReaderInfo:
+    """
+    接続時の確認 (handshake) で読み取ったリーダライタの情報。
+
+    Attributes:
+        rom_version (Optional[bytes]): ROMバージョン (NACKの場合はNone)。
+        output_power (Optional[float]): 送信出力値（dBm、NACKの場合はNone）。
+        channel (Optional[int]): 送信周波数チャンネル番号 (NACKの場合はNone)。
+        frequency (Optional[float]): 送信周波数（MHz、不明な場合はNone）。
+        inventory_param (Optional[bytes]): インベントリパラメータ (UHF_GET_INVENTORY_PARAM の応答、
+                                           設定した場合は設定後の値。NACKの場合はNone)。
+    """
+
+    __slots__ = ('rom_version', 'output_power', 'channel', 'frequency', 'inventory_param')
+
+    def __init__(self) -> None:
+        self.rom_version: Optional[bytes] = None
+        self.output_power: Optional[float] = None
+        self.channel: Optional[int] = None
+        self.frequency: Optional[float] = None
+        self.inventory_param: Optional[bytes] = None
+
+    def __repr__(self) -> str:
+        return (f"ReaderInfo(rom_version={self.rom_version!r}, output_power={self.output_power}, "
+                f"channel={self.channel}, frequency={self.frequency}, "
+                f"inventory_param={self.inventory_param.hex() if self.inventory_param is not None else None})")
+
+
+# 接続時の確認: ROMバージョン確認、コマンドモード切替、送信出力・周波数の読み取り、インベントリパラメータの取得/設定
+def handshake(ser: serial.Serial, verbose: bool = True, set_inventory_param: bool = True,
+              inventory_param: Optional[bytes] = None) -> ReaderInfo:
+    """
+    リーダライタとの通信を確認し、インベントリを実行できる状態にする。
+    各コマンドでNACKを受信した場合はエラー内容を表示して続行し、
+    ACK/NACKのどちらも受信できなかった場合は HandshakeError を送出する。
+    UHF_GET_INVENTORY_PARAM で読み取ったパラメータが設定する値と同じ場合は、
+    UHF_SET_INVENTORY_PARAM の送信を省略する。
+
+    Args:
+        ser (serial.Serial): シリアル通信オブジェクト。
+        verbose (bool): Trueなら、各コマンドの結果を表示する。
+        set_inventory_param (bool): Trueなら、UHF_SET_INVENTORY_PARAM を送信する。
+        inventory_param (Optional[bytes]): UHF_SET_INVENTORY_PARAM で設定するパラメータ (8バイト)。
+                                           Noneなら DEFAULT_INVENTORY_PARAM。
+
+    Returns:
+        ReaderInfo: 読み取ったリーダライタの情報。
+
+    Raises:
+        HandshakeError: ACK/NACKを受信できなかった場合。
+    """
+    report = print if verbose else (lambda *args: None)
+    info = ReaderInfo()
+
+    # --- ROMバージョンで通信確認 ---
+    # ROMバージョン確認コマンドを送信し、応答を待つ
+    result = communicate(ser, COMMANDS['ROM_VERSION_CHECK'])
+    # 応答がACKで、詳細コマンドがROMバージョン確認のものであるかチェック
+    if is_ack(result):
+        if bytes([result[DETAIL_LOCATION]]) == DETAIL_ROM:
+            info.rom_version = RomVersion(result).version
+            report("USB通信: OK（ROMバージョン ACK 受信）")
+    # 応答がNACKの場合
+    elif is_nack(result):
+        if bytes([result[DETAIL_LOCATION]]) == DETAIL_ROM:
+            report(parse_nack_response(result))
+    # その他の応答の場合
+    else:
+        raise HandshakeError("USB通信: NG（ACK/NACK なし）")
+
+    # --- コマンドモード切替 ---
+    # コマンドモード設定コマンドを送信
+    result = communicate(ser, COMMANDS['COMMAND_MODE_SET'])
+    if is_ack(result):
+        report("コマンドモードに切り替えました")
+    elif is_nack(result):
+        report(parse_nack_response(result))
+    else:
+        raise HandshakeError("コマンドモード切替に失敗しました")
+
+    # --- 出力/周波数の読み取り ---
+    # 出力電力の読み取り
+    result = communicate(ser, COMMANDS['UHF_READ_OUTPUT_POWER'])
+    if is_ack(result):
+        # 応答から出力レベルを抽出し、dBmに変換して表示 (8, 9バイト目、0.1dBm単位)
+        info.output_power = OutputPower(result).dbm
+        report("送信出力値：", info.output_power, "dBm")
+    elif is_nack(result):
+        report(parse_nack_response(result))
+    else:
+        raise HandshakeError("通信エラー（UHF_READ_OUTPUT_POWER）", result)
+
+    # 周波数チャンネルの読み取り
+    result = communicate(ser, COMMANDS['UHF_READ_FREQ_CH'])
+    if is_ack(result):
+        # 応答からチャンネル番号を抽出し、対応する周波数を表示 (8バイト目がチャンネル番号)
+        frequency_channel = FrequencyChannel(result)
+        info.channel = frequency_channel.channel
+        info.frequency = frequency_channel.frequency
+        report("チャンネル番号：", info.channel, "ch")
+        if info.frequency is not None:
+            report("送信周波数：", info.frequency, " MHz")
+    elif is_nack(result):
+        report(parse_nack_response(result))
+    else:
+        raise HandshakeError("通信エラー（UHF_READ_FREQ_CH）", result)
+
+    # --- インベントリパラメータ取得/設定（任意） ---
+    # インベントリパラメータ取得コマンドを送信
+    result = communicate(ser, COMMANDS['UHF_GET_INVENTORY_PARAM'])
+    if is_ack(result):
+        # 詳細コマンドより後がパラメータ
+        info.inventory_param = result[DETAIL_LOCATION + 1:-FOOTER_LENGTH]
+        report("UHF_GET_INVENTORY_PARAM が正常に実行されました")
+    elif is_nack(result):
+        report(parse_nack_response(result))
+    else:
+        raise HandshakeError("UHF_GET_INVENTORY_PARAM 実行エラー", result)
+
+    if inventory_param is None:
+        inventory_param = DEFAULT_INVENTORY_PARAM
+    if set_inventory_param and info.inventory_param == bytes(inventory_param):
+        report("インベントリパラメータは設定済みです（UHF_SET_INVENTORY_PARAM を省略）")
+    elif set_inventory_param:
+        # インベントリパラメータ設定コマンドを送信
+        result = communicate(ser, build_command(0x55, 0x30, bytes(inventory_param)))
+        if is_ack(result):
+            info.inventory_param = bytes(inventory_param)
+            report("UHF_SET_INVENTORY_PARAM が正常に実行されました")
+        elif is_nack(result):
+            report(parse_nack_response(result))
+        else:
+            raise HandshakeError("UHF_SET_INVENTORY_PARAM 実行エラー", result)
+
+    return info
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+UTR-S201 シリーズ 応答フレームのデータ型モジュール（無保証）
+
+【概要】
+応答フレーム (STXからCRまで) を、種類ごとの __slots__ のクラスで扱う。
+各クラスはフレームのバイト列(またはmemoryview)を1つ保持するだけで、
+RSSIやPC+UIIなどの値は、属性を参照したときに初めて取り出す (16進数文字列は作らない)。
+インベントリで多数のタグを受信しても、1タグあたりのオブジェクトは1つで済む。
+
+- InventoryTag      インベントリ応答 (0x6C): PC+UII, RSSI, ANGLE
+- InventoryAck      インベントリのACK (0x30 / 0x10): 読み取り枚数
+- Nack              NACK (0x31): エラーコード、エラーメッセージ
+- RomVersion        ROMバージョンのACK (0x30 / 0x90)
+- OutputPower       送信出力読み取りのACK (0x30 / 0x43 / 0x01)
+- FrequencyChannel  送信周波数チャンネル読み取りのACK (0x30 / 0x43 / 0x02)
+- InventoryParams   インベントリパラメータ取得のACK (0x30 / 0x41): パラメータ (8バイト)
+
+parse_inventory_tags() は、インベントリの応答全体を InventoryTag のリストと読み取り枚数に解析する
+(utr_pipeline、utr_async、utr_supervisor、utr_survey が使用)。
+
+【使用例】
+    for tag in iter_inventory_tags(communicate_frames(ser, COMMANDS['UHF_INVENTORY'])):
+        print(tag.pc_uii.hex().upper(), tag.rssi, tag.angle)
+
+    response = decode_frame(frame)   # 種類に応じたクラス (該当しなければFrameのまま)
+"""
+
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+from utr_protocol import (ACK, ANGLE_LOCATION, DETAIL_GET_INVENTORY_PARAM, DETAIL_INV, DETAIL_LOCATION,
+                          DETAIL_READ_SETTING, DETAIL_ROM, ERROR_CODE_LOCATION, FOOTER_LENGTH, INV, NACK,
+                          OUTPUT_CH_FREQ_LIST, PC_UII_LEN_LOCATION, PC_UII_LOCATION, RSSI_LOCATION, SETTING_FREQ_CH,
+                          SETTING_LOCATION, SETTING_OUTPUT_POWER, SETTING_VALUE_LOCATION, Frame,
+                          check_inventory_ack_response, decode_rssi, inventory_pc_uii_length, parse_nack_response,
+                          report_inventory_result)
+
+# フレームのバイト列 (コピーせずに参照する場合はmemoryview)
+FrameBytes = Union[bytes, bytearray, memoryview]
+
+
+class _FrameRecord:
+    """応答フレームのバイト列を1つ保持し、値は参照時に取り出す基底クラス。"""
+
+    __slots__ = ('raw',)
+
+    def __init__(self, raw: FrameBytes) -> None:
+        self.raw = raw
+
+    @classmethod
+    def from_frame(cls, frame: Frame):
+        """FrameReceiverで確認済みのFrameから作成する (フレームのバイト列はコピーしない)。"""
+        return cls(frame.raw)
+
+    @property
+    def data(self) -> memoryview:
+        """詳細コマンドより後のデータ部 (コピーせずに参照)。"""
+        return memoryview(self.raw)[DETAIL_LOCATION + 1:-FOOTER_LENGTH]
+
+
+class InventoryTag(_FrameRecord):
+    """
+    インベントリ応答 (0x6C) 1フレーム分のタグ情報。
+    PC+UIIのバイト数はデータ長と照合済みのフレーム (decode_frame()、iter_inventory_tags() の戻り値) を前提とする。
+    """
+
+    __slots__ = ()
+
+    @property
+    def pc_uii(self) -> bytes:
+        """PC+UIIデータ。"""
+        raw = self.raw
+        return bytes(raw[PC_UII_LOCATION:PC_UII_LOCATION + raw[PC_UII_LEN_LOCATION]])
+
+    @property
+    def pc_uii_view(self) -> memoryview:
+        """PC+UIIデータ (コピーせずに参照)。"""
+        raw = self.raw
+        return memoryview(raw)[PC_UII_LOCATION:PC_UII_LOCATION + raw[PC_UII_LEN_LOCATION]]
+
+    @property
+    def pc(self) -> int:
+        """PC (PC+UIIの先頭2バイト)。"""
+        return int.from_bytes(self.raw[PC_UII_LOCATION:PC_UII_LOCATION + 2], 'big')
+
+    @property
+    def rssi_raw(self) -> int:
+        """RSSI値 (符号付き、0.1dBm単位)。"""
+        return int.from_bytes(self.raw[RSSI_LOCATION:RSSI_LOCATION + 2], 'big', signed=True)
+
+    @property
+    def rssi(self) -> float:
+        """RSSI値（dBm）。decode_rssi() (convert_rssi() と同じ値) で変換する。"""
+        return decode_rssi(self.raw)
+
+    @property
+    def angle(self) -> int:
+        """ANGLEの値。"""
+        return self.raw[ANGLE_LOCATION]
+
+    def __repr__(self) -> str:
+        return f"InventoryTag(pc_uii={self.pc_uii.hex().upper()}, rssi={self.rssi}, angle={self.angle})"
+
+
+class InventoryAck(_FrameRecord):
+    """インベントリのACK (0x30 / 0x10)。"""
+
+    __slots__ = ()
+
+    @property
+    def read_count(self) -> int:
+        """読み取り枚数 (check_inventory_ack_response() で取り出す)。"""
+        return check_inventory_ack_response(self.raw)
+
+    def __repr__(self) -> str:
+        return f"InventoryAck(read_count={self.read_count})"
+
+
+class Nack(_FrameRecord):
+    """NACK (0x31)。"""
+
+    __slots__ = ()
+
+    @property
+    def detail(self) -> int:
+        """NACKの対象となった詳細コマンド。"""
+        return self.raw[DETAIL_LOCATION]
+
+    @property
+    def code(self) -> int:
+        """エラーコード。"""
+        return self.raw[ERROR_CODE_LOCATION]
+
+    @property
+    def message(self) -> str:
+        """エラーメッセージ (parse_nack_response() と同じ)。"""
+        return parse_nack_response(bytes(self.raw))
+
+    def __repr__(self) -> str:
+        return f"Nack(code=0x{self.code:02X}, message={self.message!r})"
+
+
+class RomVersion(_FrameRecord):
+    """ROMバージョンのACK (0x30 / 0x90)。"""
+
+    __slots__ = ()
+
+    @property
+    def version(self) -> bytes:
+        """ROMバージョン (詳細コマンドより後のデータ部)。"""
+        return bytes(self.data)
+
+    @property
+    def text(self) -> str:
+        """ROMバージョンの文字列 (表示できない文字は置き換え)。"""
+        return self.version.decode('ascii', errors='replace')
+
+    def __repr__(self) -> str:
+        return f"RomVersion({self.text!r})"
+
+
+class OutputPower(_FrameRecord):
+    """送信出力読み取りのACK (0x30 / 0x43 / 0x01)。"""
+
+    __slots__ = ()
+
+    @property
+    def dbm(self) -> float:
+        """送信出力値（dBm）。"""
+        return int.from_bytes(self.raw[SETTING_VALUE_LOCATION:SETTING_VALUE_LOCATION + 2], 'big') / 10.0
+
+    def __repr__(self) -> str:
+        return f"OutputPower(dbm={self.dbm})"
+
+
+class FrequencyChannel(_FrameRecord):
+    """送信周波数チャンネル読み取りのACK (0x30 / 0x43 / 0x02)。"""
+
+    __slots__ = ()
+
+    @property
+    def channel(self) -> int:
+        """チャンネル番号。"""
+        return self.raw[SETTING_VALUE_LOCATION]
+
+    @property
+    def frequency(self) -> Optional[float]:
+        """送信周波数（MHz）。OUTPUT_CH_FREQ_LIST に無いチャンネルの場合はNone。"""
+        channel = self.channel
+        return OUTPUT_CH_FREQ_LIST[channel - 1] if 1 <= channel <= len(OUTPUT_CH_FREQ_LIST) else None
+
+    def __repr__(self) -> str:
+        return f"FrequencyChannel(channel={self.channel}, frequency={self.frequency})"
+
+
+class InventoryParams(_FrameRecord):
+    """インベントリパラメータ取得のACK (0x30 / 0x41)。"""
+
+    __slots__ = ()
+
+    @property
+    def param(self) -> bytes:
+        """インベントリパラメータ (詳細コマンドより後のデータ部、UHF_SET_INVENTORY_PARAM と同じ形式)。"""
+        return bytes(self.data)
+
+    def __repr__(self) -> str:
+        return f"InventoryParams(param={self.param.hex()})"
+
+
+# 応答の種類に応じたクラスで返す
+def decode_frame(frame: Frame) -> Union[_FrameRecord, Frame]:
+    """
+    確認済みのフレームを、種類に応じたクラスで返す。
+
+    Args:
+        frame (Frame): FrameReceiverで確認済みのフレーム。
+
+    Returns:
+        Union[_FrameRecord, Frame]: InventoryTag, InventoryAck, Nack, RomVersion, OutputPower,
+                                    FrequencyChannel, InventoryParams のいずれか。
+                                    該当しない場合はFrameのまま。
+    """
+    command = frame.command
+    raw = frame.raw
+    if command == INV[0]:
+        # PC+UIIのバイト数がデータ長と合わないフレームはFrameのまま
+        return InventoryTag(raw) if inventory_pc_uii_length(raw) is not None else frame
+    if command == NACK[0]:
+        return Nack(raw)
+    if command == ACK[0]:
+        detail = frame.detail
+        if detail == DETAIL_INV[0]:
+            return InventoryAck(raw)
+        if detail == DETAIL_ROM[0]:
+            return RomVersion(raw)
+        if detail == DETAIL_GET_INVENTORY_PARAM:
+            return InventoryParams(raw)
+        if detail == DETAIL_READ_SETTING and len(raw) > SETTING_VALUE_LOCATION + FOOTER_LENGTH:
+            if raw[SETTING_LOCATION] == SETTING_OUTPUT_POWER:
+                return OutputPower(raw)
+            if raw[SETTING_LOCATION] == SETTING_FREQ_CH:
+                return FrequencyChannel(raw)
+    return frame
+
+
+# インベントリ応答のフレームだけをInventoryTagとして返す
+def iter_inventory_tags(frames: Iterable[Frame]) -> Iterator[InventoryTag]:
+    """
+    確認済みのフレームのうち、インベントリ応答 (0x6C) をInventoryTagとして順に返す。
+    PC+UIIのバイト数がデータ長と合わないフレーム (inventory_pc_uii_length() がNone) は読み飛ばす。
+
+    Args:
+        frames (Iterable[Frame]): 確認済みのフレーム (communicate_frames() の戻り値など)。
+
+    Yields:
+        InventoryTag: タグ情報 (値は参照時に取り出す)。
+    """
+    inv = INV[0]
+    for frame in frames:
+        if frame.command == inv and inventory_pc_uii_length(frame.raw) is not None:
+            yield InventoryTag(frame.raw)
+
+
+# インベントリの応答全体を、InventoryTagのリストと読み取り枚数に解析する
+def parse_inventory_tags(frames: Iterable[Frame]) -> Tuple[List[InventoryTag], Optional[int]]:
+    """
+    確認済みのフレームから、インベントリ結果を解析する (parse_inventory_frames() のInventoryTag版)。
+    PC+UII・RSSIに加えてANGLEも InventoryTag から参照できる。
+    PC+UIIのバイト数がデータ長と合わないフレームは読み飛ばし、NACKはエラーメッセージを表示する。
+
+    Args:
+        frames (Iterable[Frame]): 確認済みのフレーム (communicate_frames() の戻り値など)。
+
+    Returns:
+        Tuple[List[InventoryTag], Optional[int]]:
+            - tags (List[InventoryTag]): 読み取ったタグ (受信順)。
+            - expected_read_count (Optional[int]): インベントリACKの読み取り枚数 (ACKが無ければNone)。
+    """
+    tags: List[InventoryTag] = []
+    expected_read_count: Optional[int] = None
+    short_frames = 0
+    for frame in frames:
+        response = decode_frame(frame)
+        if isinstance(response, InventoryTag):
+            tags.append(response)
+        elif isinstance(response, InventoryAck):
+            expected_read_count = response.read_count
+        elif isinstance(response, Nack):
+            print(response.message)
+        elif frame.command == INV[0]:
+            short_frames += 1
+    report_inventory_result(expected_read_count, len(tags), short_frames)
+    return tags, expected_read_count
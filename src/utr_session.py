@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+UTR-S201 シリーズ 接続状態の再利用・自動再接続モジュール（無保証）
+
+【概要】
+ReaderSession はシリアル通信オブジェクトの代わりに使え、communicate() や
+InventoryPipeline などにそのまま渡せる。
+
+- 接続時の確認 (handshake) で読み取ったリーダライタの状態 (ROMバージョン、送信出力、
+  周波数チャンネル、インベントリパラメータ) を保持する。
+  state_file を指定すると、状態をJSONファイルに保存し、次回の起動時にも再利用する。
+- 前回の状態がある場合の接続 (resume):
+  ROMバージョンで同じリーダライタであることを確認し、コマンドモード切替のみ送信する。
+  送信出力・周波数チャンネルの読み取りは省略し、インベントリパラメータは読み取った値が
+  同じであれば設定を省略する (set_inventory_param=False なら読み取り・設定とも行わない)。
+- USBの抜き差しなどでシリアルポートが使えなくなった場合 (SerialException, OSError) は、
+  reconnect_backoff 秒から2倍ずつ待ち時間を延ばしながら再接続を試みる。
+  ポート名が変わった場合も、USBのシリアル番号 (またはVID/PIDと接続位置) で同じ機器を探す。
+  再接続後は接続時と同じく、ROMバージョンの確認、コマンドモード切替、インベントリパラメータの
+  確認 (異なれば設定) を行い、ReaderReconnected を送出する。
+  communicate_frames() はそれまでの受信分を破棄してコマンドを送り直すため、
+  インベントリのループはタイムアウトを待たずに続きから再開する。
+
+【使用例】
+    session = ReaderSession('/dev/ttyUSB0', 115200, state_file='reader_state.json')
+    session.connect()
+    statistics = InventoryPipeline(session, session.port_name).run(duration=3600)
+    print(session.reconnects, session.last_reconnect_seconds)
+    session.close()
+"""
+
+import os
+import threading
+import time
+
+from typing import Any, Callable, Dict, Optional
+
+import serial
+
+from utr_protocol import (COMMANDS, DEFAULT_INVENTORY_PARAM, DETAIL_LOCATION, DETAIL_ROM, FOOTER_LENGTH,
+                          ReaderReconnected, build_command, communicate, is_ack, is_nack, parse_nack_response)
+from utr_reader import HandshakeError, ReaderInfo, handshake, open_reader
+
+
+class SessionError(Exception):
+    """reconnect_timeout の時間内に再接続できなかった。"""
+
+
+# USB機器を識別する情報 (ポート名が変わっても同じ機器を探すため)
+def _usb_identity(port_name: str) -> Optional[Dict[str, Any]]:
+    from serial.tools import list_ports
+
+    for port in list_ports.comports():
+        if port.device == port_name:
+            if port.vid is None:
+                return None   # USB機器ではない
+            return {'vid': port.vid, 'pid': port.pid, 'serial_number': port.serial_number,
+                    'location': port.location}
+    return None
+
+
+class ReaderSession:
+    """
+    リーダライタとの接続を保持し、状態の再利用と自動再接続を行うシリアル通信オブジェクト。
+
+    Attributes:
+        port_name (str): 接続中 (または最後に接続した) ポート名。
+        info (Optional[ReaderInfo]): 保持しているリーダライタの状態。
+        reconnects (int): 再接続した回数。
+        last_reconnect_seconds (float): 最後の再接続にかかった時間（秒、切断の検出から復帰まで）。
+        handshakes (int): 全ての確認 (handshake) を行った回数。
+        resumes (int): 前回の状態を再利用して接続した回数。
+    """
+
+    def __init__(self, port_name: str, baud_rate: int = 19200, inventory_param: Optional[bytes] = None,
+                 set_inventory_param: bool = True, state_file: Optional[str] = None, reconnect_backoff: float = 0.01, max_backoff: float = 1.0,
+                 reconnect_timeout: Optional[float] = None, verbose: bool = True,
+                 opener: Callable[[str, int], Any] = open_reader) -> None:
+        """
+        Args:
+            port_name (str): ポート名。
+            baud_rate (int): ボーレート。
+            inventory_param (Optional[bytes]): 設定するインベントリパラメータ (8バイト)。
+                                               Noneなら DEFAULT_INVENTORY_PARAM。
+            set_inventory_param (bool): Falseなら、インベントリパラメータを設定しない
+                                        (接続・再接続のどちらでも、リーダライタの設定のまま使う)。
+            state_file (Optional[str]): リーダライタの状態を保存するJSONファイル。
+            reconnect_backoff (float): 再接続を試みる最初の間隔（秒）。失敗が続くと2倍ずつ延ばす。
+            max_backoff (float): 再接続を試みる間隔の上限（秒）。
+            reconnect_timeout (Optional[float]): この時間（秒）内に再接続できなければ SessionError を送出する。
+                                                 Noneなら再接続できるまで試み続ける。
+            verbose (bool): Trueなら、接続・再接続の状況を表示する。
+            opener (Callable[[str, int], Any]): シリアルポートを開く関数 (ポート名, ボーレート)。
+        """
+        self.port_name = port_name
+        self.baud_rate = baud_rate
+        self.inventory_param = bytes(inventory_param if inventory_param is not None else DEFAULT_INVENTORY_PARAM)
+        self.set_inventory_param = set_inventory_param
+        self.state_file = state_file
+        self.reconnect_backoff = reconnect_backoff
+        self.max_backoff = max_backoff
+        self.reconnect_timeout = reconnect_timeout
+        self.verbose = verbose
+        self.opener = opener
+
+        self.info: Optional[ReaderInfo] = None
+        self.reconnects = 0
+        self.last_reconnect_seconds = 0.0
+        self.handshakes = 0
+        self.resumes = 0
+
+        self._ser = None
+        self._identity: Optional[Dict[str, Any]] = None
+        self._identity_thread: Optional[threading.Thread] = None
+        self._timeout: Optional[float] = 0
+        self._load_state()
+
+    def _report(self, message: str) -> None:
+        if self.verbose:
+            print(message)
+
+    # --- 状態の保存・読み込み ---
+
+    def _read_state_file(self) -> Dict[str, Any]:
+        if self.state_file is None or not os.path.exists(self.state_file):
+            return {}
+        import json
+        try:
+            with open(self.state_file, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}   # 壊れている場合は使わない (次回の保存で上書き)
+
+    def _load_state(self) -> None:
+        # 状態はポート名ごとに保存する (ポート名が変わった場合は、全ての確認を行って保存し直す)
+        entry = self._read_state_file().get(self.port_name)
+        if not entry:
+            return
+        info = ReaderInfo()
+        info.rom_version = bytes.fromhex(entry['rom_version']) if entry.get('rom_version') else None
+        info.output_power = entry.get('output_power')
+        info.channel = entry.get('channel')
+        info.frequency = entry.get('frequency')
+        info.inventory_param = bytes.fromhex(entry['inventory_param']) if entry.get('inventory_param') else None
+        self.info = info
+
+    def _save_state(self) -> None:
+        if self.state_file is None or self.info is None:
+            return
+        states = self._read_state_file()
+        info = self.info
+        states[self.port_name] = {
+            'rom_version': info.rom_version.hex() if info.rom_version is not None else None,
+            'output_power': info.output_power,
+            'channel': info.channel,
+            'frequency': info.frequency,
+            'inventory_param': info.inventory_param.hex() if info.inventory_param is not None else None,
+            'updated': time.time(),
+        }
+        import json
+
+        # 書き込み途中で終了しても壊れないように、別名で書いてから置き換える
+        temporary = self.state_file + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump(states, f, ensure_ascii=False, indent=2)
+        os.replace(temporary, self.state_file)
+
+    # --- 接続 ---
+
+    def connect(self) -> ReaderInfo:
+        """
+        シリアルポートを開き、リーダライタを使える状態にする。
+        前回の状態があれば再利用し (resume)、無ければ全ての確認 (handshake) を行う。
+
+        Returns:
+            ReaderInfo: リーダライタの状態。
+
+        Raises:
+            serial.SerialException: ポートを開けなかった場合。
+            HandshakeError: ACK/NACKを受信できなかった場合。
+        """
+        self._open(self.port_name)
+        try:
+            self._prepare(resume=self.info is not None)
+        except Exception:
+            self._close_port()
+            raise
+        return self.info
+
+    def _open(self, port_name: str) -> None:
+        self._ser = self.opener(port_name, self.baud_rate)
+        self.port_name = port_name
+        if self._identity is None and self._identity_thread is None:
+            # ポートの列挙には時間がかかるため、再接続に備えた機器の識別はバックグラウンドで行う
+            self._identity_thread = threading.Thread(target=self._resolve_identity, args=(port_name,),
+                                                     name='UtrSessionIdentity', daemon=True)
+            self._identity_thread.start()
+
+    def _resolve_identity(self, port_name: str) -> None:
+        self._identity = _usb_identity(port_name)
+
+    def _prepare(self, resume: bool) -> None:
+        ser = self._ser
+        if resume and self._resume(ser):
+            self.resumes += 1
+            return
+        verbose = self.verbose and self.handshakes == 0
+        self.info = handshake(ser, verbose=verbose, set_inventory_param=self.set_inventory_param,
+                              inventory_param=self.inventory_param)
+        self.handshakes += 1
+        self._save_state()
+
+    def _resume(self, ser) -> bool:
+        """保持している状態を再利用して接続する。同じリーダライタでなければFalseを返す。"""
+        info = self.info
+        # ROMバージョンで通信と、同じリーダライタであることを確認
+        result = communicate(ser, COMMANDS['ROM_VERSION_CHECK'])
+        if is_nack(result):
+            return False
+        if not is_ack(result):
+            raise HandshakeError("USB通信: NG（ACK/NACK なし）", result)
+        if bytes([result[DETAIL_LOCATION]]) != DETAIL_ROM:
+            return False
+        if result[DETAIL_LOCATION + 1:-FOOTER_LENGTH] != info.rom_version:
+            self._report("ROMバージョンが前回と異なるため、接続時の確認を全て行います")
+            return False
+
+        # コマンドモードは読み取れないため、ポートを開くたびに送信する
+        # (USBの抜き差しでリーダライタの電源が切れた場合は、初期状態に戻っている)
+        result = communicate(ser, COMMANDS['COMMAND_MODE_SET'])
+        if is_nack(result):
+            self._report(parse_nack_response(result))
+        elif not is_ack(result):
+            raise HandshakeError("コマンドモード切替に失敗しました", result)
+
+        if not self.set_inventory_param:
+            self._report(f"前回の状態で接続しました: {self.port_name} (インベントリパラメータは設定しません)")
+            return True
+
+        # インベントリパラメータは、読み取った値が同じであれば設定を省略する
+        result = communicate(ser, COMMANDS['UHF_GET_INVENTORY_PARAM'])
+        if not is_ack(result):
+            return False
+        current = result[DETAIL_LOCATION + 1:-FOOTER_LENGTH]
+        if current != self.inventory_param:
+            result = communicate(ser, build_command(0x55, 0x30, self.inventory_param))
+            if not is_ack(result):
+                return False
+        if info.inventory_param != self.inventory_param:
+            info.inventory_param = self.inventory_param
+            self._save_state()
+        self._report(f"前回の状態で接続しました: {self.port_name} (送信出力 {info.output_power} dBm, "
+                     f"チャンネル {info.channel} ch)")
+        return True
+
+    def _find_port(self) -> Optional[str]:
+        """再接続するポート名を探す。USB機器であれば、同じ機器が接続されているポートを返す。"""
+        from serial.tools import list_ports
+
+        if self._identity_thread is not None:
+            self._identity_thread.join()
+        identity = self._identity
+        if identity is None:
+            return self.port_name
+        candidates = [port for port in list_ports.comports()
+                      if port.vid == identity['vid'] and port.pid == identity['pid']]
+        for port in candidates:
+            if identity['serial_number'] and port.serial_number == identity['serial_number']:
+                return port.device
+        for port in candidates:
+            if identity['location'] and port.location == identity['location']:
+                return port.device
+        return None
+
+    def reconnect(self) -> None:
+        """
+        シリアルポートを開き直し、保持している状態で処理を続けられるようにする。
+
+        Raises:
+            SessionError: reconnect_timeout の時間内に再接続できなかった場合。
+        """
+        self._close_port()
+        start = time.monotonic()
+        delay = self.reconnect_backoff
+        self._report(f"{self.port_name}: 接続が切れました。再接続します")
+        while True:
+            port_name = self._find_port()
+            if port_name is not None:
+                try:
+                    self._open(port_name)
+                    # 電源が切れて初期状態に戻っている場合があるため、接続時と同じく
+                    # コマンドモード切替とインベントリパラメータの確認を行う
+                    self._prepare(resume=self.info is not None)
+                    self.reconnects += 1
+                    self.last_reconnect_seconds = time.monotonic() - start
+                    self._report(f"{port_name}: 再接続しました ({self.last_reconnect_seconds * 1000:.1f} ミリ秒)")
+                    return
+                except (serial.SerialException, OSError, HandshakeError):
+                    self._close_port()
+            if self.reconnect_timeout is not None and time.monotonic() - start >= self.reconnect_timeout:
+                raise SessionError(f"{self.port_name}: {self.reconnect_timeout} 秒以内に再接続できませんでした")
+            time.sleep(delay)
+            delay = min(delay * 2, self.max_backoff)
+
+    def _close_port(self) -> None:
+        if self._ser is not None:
+            try:
+                self._ser.close()
+            except (serial.SerialException, OSError):
+                pass
+            self._ser = None
+
+    def close(self) -> None:
+        """シリアルポートを閉じる。"""
+        self._close_port()
+
+    def __enter__(self) -> 'ReaderSession':
+        self.connect()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    # --- シリアル通信オブジェクトとしての操作 (切断を検出したら再接続する) ---
+
+    @property
+    def is_open(self) -> bool:
+        return self._ser is not None and self._ser.is_open
+
+    @property
+    def baudrate(self) -> int:
+        return self.baud_rate
+
+    @property
+    def timeout(self) -> Optional[float]:
+        return self._timeout
+
+    @timeout.setter
+    def timeout(self, value: Optional[float]) -> None:
+        self._timeout = value
+        if self._ser is not None:
+            try:
+                self._ser.timeout = value
+            except (serial.SerialException, OSError):
+                pass   # 次の読み取りで切断として扱う
+
+    def _recover(self) -> None:
+        self.reconnect()
+        self._ser.timeout = self._timeout
+
+    def write(self, data: bytes) -> int:
+        # 送信中に切断した場合は、再接続してから送り直す
+        if self._ser is None:
+            self._recover()
+            return self._ser.write(data)
+        try:
+            return self._ser.write(data)
+        except (serial.SerialException, OSError):
+            self._recover()
+            return self._ser.write(data)
+
+    def read(self, size: int = 1) -> bytes:
+        # 受信中に切断した場合は、再接続してから ReaderReconnected を送出する (応答は失われている)
+        if self._ser is None:
+            self._recover()
+            raise ReaderReconnected(self.port_name)
+        try:
+            return self._ser.read(size)
+        except (serial.SerialException, OSError):
+            self._recover()
+            raise ReaderReconnected(self.port_name)
+
+    @property
+    def in_waiting(self) -> int:
+        if self._ser is None:
+            self._recover()
+            raise ReaderReconnected(self.port_name)
+        try:
+            return self._ser.in_waiting
+        except (serial.SerialException, OSError):
+            self._recover()
+            raise ReaderReconnected(self.port_name)
+
+    def reset_input_buffer(self) -> None:
+        if self._ser is not None:
+            self._ser.reset_input_buffer()
+
+    def reset_output_buffer(self) -> None:
+        if self._ser is not None:
+            self._ser.reset_output_buffer()
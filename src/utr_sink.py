@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+UTR-S201 シリーズ 読み取り結果のファイル出力モジュール（無保証）
+
+【概要】
+1回ごとの読み取り結果 (時刻, リーダライタ, PC+UII, RSSI) を、
+バックグラウンドのスレッドで CSV または JSON Lines 形式のファイルへ書き出す。
+
+- 受信処理からは上限付きのキューへ入れるだけなので、ディスクへの書き込みで
+  シリアル受信が止まることはない (キューが一杯の場合は破棄して dropped に数える)。
+- 一定件数 または 一定時間ごとにまとめて書き込み、ファイルへ出力(flush)する。
+  プログラムが異常終了しても、失うのは最後の出力以降の分のみ。
+- ファイルサイズ または 経過時間でファイルを切り替える (ローテーション)。
+- 書き込みに失敗した場合 (ディスクの空き不足、権限など) は、例外を error に保存して書き込みを止め、
+  以降の結果は dropped に数える。保存した例外は close() で送出する。
+
+【使用例】
+    with ResultSink('inventory_logs', file_format='csv') as sink:
+        sink.put_many(time.time(), 'COM3', pc_uii_list, rssi_list)
+"""
+
+import os
+import queue
+import threading
+import time
+
+from typing import IO, Iterable, List, Optional, Tuple
+
+
+# 1件の読み取り結果: (時刻, リーダライタ, PC+UII, RSSI)
+ReadRecord = Tuple[float, str, bytes, float]
+
+FILE_FORMATS = ('csv', 'jsonl')
+CSV_HEADER = "timestamp,reader,pc_uii,rssi\n"
+
+
+class ResultSink:
+    """
+    読み取り結果をバックグラウンドでファイルへ書き出す。
+
+    Attributes:
+        written (int): ファイルへ書き出した件数。
+        dropped (int): キューが一杯、または書き込みに失敗した後のため破棄した件数。
+        files (List[str]): これまでに作成したファイル名。
+        error (Optional[BaseException]): 書き込みスレッドで発生した例外 (発生していなければNone)。
+    """
+
+    def __init__(self, directory: str = '.', prefix: str = 'inventory_reads', file_format: str = 'csv',
+                 max_queue: int = 1000, batch_size: int = 1000, flush_interval: float = 1.0,
+                 max_file_bytes: int = 64 * 1024 * 1024, max_file_seconds: Optional[float] = None) -> None:
+        """
+        Args:
+            directory (str): 出力先のディレクトリ (無ければ作成)。
+            prefix (str): ファイル名の先頭部分。
+            file_format (str): 'csv' または 'jsonl'。
+            max_queue (int): キューに溜められるかたまり(put/put_manyの呼び出し)の数。
+            batch_size (int): この件数が溜まったらファイルへ出力する。
+            flush_interval (float): この時間（秒）が経過したらファイルへ出力する。
+            max_file_bytes (int): ファイルがこのサイズを超えたら次のファイルへ切り替える。
+            max_file_seconds (Optional[float]): この時間（秒）が経過したら次のファイルへ切り替える。
+        """
+        if file_format not in FILE_FORMATS:
+            raise ValueError(f"file_format は {FILE_FORMATS} のいずれかを指定してください")
+        os.makedirs(directory, exist_ok=True)
+
+        self.directory = directory
+        self.prefix = prefix
+        self.file_format = file_format
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_file_bytes = max_file_bytes
+        self.max_file_seconds = max_file_seconds
+        self.written = 0
+        self.dropped = 0
+        self.files: List[str] = []
+        self.error: Optional[BaseException] = None
+
+        self._queue: 'queue.Queue[Optional[List[ReadRecord]]]' = queue.Queue(max_queue)
+        self._file: Optional[IO[str]] = None
+        self._file_opened = 0.0
+        self._thread = threading.Thread(target=self._run, name='ResultSink', daemon=True)
+        self._thread.start()
+
+    def put(self, timestamp: float, reader: str, pc_uii: bytes, rssi: float) -> bool:
+        """
+        1件の読み取り結果をキューへ入れる (待たない)。
+
+        Returns:
+            bool: キューへ入れられた場合はTrue、一杯で破棄した場合はFalse。
+        """
+        return self._put([(timestamp, reader, pc_uii, rssi)])
+
+    def put_many(self, timestamp: float, reader: str, pc_uii_list: Iterable[bytes],
+                 rssi_list: Iterable[float]) -> bool:
+        """
+        received_data_parse() の結果(PC+UIIリスト、RSSIリスト)をまとめてキューへ入れる (待たない)。
+
+        Returns:
+            bool: キューへ入れられた場合はTrue、一杯で破棄した場合はFalse。
+        """
+        records = [(timestamp, reader, pc_uii, rssi) for pc_uii, rssi in zip(pc_uii_list, rssi_list)]
+        return self._put(records) if records else True
+
+    def _put(self, records: List[ReadRecord]) -> bool:
+        if self.error is not None:
+            self.dropped += len(records)
+            return False
+        try:
+            self._queue.put_nowait(records)
+            return True
+        except queue.Full:
+            self.dropped += len(records)
+            return False
+
+    def close(self) -> None:
+        """
+        キューに残っている結果を全て書き出してから、ファイルを閉じる。
+
+        Raises:
+            OSError など: 書き込みスレッドでファイルの作成・書き込みに失敗していた場合 (error と同じ例外)。
+        """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self) -> 'ResultSink':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    # --- 以下、書き込みスレッド ---
+
+    def _run(self) -> None:
+        try:
+            self._write_loop()
+        except Exception as e:
+            # 書き込みを止める (キューに残っている分と以降の結果は dropped に数える)
+            self.error = e
+            self._drain()
+        finally:
+            if self._file is not None:
+                try:
+                    self._file.close()
+                except OSError:
+                    pass
+                self._file = None
+
+    def _drain(self) -> None:
+        # キューに残っている結果を破棄する (close() の終了通知(None)も取り出す)
+        while True:
+            try:
+                records = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if records is not None:
+                self.dropped += len(records)
+
+    def _write_loop(self) -> None:
+        batch: List[ReadRecord] = []
+        last_flush = time.monotonic()
+        running = True
+        while running:
+            timeout = max(self.flush_interval - (time.monotonic() - last_flush), 0.0)
+            try:
+                records = self._queue.get(timeout=timeout)
+                if records is None:
+                    running = False
+                else:
+                    batch.extend(records)
+            except queue.Empty:
+                pass
+
+            if batch and (len(batch) >= self.batch_size or not running
+                          or time.monotonic() - last_flush >= self.flush_interval):
+                try:
+                    self._write(batch)
+                except Exception:
+                    self.dropped += len(batch)
+                    raise
+                batch = []
+                last_flush = time.monotonic()
+            elif not batch:
+                last_flush = time.monotonic()
+
+    def _open_next_file(self) -> IO[str]:
+        if self._file is not None:
+            self._file.close()
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        path = os.path.join(self.directory, f"{self.prefix}-{stamp}-{len(self.files):04d}.{self.file_format}")
+        self._file = open(path, 'w', encoding='utf-8', newline='')
+        self._file_opened = time.monotonic()
+        self.files.append(path)
+        if self.file_format == 'csv':
+            self._file.write(CSV_HEADER)
+        return self._file
+
+    def _write(self, batch: List[ReadRecord]) -> None:
+        f = self._file
+        if (f is None or f.tell() >= self.max_file_bytes
+                or (self.max_file_seconds is not None
+                    and time.monotonic() - self._file_opened >= self.max_file_seconds)):
+            f = self._open_next_file()
+
+        if self.file_format == 'csv':
+            lines = [f"{timestamp:.6f},{reader},{pc_uii.hex().upper()},{rssi}\n"
+                     for timestamp, reader, pc_uii, rssi in batch]
+        else:
+            import json  # JSON Lines 形式の場合のみ使用 (起動時には読み込まない)
+            lines = [json.dumps({'timestamp': timestamp, 'reader': reader,
+                                 'pc_uii': pc_uii.hex().upper(), 'rssi': rssi}) + "\n"
+                     for timestamp, reader, pc_uii, rssi in batch]
+        f.write(''.join(lines))
+        f.flush()
+        self.written += len(batch)
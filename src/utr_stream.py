@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+UTR-S201 シリーズ 連続インベントリモード 受信モジュール（無保証）
+
+【概要】
+連続インベントリモード(オートモード)のリーダライタから送られてくる
+インベントリ応答(0x6C)を受信し続け、1タグずつ InventoryRecord として返す。
+`communicate()` と異なり、ACK/NACKを待たずに受信のみを行う。
+
+【特徴】
+- パケットの途中から受信を開始しても、STXを探索して再同期する。
+- STX, ETX, SUM, CRを確認し、正常なフレームのみを解析する。
+- 受信バッファ(FrameReceiver)は解析済み領域を詰めながら使うため、
+  長時間受信し続けてもメモリ使用量は増えない。
+
+【使用例】
+    ser = serial.Serial(port, baud_rate, timeout=0.1)
+    for record in stream_inventory(ser):
+        print(record.pc_uii.hex().upper(), record.rssi)
+
+【注意事項】
+- 連続インベントリモードへの切り替えは、RWManagerなどで事前に行ってください。
+"""
+
+import time
+
+from typing import Iterable, Iterator, Optional
+
+import serial
+
+from utr_protocol import (ANGLE_LOCATION, INV, PC_UII_LOCATION, RSSI_LOCATION, FrameReceiver, decode_rssi,
+                          inventory_pc_uii_length)
+
+
+class InventoryRecord:
+    """
+    インベントリ応答(0x6C) 1フレーム分のタグ情報。
+
+    Attributes:
+        pc_uii (bytes): PC+UIIデータ。
+        rssi (float): RSSI値（dBm）。
+        angle (int): ANGLEの値。
+        timestamp (float): 受信時刻 (time.time())。
+    """
+
+    __slots__ = ('pc_uii', 'rssi', 'angle', 'timestamp')
+
+    def __init__(self, pc_uii: bytes, rssi: float, angle: int, timestamp: float) -> None:
+        self.pc_uii = pc_uii
+        self.rssi = rssi
+        self.angle = angle
+        self.timestamp = timestamp
+
+    def __repr__(self) -> str:
+        return (f"InventoryRecord(pc_uii={self.pc_uii.hex().upper()}, rssi={self.rssi}, "
+                f"angle={self.angle}, timestamp={self.timestamp:.3f})")
+
+
+class StreamStatistics:
+    """
+    受信処理の統計情報。
+
+    Attributes:
+        received_bytes (int): 受信したバイト数。
+        frames (int): 正常に受信したフレーム数 (0x6C以外も含む)。
+        records (int): インベントリ応答(0x6C)のフレーム数。
+        short_frames (int): SUM値は正しいが、PC+UIIのバイト数がデータ長と合わないため読み飛ばした0x6Cのフレーム数。
+        discarded_bytes (int): 再同期のために読み飛ばしたバイト数。
+    """
+
+    __slots__ = ('received_bytes', 'frames', 'records', 'short_frames', 'discarded_bytes')
+
+    def __init__(self) -> None:
+        self.received_bytes = 0
+        self.frames = 0
+        self.records = 0
+        self.short_frames = 0
+        self.discarded_bytes = 0
+
+
+# 受信したバイト列のかたまりから、インベントリ応答を1タグずつ取り出す
+def iter_inventory_records(chunks: Iterable[bytes],
+                           statistics: Optional[StreamStatistics] = None) -> Iterator[InventoryRecord]:
+    """
+    受信したバイト列のかたまりを順に解析し、インベントリ応答(0x6C)を1タグずつ返す。
+    パケットの途中から始まるデータや、ノイズを含むデータでもSTXで再同期する。
+    PC+UIIのバイト数がデータ長と合わない0x6Cのフレームは、statistics.short_frames に数えて読み飛ばす
+    (inventory_pc_uii_length())。
+
+    Args:
+        chunks (Iterable[bytes]): 受信したバイト列のかたまり (シリアル、記録ファイルなど)。
+        statistics (Optional[StreamStatistics]): 統計情報の格納先。不要ならNone。
+
+    Yields:
+        InventoryRecord: 読み取ったタグの情報。
+    """
+    receiver = FrameReceiver()
+    if statistics is None:
+        statistics = StreamStatistics()
+
+    for chunk in chunks:
+        timestamp = time.time()
+        statistics.received_bytes += len(chunk)
+        receiver.feed(chunk)
+
+        # 受信バッファから確認済みのフレームを取り出す (呼び出し側の処理中に受信バッファを変更できるように、
+        # フレームはコピーしたFrameで受け取る)
+        for frame in receiver.frames():
+            statistics.frames += 1
+            if frame.command != INV[0]:
+                continue
+            data_frame = frame.raw
+            pc_uii_length = inventory_pc_uii_length(data_frame)
+            if pc_uii_length is None:
+                statistics.short_frames += 1
+                continue
+            statistics.records += 1
+            yield InventoryRecord(
+                data_frame[PC_UII_LOCATION:PC_UII_LOCATION + pc_uii_length],
+                decode_rssi(data_frame, RSSI_LOCATION),
+                data_frame[ANGLE_LOCATION],
+                timestamp,
+            )
+
+        statistics.discarded_bytes = receiver.discarded_bytes
+
+
+# シリアルポートから受信したバイト列を、かたまりごとに返す
+def read_serial_chunks(ser: serial.Serial, read_timeout: float = 0.1,
+                       idle_timeout: Optional[float] = None) -> Iterator[bytes]:
+    """
+    シリアルポートから受信済みのデータをまとめて読み取り、かたまりごとに返す。
+    データが無い間は read_timeout 秒ごとにOS側で待機するため、CPUを占有しない。
+
+    Args:
+        ser (serial.Serial): シリアル通信オブジェクト。
+        read_timeout (float): 1回の読み取りで待機する最大時間（秒）。
+        idle_timeout (Optional[float]): この時間（秒）データを受信しなければ終了する。
+                                        Noneの場合は終了しない。
+
+    Yields:
+        bytes: 受信したバイト列。
+    """
+    original_timeout = ser.timeout
+    ser.timeout = read_timeout
+    try:
+        last_received = time.monotonic()
+        while True:
+            chunk = ser.read(ser.in_waiting or 1)
+            if chunk:
+                last_received = time.monotonic()
+                yield chunk
+            elif idle_timeout is not None and (time.monotonic() - last_received) > idle_timeout:
+                return
+    finally:
+        ser.timeout = original_timeout
+
+
+# 連続インベントリモードの受信
+def stream_inventory(ser: serial.Serial, read_timeout: float = 0.1,
+                     idle_timeout: Optional[float] = None,
+                     statistics: Optional[StreamStatistics] = None) -> Iterator[InventoryRecord]:
+    """
+    連続インベントリモードのリーダライタから受信し続け、タグ情報を1タグずつ返す。
+
+    Args:
+        ser (serial.Serial): シリアル通信オブジェクト。
+        read_timeout (float): 1回の読み取りで待機する最大時間（秒）。
+        idle_timeout (Optional[float]): この時間（秒）データを受信しなければ終了する。
+                                        Noneの場合は終了しない。
+        statistics (Optional[StreamStatistics]): 統計情報の格納先。不要ならNone。
+
+    Yields:
+        InventoryRecord: 読み取ったタグの情報。
+    """
+    return iter_inventory_records(read_serial_chunks(ser, read_timeout, idle_timeout), statistics)
@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+UTR-S201 シリーズ 複数台のリーダライタ監視モジュール（無保証）
+
+【概要】
+複数台のリーダライタを、1台につき1つのワーカープロセスで同時に動かし、
+読み取り結果を時刻順の1本の流れにまとめる。
+
+- ワーカープロセス: ポートを開き、handshake() (ROMバージョン確認、コマンドモード切替、
+  送信出力・周波数チャンネルの読み取り、インベントリパラメータの取得/設定) の後、
+  インベントリを繰り返す。1回分の読み取り結果 (時刻, PC+UIIリスト, RSSIリスト) を
+  リーダライタごとのパイプで監視プロセスへ送る。
+- 監視プロセス: 全てのパイプから受信し、reorder_window 秒だけ溜めてから時刻順に返す
+  (プロセス間の到着順の入れ替わりを吸収する)。
+- 死活監視: ワーカーはインベントリ1回ごとに共有メモリ (multiprocessing.Value) へ時刻を書き込む。
+  stall_timeout 秒以上更新が無い、またはプロセスが終了した場合は、そのワーカーだけを
+  停止して再起動する (再起動の間隔は失敗が続くと2倍ずつ延ばす)。
+  パイプはリーダライタごとに分けているため、ワーカーを強制終了しても他のリーダライタには影響しない。
+
+【使用例】
+    supervisor = ReaderSupervisor(discover_ports(), baud_rate=115200)
+    supervisor.start()
+    try:
+        for timestamp, reader, pc_uii, rssi in supervisor.run(duration=60):
+            print(reader, pc_uii.hex().upper(), rssi)
+    finally:
+        supervisor.stop()
+
+    python utr_supervisor.py --ports /dev/ttyUSB0 /dev/ttyUSB1 --baud 115200 --duration 60
+    python utr_supervisor.py --emulate 3 --duration 10     # 疑似リーダライタ (pty) 3台で動作確認
+"""
+
+import argparse
+import datetime
+import heapq
+import multiprocessing
+import multiprocessing.connection
+import sys
+import threading
+import time
+
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import serial
+
+from utr_protocol import COMMANDS, InventoryTimeout, communicate_frames
+from utr_reader import HandshakeError, handshake, open_reader
+from utr_responses import parse_inventory_tags
+from utr_sink import ResultSink
+
+
+# 1件の読み取り結果: (時刻, リーダライタ, PC+UII, RSSI)  ※ utr_sink.ReadRecord と同じ並び
+ReadEvent = Tuple[float, str, bytes, float]
+
+# ワーカーから監視プロセスへ送るメッセージの種類
+MESSAGE_READY = 'ready'   # ('ready', ROMバージョン, 送信出力, チャンネル)
+MESSAGE_READS = 'reads'   # ('reads', 時刻, PC+UIIリスト, RSSIリスト)
+MESSAGE_ERROR = 'error'   # ('error', エラーメッセージ)
+
+
+# 接続されているシリアルポートの一覧を返す
+def discover_ports() -> List[str]:
+    """
+    list_ports.comports() で見つかったシリアルポートのデバイス名を返す。
+
+    Returns:
+        List[str]: デバイス名のリスト (例: ['COM3', 'COM4'], ['/dev/ttyUSB0'])。
+    """
+    from serial.tools import list_ports
+
+    return [port.device for port in list_ports.comports()]
+
+
+# ワーカープロセス: 1台のリーダライタでインベントリを繰り返す
+def _reader_worker(port_name: str, baud_rate: int, connection, stop_event, heartbeat,
+                   max_timeout: float, max_empty: int) -> None:
+    """
+    ポートを開いて handshake() を行い、stop_event がセットされるまでインベントリを繰り返す。
+    インベントリ1回ごとに heartbeat へ時刻を書き込む。
+    応答の無いインベントリが max_empty 回続いた場合は終了する (監視プロセスが再起動する)。
+
+    Args:
+        port_name (str): ポート名。
+        baud_rate (int): ボーレート。
+        connection: 監視プロセスへの送信用パイプ (multiprocessing.Pipe)。
+        stop_event: 終了を指示する multiprocessing.Event。
+        heartbeat: 最後にインベントリを終えた時刻 (multiprocessing.Value('d'))。
+        max_timeout (float): インベントリのタイムアウト時間の上限（秒）。
+        max_empty (int): 応答の無いインベントリがこの回数続いたら終了する。
+    """
+    heartbeat.value = time.time()
+    ser: Optional[serial.Serial] = None
+    try:
+        ser = open_reader(port_name, baud_rate)
+        info = handshake(ser, verbose=False)
+        connection.send((MESSAGE_READY, info.rom_version, info.output_power, info.channel))
+
+        timeout = InventoryTimeout(baud_rate, max_timeout=max_timeout)
+        empty = 0
+        while not stop_event.is_set():
+            heartbeat.value = time.time()
+            frames = communicate_frames(ser, COMMANDS['UHF_INVENTORY'], timeout.value)
+            read_time = time.time()
+            if not frames:
+                empty += 1
+                if empty >= max_empty:
+                    connection.send((MESSAGE_ERROR, f"インベントリ応答が {empty} 回続けてありませんでした"))
+                    return
+                timeout.update(None)
+                continue
+            empty = 0
+            tags, expected_count = parse_inventory_tags(frames)
+            timeout.update(expected_count)
+            if tags:
+                connection.send((MESSAGE_READS, read_time, [tag.pc_uii for tag in tags], [tag.rssi for tag in tags]))
+    except (serial.SerialException, OSError, HandshakeError) as e:
+        try:
+            connection.send((MESSAGE_ERROR, str(e)))
+        except OSError:
+            pass
+    except KeyboardInterrupt:
+        pass  # Ctrl+C は監視プロセスが処理する
+    finally:
+        if ser is not None:
+            ser.close()
+        connection.close()
+
+
+class ReaderStatus:
+    """
+    1台のリーダライタ (ワーカープロセス) の状態。
+
+    Attributes:
+        port (str): ポート名。
+        ready (bool): handshake() が完了していればTrue。
+        rom_version (Optional[bytes]): ROMバージョン。
+        output_power (Optional[float]): 送信出力値（dBm）。
+        channel (Optional[int]): 送信周波数チャンネル番号。
+        cycles (int): 読み取り結果を受信したインベントリの回数。
+        reads (int): 受信した読み取り結果の件数 (延べ)。
+        restarts (int): ワーカーを再起動した回数。
+        last_error (Optional[str]): 最後に受信したエラー、または再起動の理由。
+    """
+
+    __slots__ = ('port', 'ready', 'rom_version', 'output_power', 'channel', 'cycles', 'reads', 'restarts',
+                 'last_error', 'process', 'connection', 'heartbeat', 'failures', 'restart_at')
+
+    def __init__(self, port: str) -> None:
+        self.port = port
+        self.ready = False
+        self.rom_version: Optional[bytes] = None
+        self.output_power: Optional[float] = None
+        self.channel: Optional[int] = None
+        self.cycles = 0
+        self.reads = 0
+        self.restarts = 0
+        self.last_error: Optional[str] = None
+        self.process = None
+        self.connection = None
+        self.heartbeat = None
+        self.failures = 0                        # 続けて再起動した回数 (再起動の間隔の計算用)
+        self.restart_at: Optional[float] = None  # 再起動する時刻 (time.monotonic())
+
+    def __repr__(self) -> str:
+        return (f"ReaderStatus(port={self.port!r}, ready={self.ready}, cycles={self.cycles}, reads={self.reads}, "
+                f"restarts={self.restarts}, last_error={self.last_error!r})")
+
+
+class ReaderSupervisor:
+    """
+    複数台のリーダライタのワーカープロセスを起動・監視し、読み取り結果を時刻順にまとめる。
+    """
+
+    def __init__(self, ports: List[str], baud_rate: int = 19200, stall_timeout: float = 10.0,
+                 reorder_window: float = 0.2, restart_backoff: float = 1.0, max_backoff: float = 30.0,
+                 max_empty: int = 5, verbose: bool = True) -> None:
+        """
+        Args:
+            ports (List[str]): リーダライタのポート名のリスト。
+            baud_rate (int): ボーレート (全台共通)。
+            stall_timeout (float): ワーカーの時刻がこの時間（秒）更新されなければ停止とみなして再起動する。
+            reorder_window (float): 読み取り結果を時刻順に並べ替えるために溜める時間（秒）。
+            restart_backoff (float): 再起動までの最初の待ち時間（秒）。失敗が続くと2倍ずつ延ばす。
+            max_backoff (float): 再起動までの待ち時間の上限（秒）。
+            max_empty (int): 応答の無いインベントリがこの回数続いたらワーカーを再起動する。
+            verbose (bool): Trueなら、接続・再起動などの状態の変化を表示する。
+        """
+        if not ports:
+            raise ValueError("リーダライタのポートを1つ以上指定してください")
+        self.baud_rate = baud_rate
+        self.stall_timeout = stall_timeout
+        self.reorder_window = reorder_window
+        self.restart_backoff = restart_backoff
+        self.max_backoff = max_backoff
+        self.max_empty = max_empty
+        self.verbose = verbose
+        self.readers: Dict[str, ReaderStatus] = {port: ReaderStatus(port) for port in ports}
+
+        self._context = multiprocessing.get_context()
+        self._stop_event = self._context.Event()
+        self._pending: List[Tuple[float, int, str, bytes, float]] = []   # 並べ替え待ち (時刻順のヒープ)
+        self._sequence = 0   # 同じ時刻の読み取り結果を受信順に並べるための番号
+
+    def _report(self, message: str) -> None:
+        if self.verbose:
+            print(f"[{datetime.datetime.now().strftime('%H:%M:%S')}] {message}")
+
+    def start(self) -> None:
+        """全てのリーダライタのワーカープロセスを起動する。"""
+        self._stop_event.clear()
+        for status in self.readers.values():
+            self._start_worker(status)
+
+    def _start_worker(self, status: ReaderStatus) -> None:
+        receiver, sender = self._context.Pipe(duplex=False)
+        status.heartbeat = self._context.Value('d', time.time(), lock=False)
+        # インベントリ1回のタイムアウトが停止の判定時間を超えないようにする
+        max_timeout = max(self.stall_timeout / 2, 1.0)
+        status.process = self._context.Process(
+            target=_reader_worker, name=f'UtrReader-{status.port}',
+            args=(status.port, self.baud_rate, sender, self._stop_event, status.heartbeat, max_timeout,
+                  self.max_empty),
+            daemon=True)
+        status.process.start()
+        sender.close()   # 送信側はワーカーだけが持つ (ワーカーが終了したら受信側で検出できる)
+        status.connection = receiver
+        status.ready = False
+        status.restart_at = None
+        self._report(f"{status.port}: ワーカーを起動しました (pid={status.process.pid})")
+
+    def _stop_worker(self, status: ReaderStatus) -> None:
+        process = status.process
+        if process is not None:
+            if process.is_alive():
+                process.terminate()
+                process.join(1.0)
+                if process.is_alive():
+                    process.kill()
+            process.join()
+        if status.connection is not None:
+            status.connection.close()
+        status.process = None
+        status.connection = None
+        status.ready = False
+
+    def _schedule_restart(self, status: ReaderStatus, reason: str) -> None:
+        self._stop_worker(status)
+        delay = min(self.restart_backoff * (2 ** status.failures), self.max_backoff)
+        status.failures += 1
+        status.last_error = reason
+        status.restart_at = time.monotonic() + delay
+        self._report(f"{status.port}: {reason}。{delay:.1f} 秒後に再起動します")
+
+    def _receive(self, status: ReaderStatus) -> bool:
+        """パイプから受信したメッセージを処理する。ワーカーが終了していればFalseを返す。"""
+        try:
+            while status.connection.poll():
+                message = status.connection.recv()
+                kind = message[0]
+                if kind == MESSAGE_READS:
+                    _, read_time, pc_uii_list, rssi_list = message
+                    for pc_uii, rssi in zip(pc_uii_list, rssi_list):
+                        heapq.heappush(self._pending, (read_time, self._sequence, status.port, pc_uii, rssi))
+                        self._sequence += 1
+                    status.cycles += 1
+                    status.reads += len(pc_uii_list)
+                elif kind == MESSAGE_READY:
+                    _, status.rom_version, status.output_power, status.channel = message
+                    status.ready = True
+                    status.failures = 0
+                    self._report(f"{status.port}: 接続しました (送信出力 {status.output_power} dBm, "
+                                 f"チャンネル {status.channel} ch)")
+                elif kind == MESSAGE_ERROR:
+                    status.last_error = message[1]
+                    self._report(f"{status.port}: {message[1]}")
+        except (EOFError, OSError):
+            return False
+        return True
+
+    def _check_health(self, now: float) -> None:
+        for status in self.readers.values():
+            if status.process is None:
+                if status.restart_at is not None and now >= status.restart_at:
+                    status.restarts += 1
+                    self._start_worker(status)
+                continue
+            if not status.process.is_alive():
+                # 終了前に送られたメッセージを受信してから再起動する
+                self._receive(status)
+                self._schedule_restart(status, f"ワーカーが終了しました (exitcode={status.process.exitcode})")
+                continue
+            stalled = time.time() - status.heartbeat.value
+            if stalled > self.stall_timeout:
+                self._schedule_restart(status, f"{stalled:.1f} 秒間応答がありません")
+
+    def poll(self, timeout: float = 0.05) -> List[ReadEvent]:
+        """
+        ワーカーからの受信と死活監視を1回行い、時刻順に確定した読み取り結果を返す。
+
+        Args:
+            timeout (float): ワーカーからの受信を待つ最大時間（秒）。
+
+        Returns:
+            List[ReadEvent]: reorder_window 秒より前の読み取り結果 (時刻順)。
+        """
+        connections = {status.connection: status for status in self.readers.values()
+                       if status.connection is not None}
+        if connections:
+            for connection in multiprocessing.connection.wait(list(connections), timeout):
+                status = connections[connection]
+                if not self._receive(status):
+                    # パイプが閉じられた (ワーカーが終了した)。再起動は _check_health() で行う
+                    status.process.join(1.0)
+        else:
+            time.sleep(timeout)
+        self._check_health(time.monotonic())
+        return self._release(time.time() - self.reorder_window)
+
+    def _release(self, until: float) -> List[ReadEvent]:
+        events: List[ReadEvent] = []
+        pending = self._pending
+        while pending and pending[0][0] <= until:
+            read_time, _, port, pc_uii, rssi = heapq.heappop(pending)
+            events.append((read_time, port, pc_uii, rssi))
+        return events
+
+    def run(self, duration: Optional[float] = None,
+            stop_event: Optional[threading.Event] = None) -> Iterator[ReadEvent]:
+        """
+        読み取り結果を時刻順に返し続ける。start() の後に呼ぶ。
+
+        Args:
+            duration (Optional[float]): 実行する時間（秒）。Noneなら stop_event がセットされるまで。
+            stop_event (Optional[threading.Event]): セットされたら終了する。
+
+        Yields:
+            ReadEvent: (時刻, リーダライタ, PC+UII, RSSI)。
+        """
+        deadline = None if duration is None else time.monotonic() + duration
+        while deadline is None or time.monotonic() < deadline:
+            if stop_event is not None and stop_event.is_set():
+                break
+            yield from self.poll()
+
+    def stop(self) -> List[ReadEvent]:
+        """
+        全てのワーカープロセスを終了し、並べ替え待ちの読み取り結果を時刻順に返す。
+
+        Returns:
+            List[ReadEvent]: 残っていた読み取り結果 (時刻順)。
+        """
+        self._stop_event.set()
+        # 実行中のインベントリが終わるのを待つ (パイプが一杯で止まらないよう、待つ間も受信する)
+        deadline = time.monotonic() + self.stall_timeout
+        running = [status for status in self.readers.values() if status.process is not None]
+        while running and time.monotonic() < deadline:
+            for status in running:
+                self._receive(status)
+            running = [status for status in running if status.process.is_alive()]
+            time.sleep(0.01)
+        for status in self.readers.values():
+            if status.connection is not None:
+                self._receive(status)
+            self._stop_worker(status)
+            status.restart_at = None
+        return self._release(float('inf'))
+
+
+# コマンドラインから実行する
+def main() -> None:
+    """複数台のリーダライタでインベントリを実行し、読み取り結果を時刻順に表示する。"""
+    parser = argparse.ArgumentParser(description="UTR-S201 複数台のリーダライタ監視")
+    parser.add_argument('--ports', nargs='+', default=None, help="ポート名 (省略時は見つかった全てのポート)")
+    parser.add_argument('--baud', type=int, default=19200, help="ボーレート (デフォルト: 19200)")
+    parser.add_argument('--duration', type=float, default=None, help="実行する時間（秒、省略時は Ctrl+C まで）")
+    parser.add_argument('--stall-timeout', type=float, default=10.0, help="停止とみなして再起動するまでの時間（秒）")
+    parser.add_argument('--reorder-window', type=float, default=0.2, help="時刻順に並べ替えるために溜める時間（秒）")
+    parser.add_argument('--output', default=None, help="読み取り結果をCSVで書き出すディレクトリ")
+    parser.add_argument('--quiet', action='store_true', help="読み取り結果を表示しない")
+    parser.add_argument('--emulate', type=int, default=0, metavar='N',
+                        help="疑似リーダライタ (pty) を N 台起動して接続する (Linux/macOS)")
+    args = parser.parse_args()
+
+    ports = args.ports
+    if args.emulate:
+        from utr_emulator import UtrEmulator, make_tag_population, serve_pty
+        ports = [serve_pty(UtrEmulator(make_tag_population(30, seed=index), read_probability=0.8, seed=index),
+                           args.baud)
+                 for index in range(args.emulate)]
+    elif not ports:
+        ports = discover_ports()
+    if not ports:
+        print("利用可能なCOMポートが見つかりませんでした。")
+        sys.exit(1)
+
+    sink = ResultSink(args.output) if args.output else None
+    supervisor = ReaderSupervisor(ports, baud_rate=args.baud, stall_timeout=args.stall_timeout,
+                                  reorder_window=args.reorder_window)
+
+    def handle(events: List[ReadEvent]) -> None:
+        for read_time, reader, pc_uii, rssi in events:
+            if not args.quiet:
+                timestamp = datetime.datetime.fromtimestamp(read_time).strftime('%H:%M:%S.%f')[:-3]
+                print(f"{timestamp} {reader} PC+UII: {pc_uii.hex().upper()} RSSI: {rssi}")
+            if sink is not None:
+                sink.put(read_time, reader, pc_uii, rssi)
+
+    supervisor.start()
+    try:
+        deadline = None if args.duration is None else time.monotonic() + args.duration
+        while deadline is None or time.monotonic() < deadline:
+            handle(supervisor.poll())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        handle(supervisor.stop())
+        if sink is not None:
+            try:
+                sink.close()
+            except OSError as e:
+                print(f"読み取り結果の書き込みに失敗しました: {e}")
+            if sink.dropped:
+                print(f"書き込めずに破棄した読み取り結果: {sink.dropped} 件")
+
+    print("========= リーダライタごとの結果 =========")
+    for status in supervisor.readers.values():
+        print(f"{status.port}: インベントリ {status.cycles} 回, 読み取り {status.reads} 件, "
+              f"再起動 {status.restarts} 回, 最後のエラー: {status.last_error}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+UTR-S201 シリーズ 周波数チャンネル・送信出力の掃引モジュール（無保証）
+
+【概要】
+設置場所の調査 (サイトサーベイ) 用に、周波数チャンネルと送信出力の組み合わせ (ポイント) ごとに
+インベントリを cycles 回実行し、次の結果をSQLiteのテーブルに保存する。
+
+- ユニークなタグ数、受信したタグ数
+- RSSIの分布 (最小・平均・最大、10/50/90パーセンタイル、1dBmごとのヒストグラム)
+- CMD_LBT_ERROR (キャリアセンス時のタイムアウト) とその他のNACK、タイムアウトの回数
+- インベントリ1回あたりの時間 (平均、95パーセンタイル、最大)
+
+保存したテーブルは (survey, channel, power) ごとに1行で、best_points() で
+ユニークなタグ数が多く、LBTエラーが少ないポイントから順に取り出せる。
+
+- 掃引はチャンネルごとにまとめて行い (チャンネルの変更は1回ずつ)、
+  結果もチャンネルごとにまとめて書き込む。
+- 同じ survey 名で再実行すると、保存済みのポイントは飛ばして続きから再開する。
+  中断 (Ctrl+C など) した場合も、それまでのポイントの結果を書き込んでから終了する。
+- 終了時には、掃引前のチャンネルと送信出力に戻す。
+
+【設定の書き込みについて】
+送信出力・周波数チャンネルの読み取り (0x55 / 0x43) は本サンプルと同じ形式で行う。
+書き込みの詳細コマンドは本サンプルでは使用しておらず、値を確認できないため、
+write_detail で指定する (リーダライタのプロトコル仕様書を参照すること)。
+書き込みのデータ部は読み取りの応答と同じ形式 (設定の種類, 00h, 値) とし、
+書き込み後は読み取りコマンドで値を確認する (一致しなければ SurveyError)。
+
+【使用例】
+    store = SurveyStore('survey.db')
+    sweep(ser, store, 'warehouse-a', channels=[1, 5, 9], powers=[20.0, 25.0],
+          cycles=10, write_detail=WRITE_DETAIL)   # WRITE_DETAIL: 仕様書の書き込みの詳細コマンド
+    for point in store.best_points('warehouse-a', limit=3):
+        print(point)
+
+    python utr_survey.py --port COM3 --baud 115200 --db survey.db --survey warehouse-a \
+        --channels 1-38 --powers 15-27:2 --cycles 10 --write-detail XX
+    python utr_survey.py --db survey.db --survey warehouse-a --best 5
+"""
+
+import json
+import sqlite3
+import statistics
+import time
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from utr_protocol import (COMMANDS, NACK_LBT_ERROR, OUTPUT_CH_FREQ_LIST, SETTING_FREQ_CH, SETTING_OUTPUT_POWER,
+                          SETTING_VALUE_LOCATION, InventoryTimeout, build_command, communicate, communicate_frames,
+                          is_ack, is_nack, parse_nack_response)
+from utr_responses import FrequencyChannel, InventoryAck, InventoryTag, Nack, OutputPower, decode_frame
+
+# チャンネル番号の範囲 (OUTPUT_CH_FREQ_LIST と同じ)
+CHANNELS = range(1, len(OUTPUT_CH_FREQ_LIST) + 1)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sweep_points (
+    survey          TEXT    NOT NULL,
+    channel         INTEGER NOT NULL,
+    frequency       REAL,
+    power           REAL    NOT NULL,
+    cycles          INTEGER NOT NULL,
+    unique_tags     INTEGER NOT NULL,
+    reads           INTEGER NOT NULL,
+    lbt_errors      INTEGER NOT NULL,
+    other_nacks     INTEGER NOT NULL,
+    timeouts        INTEGER NOT NULL,
+    latency_mean    REAL,
+    latency_p95     REAL,
+    latency_max     REAL,
+    rssi_min        REAL,
+    rssi_mean       REAL,
+    rssi_max        REAL,
+    rssi_p10        REAL,
+    rssi_p50        REAL,
+    rssi_p90        REAL,
+    rssi_histogram  TEXT,
+    measured_at     REAL    NOT NULL,
+    PRIMARY KEY (survey, channel, power)
+);
+CREATE INDEX IF NOT EXISTS sweep_points_rank ON sweep_points (survey, unique_tags DESC, lbt_errors);
+"""
+
+_COLUMNS = ('survey', 'channel', 'frequency', 'power', 'cycles', 'unique_tags', 'reads', 'lbt_errors',
+            'other_nacks', 'timeouts', 'latency_mean', 'latency_p95', 'latency_max', 'rssi_min', 'rssi_mean',
+            'rssi_max', 'rssi_p10', 'rssi_p50', 'rssi_p90', 'rssi_histogram', 'measured_at')
+
+
+class SurveyError(Exception):
+    """設定の書き込みができなかった、または書き込んだ値を確認できなかった。"""
+
+
+class SweepPoint:
+    """
+    1つのポイント (チャンネル、送信出力) の計測結果。
+
+    Attributes:
+        channel (int): 周波数チャンネル。
+        power (float): 送信出力（dBm）。
+        cycles (int): インベントリの回数。
+        tags (Set[bytes]): 読み取ったPC+UII。
+        reads (int): 受信したタグのフレーム数。
+        rssi (List[float]): 受信したタグのRSSI（dBm）。
+        latencies (List[float]): インベントリ1回あたりの時間（秒）。
+        lbt_errors (int): CMD_LBT_ERROR のNACKの回数。
+        other_nacks (int): その他のNACKの回数。
+        timeouts (int): ACK/NACKを受信できなかった回数。
+    """
+
+    __slots__ = ('channel', 'power', 'cycles', 'tags', 'reads', 'rssi', 'latencies', 'lbt_errors', 'other_nacks',
+                 'timeouts')
+
+    def __init__(self, channel: int, power: float) -> None:
+        self.channel = channel
+        self.power = power
+        self.cycles = 0
+        self.tags: Set[bytes] = set()
+        self.reads = 0
+        self.rssi: List[float] = []
+        self.latencies: List[float] = []
+        self.lbt_errors = 0
+        self.other_nacks = 0
+        self.timeouts = 0
+
+    @property
+    def frequency(self) -> Optional[float]:
+        """送信周波数（MHz）。OUTPUT_CH_FREQ_LIST に無いチャンネルの場合はNone。"""
+        channel = self.channel
+        return OUTPUT_CH_FREQ_LIST[channel - 1] if 1 <= channel <= len(OUTPUT_CH_FREQ_LIST) else None
+
+    def as_row(self, survey: str) -> Tuple[Any, ...]:
+        """sweep_points テーブルの1行 (_COLUMNS の順) を返す。"""
+        latencies = self.latencies
+        rssi = self.rssi
+        if len(latencies) >= 2:
+            latency_p95 = statistics.quantiles(latencies, n=20, method='inclusive')[-1]
+        else:
+            latency_p95 = latencies[0] if latencies else None
+        if len(rssi) >= 2:
+            rssi_p10, rssi_p50, rssi_p90 = (statistics.quantiles(rssi, n=10, method='inclusive')[i] for i in (0, 4, 8))
+        else:
+            rssi_p10 = rssi_p50 = rssi_p90 = rssi[0] if rssi else None
+        histogram: Dict[str, int] = {}
+        for value in rssi:
+            key = str(int(value // 1))   # 1dBmごと (例: -62.4 → '-63')
+            histogram[key] = histogram.get(key, 0) + 1
+        return (survey, self.channel, self.frequency, self.power, self.cycles, len(self.tags), self.reads,
+                self.lbt_errors, self.other_nacks, self.timeouts,
+                statistics.fmean(latencies) if latencies else None, latency_p95, max(latencies, default=None),
+                min(rssi, default=None), statistics.fmean(rssi) if rssi else None, max(rssi, default=None),
+                rssi_p10, rssi_p50, rssi_p90, json.dumps(histogram, sort_keys=True), time.time())
+
+
+class SurveyStore:
+    """
+    掃引の結果を保存するSQLiteのデータベース。
+    """
+
+    def __init__(self, path: str = 'survey.db') -> None:
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(_SCHEMA)
+
+    def done_points(self, survey: str) -> Set[Tuple[int, float]]:
+        """保存済みのポイント (チャンネル, 送信出力) の集合。"""
+        rows = self.connection.execute('SELECT channel, power FROM sweep_points WHERE survey = ?', (survey,))
+        return {(row['channel'], row['power']) for row in rows}
+
+    def save(self, survey: str, points: Iterable[SweepPoint]) -> None:
+        """ポイントの結果をまとめて書き込む (同じポイントは上書き)。"""
+        placeholders = ', '.join('?' * len(_COLUMNS))
+        with self.connection:
+            self.connection.executemany(
+                f"INSERT OR REPLACE INTO sweep_points ({', '.join(_COLUMNS)}) VALUES ({placeholders})",
+                [point.as_row(survey) for point in points])
+
+    def best_points(self, survey: str, limit: int = 5, max_lbt_rate: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        ユニークなタグ数が多い順 (同じならLBTエラーが少なく、1回あたりの時間が短い順) にポイントを返す。
+
+        Args:
+            survey (str): 掃引の名前。
+            limit (int): 返す件数。
+            max_lbt_rate (Optional[float]): LBTエラーの割合 (回数 / インベントリの回数) の上限。
+
+        Returns:
+            List[Dict[str, Any]]: sweep_points の行 (列名と値の辞書)。
+        """
+        query = 'SELECT * FROM sweep_points WHERE survey = ?'
+        parameters: List[Any] = [survey]
+        if max_lbt_rate is not None:
+            query += ' AND lbt_errors <= ? * cycles'
+            parameters.append(max_lbt_rate)
+        query += ' ORDER BY unique_tags DESC, lbt_errors ASC, latency_mean ASC LIMIT ?'
+        parameters.append(limit)
+        return [dict(row) for row in self.connection.execute(query, parameters)]
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+# 送信出力・周波数チャンネルを書き込み、読み取りで確認する
+def write_setting(ser, write_detail: int, setting: int, value: bytes, attempts: int = 3) -> None:
+    """
+    送信出力 (SETTING_OUTPUT_POWER) または周波数チャンネル (SETTING_FREQ_CH) を書き込み、
+    読み取りコマンドで書き込んだ値になったことを確認する。
+    書き込み・読み取りがNACK (CMD_LBT_ERROR など) または応答なしの場合は、attempts 回まで試す。
+
+    Args:
+        ser: シリアル通信オブジェクト。
+        write_detail (int): 書き込みの詳細コマンド (コマンド 0x55)。
+        setting (int): 設定の種類。
+        value (bytes): 値 (送信出力は0.1dBm単位の2バイト、ビッグエンディアン。チャンネルは1バイト)。
+        attempts (int): 試す回数。
+
+    Raises:
+        SurveyError: attempts 回ともACKを受信できなかった場合、読み取った値が書き込んだ値と異なる場合。
+    """
+    read_command = COMMANDS['UHF_READ_OUTPUT_POWER' if setting == SETTING_OUTPUT_POWER else 'UHF_READ_FREQ_CH']
+    message = ""
+    for _ in range(attempts):
+        result = communicate(ser, build_command(0x55, write_detail, bytes([setting, 0x00]) + value))
+        if not is_ack(result):
+            message = parse_nack_response(result) if is_nack(result) else "応答がありません"
+            continue
+        result = communicate(ser, read_command)
+        if not is_ack(result):
+            message = "読み取りに失敗しました"
+            continue
+        # 読み取りの応答の設定値が、書き込んだ値と同じか
+        if result[SETTING_VALUE_LOCATION:SETTING_VALUE_LOCATION + len(value)] != value:
+            raise SurveyError(f"書き込んだ値 ({value.hex()}) を読み取りで確認できませんでした "
+                              f"(詳細コマンド 0x{write_detail:02X} を確認してください)")
+        return
+    raise SurveyError(f"設定の書き込み (0x55 / 0x{write_detail:02X}): {message}")
+
+
+def set_output_power(ser, write_detail: int, power: float) -> None:
+    """送信出力（dBm）を書き込む。"""
+    write_setting(ser, write_detail, SETTING_OUTPUT_POWER, int(round(power * 10)).to_bytes(2, 'big'))
+
+
+def set_channel(ser, write_detail: int, channel: int) -> None:
+    """周波数チャンネルを書き込む。"""
+    write_setting(ser, write_detail, SETTING_FREQ_CH, bytes([channel]))
+
+
+# 1つのポイントでインベントリを繰り返し、結果を数える
+def measure_point(ser, point: SweepPoint, cycles: int, baud_rate: int = 19200) -> SweepPoint:
+    """
+    現在の設定でインベントリを cycles 回実行し、point に結果を書き込む。
+
+    Args:
+        ser: シリアル通信オブジェクト。
+        point (SweepPoint): 結果を書き込むポイント。
+        cycles (int): インベントリの回数。
+        baud_rate (int): ボーレート (インベントリのタイムアウトの計算に使用)。
+
+    Returns:
+        SweepPoint: point (結果を書き込んだもの)。
+    """
+    timeout = InventoryTimeout(baud_rate)
+    for _ in range(cycles):
+        start = time.perf_counter()
+        frames = communicate_frames(ser, COMMANDS['UHF_INVENTORY'], timeout.value)
+        point.latencies.append(time.perf_counter() - start)
+        point.cycles += 1
+        expected = None
+        error_code = None
+        # PC+UIIのバイト数がデータ長と合わないインベントリ応答は、decode_frame() がFrameのまま返すため読み飛ばす
+        for response in map(decode_frame, frames):
+            if isinstance(response, InventoryTag):
+                point.tags.add(response.pc_uii)
+                point.rssi.append(response.rssi)
+                point.reads += 1
+            elif isinstance(response, InventoryAck):
+                expected = response.read_count
+            elif isinstance(response, Nack):
+                error_code = response.code
+        if expected is None:
+            if error_code == NACK_LBT_ERROR:
+                point.lbt_errors += 1
+            elif error_code is not None:
+                point.other_nacks += 1
+            else:
+                point.timeouts += 1
+        timeout.update(expected)
+    return point
+
+
+# チャンネルと送信出力の組み合わせを掃引する
+def sweep(ser, store: SurveyStore, survey: str, channels: Sequence[int], powers: Sequence[float], cycles: int,
+          write_detail: int, baud_rate: int = 19200, verbose: bool = True) -> int:
+    """
+    チャンネルごとに、送信出力を順に変えてインベントリを行い、結果を store に保存する。
+    保存済みのポイントは飛ばす。終了時 (中断時も) は掃引前のチャンネルと送信出力に戻す。
+
+    Args:
+        ser: シリアル通信オブジェクト (インベントリを実行できる状態にしたもの)。
+        store (SurveyStore): 保存先。
+        survey (str): 掃引の名前 (再開時に同じ名前を指定する)。
+        channels (Sequence[int]): 周波数チャンネル。
+        powers (Sequence[float]): 送信出力（dBm）。
+        cycles (int): 1つのポイントあたりのインベントリの回数。
+        write_detail (int): 設定の書き込みの詳細コマンド。
+        baud_rate (int): ボーレート (インベントリのタイムアウトの計算に使用)。
+        verbose (bool): Trueなら、ポイントごとに結果を表示する。
+
+    Returns:
+        int: 今回計測したポイントの数。
+
+    Raises:
+        SurveyError: 設定を書き込めなかった場合 (それまでの結果は保存済み)。
+    """
+    done = store.done_points(survey)
+    remaining = [(channel, [power for power in powers if (channel, power) not in done]) for channel in channels]
+    remaining = [(channel, channel_powers) for channel, channel_powers in remaining if channel_powers]
+    if verbose and done:
+        print(f"保存済みの {len(done)} ポイントを飛ばします")
+    if not remaining:
+        return 0
+
+    # 掃引前の設定 (終了時に戻す)
+    result = communicate(ser, COMMANDS['UHF_READ_OUTPUT_POWER'])
+    original_power = OutputPower(result).dbm if is_ack(result) else None
+    result = communicate(ser, COMMANDS['UHF_READ_FREQ_CH'])
+    original_channel = FrequencyChannel(result).channel if is_ack(result) else None
+
+    measured = 0
+    current_power = original_power
+    try:
+        for channel, channel_powers in remaining:
+            set_channel(ser, write_detail, channel)
+            batch: List[SweepPoint] = []
+            try:
+                for power in channel_powers:
+                    if power != current_power:
+                        set_output_power(ser, write_detail, power)
+                        current_power = power
+                    point = measure_point(ser, SweepPoint(channel, power), cycles, baud_rate)
+                    batch.append(point)
+                    if verbose:
+                        latency = statistics.fmean(point.latencies) * 1000 if point.latencies else 0.0
+                        print(f"ch{channel:2d} {power:5.1f} dBm: ユニーク {len(point.tags):4d}, "
+                              f"LBTエラー {point.lbt_errors:3d}, 1回 {latency:7.1f} ms")
+            finally:
+                # チャンネルごとにまとめて書き込む (中断時も、計測済みの分は書き込む)
+                if batch:
+                    store.save(survey, batch)
+                    measured += len(batch)
+    finally:
+        try:
+            if original_channel is not None:
+                set_channel(ser, write_detail, original_channel)
+            if original_power is not None and current_power != original_power:
+                set_output_power(ser, write_detail, original_power)
+        except SurveyError as e:
+            print(f"掃引前の設定に戻せませんでした: {e}")
+    return measured
+
+
+# コマンドラインの範囲の指定を解析する ('1-38'、'1,5,9'、'15-27:2')
+def _parse_values(text: str, convert) -> List:
+    values = []
+    for item in text.split(','):
+        item, _, step = item.partition(':')
+        low, separator, high = item.partition('-')
+        if not separator:
+            values.append(convert(low))
+            continue
+        low_value, high_value, step_value = convert(low), convert(high), convert(step or '1')
+        count = 0
+        while low_value + count * step_value <= high_value:
+            # 送信出力は0.1dBm単位のため、小数の誤差を丸める (保存済みのポイントとの比較に使う)
+            values.append(round(low_value + count * step_value, 1))
+            count += 1
+    return values
+
+
+# コマンドラインから実行する
+def main() -> None:
+    """チャンネルと送信出力を掃引する。--best を指定した場合は、保存した結果を表示するのみ。"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="UTR-S201 周波数チャンネル・送信出力の掃引")
+    parser.add_argument('--port', default=None, help="ポート名 (例: COM3, /dev/ttyUSB0)")
+    parser.add_argument('--baud', type=int, default=19200, help="ボーレート")
+    parser.add_argument('--db', default='survey.db', help="結果を保存するSQLiteのファイル")
+    parser.add_argument('--survey', required=True, help="掃引の名前 (同じ名前で再実行すると続きから再開)")
+    parser.add_argument('--channels', default=f'1-{len(OUTPUT_CH_FREQ_LIST)}',
+                        help="周波数チャンネル (例: 1-38, 1,5,9)")
+    parser.add_argument('--powers', default=None, help="送信出力 dBm (例: 20,25 や 15-27:2)")
+    parser.add_argument('--cycles', type=int, default=10, help="1つのポイントあたりのインベントリの回数")
+    parser.add_argument('--write-detail', default=None, metavar='HEX',
+                        help="送信出力・周波数チャンネルの書き込みの詳細コマンド (16進数、プロトコル仕様書を参照)")
+    parser.add_argument('--best', type=int, default=None, metavar='N', help="保存した結果の上位N件を表示する")
+    parser.add_argument('--max-lbt-rate', type=float, default=None, help="--best で表示するLBTエラーの割合の上限")
+    args = parser.parse_args()
+
+    store = SurveyStore(args.db)
+    try:
+        if args.best is not None:
+            for row in store.best_points(args.survey, args.best, args.max_lbt_rate):
+                print(f"ch{row['channel']:2d} ({row['frequency']} MHz) {row['power']:5.1f} dBm: "
+                      f"ユニーク {row['unique_tags']}, LBTエラー {row['lbt_errors']}/{row['cycles']}, "
+                      f"RSSI 平均 {row['rssi_mean']}, 1回 {row['latency_mean']}")
+            return
+        if args.port is None or args.powers is None or args.write_detail is None:
+            parser.error("掃引には --port, --powers, --write-detail を指定してください")
+        try:
+            channels = _parse_values(args.channels, int)
+            powers = _parse_values(args.powers, float)
+            write_detail = int(args.write_detail, 16)
+        except ValueError:
+            parser.error("--channels, --powers, --write-detail の形式が正しくありません")
+
+        from utr_reader import HandshakeError, handshake, open_reader
+
+        ser = open_reader(args.port, args.baud)
+        try:
+            handshake(ser, verbose=False)
+            measured = sweep(ser, store, args.survey, channels, powers, args.cycles, write_detail, args.baud)
+            print(f"{measured} ポイントを計測しました ({args.db})")
+        except (HandshakeError, SurveyError) as e:
+            print(e)
+        except KeyboardInterrupt:
+            print("中断しました (計測済みのポイントは保存済み、同じ --survey で再開できます)")
+        finally:
+            ser.close()
+    finally:
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+UTR-S201 シリーズ タグ読み取り結果の集計モジュール（無保証）
+
+【概要】
+PC+UII(bytes)をキーに、タグごとの読み取り回数、最初/最後に読み取った時刻、
+RSSIの最小/最大/平均、最後のアンテナ番号・ANGLEを集計する。
+16進数文字列への変換は行わず、1タグあたり __slots__ のレコード1つで保持する。
+
+変更されたタグは更新順に並べて管理するため、ダッシュボードなどは
+changes_since() で前回取得以降に変化したタグだけを取り出せる (全件のコピー不要)。
+更新と取り出しはロックの中で行うため、InventoryPipeline の処理段 (ワーカースレッド) が
+集計している間に、別のスレッドから changes_since() などを呼び出せる。
+
+【使用例】
+    store = TagStore()
+    store.add_many(pc_uii_list, rssi_list, time.time(), angle_list=angle_list)
+    version, changes = store.changes_since(0)   # 全件
+    version, changes = store.changes_since(version)   # 前回以降の差分のみ
+"""
+
+import threading
+import time
+
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+class TagRecord:
+    """
+    1タグ分の集計結果。
+
+    Attributes:
+        count (int): 読み取り回数。
+        first_seen (float): 最初に読み取った時刻 (time.time())。
+        last_seen (float): 最後に読み取った時刻 (time.time())。
+        rssi_min (float): RSSIの最小値（dBm）。
+        rssi_max (float): RSSIの最大値（dBm）。
+        rssi_sum (float): RSSIの合計 (平均の計算用)。
+        antenna (Optional[int]): 最後に読み取ったアンテナ番号 (不明ならNone)。
+        angle (Optional[int]): 最後に読み取ったときのANGLE (不明ならNone)。
+        version (int): 最後に更新されたときのバージョン番号。
+    """
+
+    __slots__ = ('count', 'first_seen', 'last_seen', 'rssi_min', 'rssi_max', 'rssi_sum',
+                 'antenna', 'angle', 'version')
+
+    def __init__(self, rssi: float, timestamp: float, antenna: Optional[int],
+                 angle: Optional[int], version: int) -> None:
+        self.count = 1
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.rssi_min = rssi
+        self.rssi_max = rssi
+        self.rssi_sum = rssi
+        self.antenna = antenna
+        self.angle = angle
+        self.version = version
+
+    @property
+    def rssi_mean(self) -> float:
+        """RSSIの平均値（dBm）。"""
+        return self.rssi_sum / self.count
+
+    def as_tuple(self) -> Tuple[int, float, float, float, float, float, Optional[int], Optional[int]]:
+        """
+        集計結果を変更されないタプルとして返す (差分の受け渡し用)。
+
+        Returns:
+            Tuple: (読み取り回数, 最初の時刻, 最後の時刻, RSSI最小, RSSI最大, RSSI平均, アンテナ番号, ANGLE)
+        """
+        return (self.count, self.first_seen, self.last_seen, self.rssi_min, self.rssi_max,
+                self.rssi_mean, self.antenna, self.angle)
+
+    def __repr__(self) -> str:
+        return (f"TagRecord(count={self.count}, rssi_mean={self.rssi_mean:.1f}, "
+                f"first_seen={self.first_seen:.3f}, last_seen={self.last_seen:.3f})")
+
+
+class TagStore:
+    """
+    PC+UII(bytes)をキーにした、タグ読み取り結果の集計表。
+    更新されたタグは辞書の末尾へ移動するため、辞書の並びは常に更新順となる。
+    複数のスレッドから使えるよう、辞書の更新と走査はロックの中で行う。
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._tags: Dict[bytes, TagRecord] = {}
+        self.version = 0         # 更新のたびに1増えるバージョン番号
+        self.total_reads = 0     # 総読み取り回数
+
+    def __len__(self) -> int:
+        return len(self._tags)
+
+    def __contains__(self, pc_uii: bytes) -> bool:
+        return pc_uii in self._tags
+
+    def __iter__(self) -> Iterator[bytes]:
+        # 走査中に他のスレッドが更新しても良いように、その時点のキーの一覧を返す
+        with self._lock:
+            return iter(list(self._tags))
+
+    def get(self, pc_uii: bytes) -> Optional[TagRecord]:
+        """PC+UIIの集計結果を返す。読み取っていない場合はNone。"""
+        return self._tags.get(pc_uii)
+
+    def items(self) -> Iterator[Tuple[bytes, TagRecord]]:
+        """(PC+UII, 集計結果) を更新の古い順に返す (呼び出した時点の一覧)。"""
+        with self._lock:
+            return iter(list(self._tags.items()))
+
+    def add(self, pc_uii: bytes, rssi: float, timestamp: Optional[float] = None,
+            antenna: Optional[int] = None, angle: Optional[int] = None) -> TagRecord:
+        """
+        1回分の読み取り結果を集計する。
+
+        Args:
+            pc_uii (bytes): PC+UIIデータ。
+            rssi (float): RSSI値（dBm）。
+            timestamp (Optional[float]): 読み取り時刻。省略時は現在時刻。
+            antenna (Optional[int]): アンテナ番号。
+            angle (Optional[int]): ANGLEの値。
+
+        Returns:
+            TagRecord: 更新後の集計結果。
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        with self._lock:
+            return self._add(pc_uii, rssi, timestamp, antenna, angle)
+
+    # 1回分の読み取り結果を集計する (ロックを取得済みで呼ぶ)
+    def _add(self, pc_uii: bytes, rssi: float, timestamp: float, antenna: Optional[int],
+             angle: Optional[int]) -> TagRecord:
+        self.version += 1
+        self.total_reads += 1
+
+        tags = self._tags
+        record = tags.pop(pc_uii, None)
+        if record is None:
+            record = TagRecord(rssi, timestamp, antenna, angle, self.version)
+        else:
+            record.count += 1
+            record.last_seen = timestamp
+            if rssi < record.rssi_min:
+                record.rssi_min = rssi
+            if rssi > record.rssi_max:
+                record.rssi_max = rssi
+            record.rssi_sum += rssi
+            record.antenna = antenna
+            record.angle = angle
+            record.version = self.version
+        # 末尾へ (再)登録し、更新順を保つ
+        tags[pc_uii] = record
+        return record
+
+    def add_many(self, pc_uii_list: Iterable[bytes], rssi_list: Iterable[float],
+                 timestamp: Optional[float] = None, antenna: Optional[int] = None,
+                 angle_list: Optional[Iterable[int]] = None) -> None:
+        """
+        received_data_parse() の結果(PC+UIIリスト、RSSIリスト)をまとめて集計する。
+
+        Args:
+            pc_uii_list (Iterable[bytes]): PC+UIIデータのリスト。
+            rssi_list (Iterable[float]): RSSI値のリスト。
+            timestamp (Optional[float]): 読み取り時刻。省略時は現在時刻。
+            antenna (Optional[int]): アンテナ番号。
+            angle_list (Optional[Iterable[int]]): ANGLEの値のリスト (PC+UIIリストと同じ順)。Noneなら不明。
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        add = self._add
+        with self._lock:
+            if angle_list is None:
+                for pc_uii, rssi in zip(pc_uii_list, rssi_list):
+                    add(pc_uii, rssi, timestamp, antenna, None)
+            else:
+                for pc_uii, rssi, angle in zip(pc_uii_list, rssi_list, angle_list):
+                    add(pc_uii, rssi, timestamp, antenna, angle)
+
+    def changes_since(self, version: int) -> Tuple[int, List[Tuple[bytes, Tuple]]]:
+        """
+        指定したバージョンより後に更新されたタグの集計結果を返す。
+        辞書の末尾(最新の更新)から遡るため、処理量は変化したタグの数に比例する。
+
+        Args:
+            version (int): 前回取得したバージョン番号 (初回は0)。
+
+        Returns:
+            Tuple[int, List[Tuple[bytes, Tuple]]]:
+                現在のバージョン番号と、(PC+UII, TagRecord.as_tuple()) のリスト (更新の古い順)。
+        """
+        changes: List[Tuple[bytes, Tuple]] = []
+        # 走査中に add() で辞書が変わらないよう、ロックの中で取り出す
+        with self._lock:
+            tags = self._tags
+            for pc_uii in reversed(tags):
+                record = tags[pc_uii]
+                if record.version <= version:
+                    break
+                changes.append((pc_uii, record.as_tuple()))
+            current = self.version
+        changes.reverse()
+        return current, changes
+
+    def counts(self) -> Dict[str, int]:
+        """
+        PC+UII(16進数文字列)ごとの読み取り回数の辞書を返す (save_results_to_file() 用)。
+
+        Returns:
+            Dict[str, int]: PC+UII(16進数文字列、大文字)と読み取り回数の辞書。
+        """
+        with self._lock:
+            return {pc_uii.hex().upper(): record.count for pc_uii, record in self._tags.items()}
+
+    def clear(self) -> None:
+        """集計結果を全て削除する。"""
+        with self._lock:
+            self._tags.clear()
+            self.total_reads = 0
+            self.version += 1
@@ -0,0 +1,565 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+UTR-S201 シリーズ インベントリパラメータの自動調整モジュール（無保証）
+
+【概要】
+UHF_SET_INVENTORY_PARAM (0x55 / 0x30) で設定するインベントリパラメータ (8バイト) を
+InventoryParam で扱い、短いインベントリの試行を繰り返して、現在のタグの置き方で
+1秒あたりに読み取れるタグの種類数 (ユニークなPC+UII) が最も多くなる値を探す。
+
+- InventoryParam   : パラメータ8バイトの値。バイト位置を指定して読み書きする。
+                     UHF_GET_INVENTORY_PARAM の応答からの取り出し (from_response) と、
+                     UHF_SET_INVENTORY_PARAM のコマンドの組み立て (to_command) を行う。
+                     各バイトの意味はリーダライタのプロトコル仕様書を参照すること
+                     (本モジュールではバイトの値としてのみ扱う)。
+- run_trial()      : パラメータを設定してインベントリを cycles 回ずつ repeats 回実行し、次を計測する。
+                     ユニークなタグ数/秒 (repeats 回ごとの値とそのばらつき)、
+                     ACKの読み取り枚数と受信したタグ数の不一致、NACK (NACK_LBT_ERROR など) とタイムアウトの回数
+- InventoryTuner   : 指定したバイト位置ごとに候補の値を試し (1バイトずつ最良の値に決める)、
+                     変化がなくなるか max_passes 回まで繰り返す。同じ値は再計測しない。
+                     NACK・タイムアウトや不一致の割合が上限を超えた試行は選ばない。
+                     ユニークなタグ数/秒の差が、min_improvement の割合と、繰り返しの計測のばらつき
+                     (最大と最小の差) の両方を超えた場合のみ値を変える (計測のばらつきで値が変わらないように)。
+- TuningReport     : 試行の一覧と選んだパラメータ。表形式の表示とJSON形式の保存ができる。
+
+【使用例】
+    tuner = InventoryTuner(ser, {1: [0x80, 0x81, 0x82, 0x83]}, baud_rate=115200)
+    report = tuner.tune(InventoryParam(info.inventory_param))
+    print(report.format())
+
+    python utr_tuner.py --port /dev/ttyUSB0 --baud 115200 --vary 1=80-83 --cycles 10 --repeats 3 --report tuning.json
+"""
+
+import time
+
+from typing import Any, Dict, List, Optional, Sequence
+
+from utr_protocol import (ACK, ADD, COMMANDS, DEFAULT_INVENTORY_PARAM, DETAIL_INV, DETAIL_SET_INVENTORY_PARAM,
+                          ERROR_CODE_LOCATION, INV, NACK, PC_UII_LOCATION, InventoryTimeout, build_command,
+                          check_inventory_ack_response, communicate, communicate_frames, inventory_pc_uii_length,
+                          is_ack, is_nack, parse_nack_response)
+from utr_responses import InventoryParams
+
+# インベントリパラメータのバイト数
+INVENTORY_PARAM_LENGTH = 8
+
+
+class TunerError(Exception):
+    """インベントリパラメータの取得・設定でACK/NACKを受信できなかった。"""
+
+
+class InventoryParam:
+    """
+    インベントリパラメータ (8バイト) の値。変更不可で、辞書のキーにも使える。
+
+    param[1] のようにバイト位置で値を参照し、replace() で1バイトだけ変えた値を作る。
+    """
+
+    __slots__ = ('_value',)
+
+    def __init__(self, value: bytes = DEFAULT_INVENTORY_PARAM) -> None:
+        value = bytes(value)
+        if len(value) != INVENTORY_PARAM_LENGTH:
+            raise ValueError(f"インベントリパラメータは{INVENTORY_PARAM_LENGTH}バイトで指定してください "
+                             f"({len(value)} バイト)")
+        self._value = value
+
+    @classmethod
+    def from_hex(cls, text: str) -> 'InventoryParam':
+        """16進数の文字列 (例: '0081000000000000') から作成する。"""
+        return cls(bytes.fromhex(text))
+
+    @classmethod
+    def from_response(cls, response: bytes) -> 'InventoryParam':
+        """UHF_GET_INVENTORY_PARAM のACK (STXからCRまで) から取り出す。"""
+        return cls(InventoryParams(response).param)
+
+    def __getitem__(self, index: int) -> int:
+        return self._value[index]
+
+    def replace(self, index: int, value: int) -> 'InventoryParam':
+        """
+        index バイト目を value にした値を返す (自身は変更しない)。
+
+        Args:
+            index (int): バイト位置 (0～7)。
+            value (int): 値 (00h～FFh)。
+
+        Returns:
+            InventoryParam: 変更後の値。
+        """
+        if not 0 <= index < INVENTORY_PARAM_LENGTH:
+            raise IndexError(f"バイト位置は 0～{INVENTORY_PARAM_LENGTH - 1} で指定してください ({index})")
+        if not 0 <= value <= 0xFF:
+            raise ValueError(f"値は 00h～FFh で指定してください ({value})")
+        value_bytes = bytearray(self._value)
+        value_bytes[index] = value
+        return InventoryParam(value_bytes)
+
+    def to_command(self, address: int = ADD[0]) -> bytes:
+        """UHF_SET_INVENTORY_PARAM の送信コマンドを組み立てる。"""
+        return build_command(0x55, DETAIL_SET_INVENTORY_PARAM, self._value, address)
+
+    def hex(self) -> str:
+        return self._value.hex()
+
+    def __bytes__(self) -> bytes:
+        return self._value
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, InventoryParam) and self._value == other._value
+
+    def __hash__(self) -> int:
+        return hash(self._value)
+
+    def __repr__(self) -> str:
+        return f"InventoryParam({self.hex()})"
+
+
+# UHF_GET_INVENTORY_PARAM でリーダライタのパラメータを読み取る
+def read_inventory_param(ser, timeout: float = 1.0) -> InventoryParam:
+    """
+    リーダライタに設定されているインベントリパラメータを読み取る。
+
+    Args:
+        ser: シリアル通信オブジェクト。
+        timeout (float): 応答待ち時間（秒）。
+
+    Returns:
+        InventoryParam: 読み取ったパラメータ。
+
+    Raises:
+        TunerError: ACKを受信できなかった場合 (NACKの場合はエラー内容を含む)。
+    """
+    result = communicate(ser, COMMANDS['UHF_GET_INVENTORY_PARAM'], timeout)
+    if is_ack(result):
+        return InventoryParam.from_response(result)
+    if is_nack(result):
+        raise TunerError(f"UHF_GET_INVENTORY_PARAM: {parse_nack_response(result)}")
+    raise TunerError("UHF_GET_INVENTORY_PARAM 実行エラー（ACK/NACK なし）")
+
+
+# UHF_SET_INVENTORY_PARAM でパラメータを設定する
+def write_inventory_param(ser, param: InventoryParam, timeout: float = 1.0) -> Optional[int]:
+    """
+    インベントリパラメータを設定する。
+
+    Args:
+        ser: シリアル通信オブジェクト。
+        param (InventoryParam): 設定するパラメータ。
+        timeout (float): 応答待ち時間（秒）。
+
+    Returns:
+        Optional[int]: ACKならNone、NACKならエラーコード (FORMAT_ERROR など、設定できない値)。
+
+    Raises:
+        TunerError: ACK/NACKのどちらも受信できなかった場合。
+    """
+    result = communicate(ser, param.to_command(), timeout)
+    if is_ack(result):
+        return None
+    if is_nack(result):
+        return result[ERROR_CODE_LOCATION]
+    raise TunerError("UHF_SET_INVENTORY_PARAM 実行エラー（ACK/NACK なし）")
+
+
+class TrialResult:
+    """
+    1つのパラメータで行った試行の結果。
+
+    Attributes:
+        param (InventoryParam): 試したパラメータ。
+        rejected (Optional[int]): UHF_SET_INVENTORY_PARAM がNACKだった場合のエラーコード (試行せず)。
+        cycles (int): インベントリの回数。
+        elapsed (float): インベントリにかかった時間（秒、パラメータの設定は含まない）。
+        repeat_rates (List[float]): 繰り返しごとの、ユニークなタグ数/秒。
+        unique_tags (int): 試行全体で読み取ったタグの種類数 (ユニークなPC+UII)。
+        round_unique_tags (int): インベントリ1回ごとのユニークなタグ数の合計。
+        reads (int): 受信したタグのフレーム数。
+        expected_tags (int): ACKの読み取り枚数の合計。
+        mismatches (int): ACKの読み取り枚数と受信したタグ数が一致しなかった回数。
+        nacks (Dict[int, int]): インベントリのNACKのエラーコードごとの回数。
+        timeouts (int): ACK/NACKを受信できなかった回数。
+    """
+
+    __slots__ = ('param', 'rejected', 'cycles', 'elapsed', 'repeat_rates', 'unique_tags', 'round_unique_tags', 'reads',
+                 'expected_tags', 'mismatches', 'nacks', 'timeouts')
+
+    def __init__(self, param: InventoryParam) -> None:
+        self.param = param
+        self.rejected: Optional[int] = None
+        self.cycles = 0
+        self.elapsed = 0.0
+        self.repeat_rates: List[float] = []
+        self.unique_tags = 0
+        self.round_unique_tags = 0
+        self.reads = 0
+        self.expected_tags = 0
+        self.mismatches = 0
+        self.nacks: Dict[int, int] = {}
+        self.timeouts = 0
+
+    @property
+    def unique_tags_per_second(self) -> float:
+        """
+        1秒あたりのユニークなタグ数 (調整の目的とする値)。
+        インベントリ1回ごとのユニークなタグ数の合計を、インベントリにかかった時間で割る
+        (試行全体のユニーク数で割ると、読み取り枚数の少ない値ほど1回が短くなり有利になるため)。
+        """
+        return self.round_unique_tags / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def spread(self) -> float:
+        """計測のばらつき: 繰り返しごとのユニークなタグ数/秒の、最大と最小の差 (1回のみなら0)。"""
+        return max(self.repeat_rates) - min(self.repeat_rates) if len(self.repeat_rates) > 1 else 0.0
+
+    @property
+    def error_rate(self) -> float:
+        """インベントリがNACKまたはタイムアウトになった割合 (0～1)。"""
+        if self.cycles == 0:
+            return 1.0
+        return (sum(self.nacks.values()) + self.timeouts) / self.cycles
+
+    @property
+    def mismatch_rate(self) -> float:
+        """ACKの読み取り枚数と受信したタグ数が一致しなかった割合 (0～1)。"""
+        return self.mismatches / self.cycles if self.cycles else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        """JSONファイルへ保存する形式で返す。"""
+        return {'param': self.param.hex(), 'rejected': self.rejected, 'cycles': self.cycles,
+                'elapsed': round(self.elapsed, 6),
+                'repeat_rates': [round(rate, 3) for rate in self.repeat_rates], 'unique_tags': self.unique_tags,
+                'round_unique_tags': self.round_unique_tags, 'reads': self.reads,
+                'expected_tags': self.expected_tags, 'mismatches': self.mismatches,
+                'nacks': {f'0x{code:02X}': count for code, count in sorted(self.nacks.items())},
+                'timeouts': self.timeouts,
+                'unique_tags_per_second': round(self.unique_tags_per_second, 3), 'spread': round(self.spread, 3),
+                'error_rate': round(self.error_rate, 6), 'mismatch_rate': round(self.mismatch_rate, 6)}
+
+    def __repr__(self) -> str:
+        return (f"TrialResult(param={self.param.hex()}, unique_tags_per_second={self.unique_tags_per_second:.1f}, "
+                f"spread={self.spread:.1f}, error_rate={self.error_rate:.3f}, mismatch_rate={self.mismatch_rate:.3f})")
+
+
+# パラメータを設定し、インベントリを繰り返して読み取り性能を計測する
+def run_trial(ser, param: InventoryParam, cycles: int = 10, baud_rate: int = 19200, repeats: int = 1) -> TrialResult:
+    """
+    パラメータを設定してインベントリを cycles 回ずつ repeats 回実行し、結果を数える。
+    繰り返しごとのユニークなタグ数/秒を repeat_rates に記録する (計測のばらつきの確認用)。
+    handshake() などで、インベントリを実行できる状態にしてから呼ぶ。
+
+    Args:
+        ser: シリアル通信オブジェクト。
+        param (InventoryParam): 試すパラメータ。
+        cycles (int): 1回の繰り返しのインベントリの回数。
+        baud_rate (int): ボーレート (インベントリのタイムアウトの計算に使用)。
+        repeats (int): 繰り返しの回数。
+
+    Returns:
+        TrialResult: 試行の結果。パラメータがNACKで拒否された場合は rejected のみ設定する。
+    """
+    trial = TrialResult(param)
+    trial.rejected = write_inventory_param(ser, param)
+    if trial.rejected is not None:
+        return trial
+
+    timeout = InventoryTimeout(baud_rate)
+    inv, ack, nack, detail_inv = INV[0], ACK[0], NACK[0], DETAIL_INV[0]
+    seen = set()
+    round_seen = set()
+    for _ in range(repeats):
+        repeat_unique_tags = 0
+        start = time.perf_counter()
+        for _ in range(cycles):
+            frames = communicate_frames(ser, COMMANDS['UHF_INVENTORY'], timeout.value)
+            trial.cycles += 1
+            tags = 0
+            round_seen.clear()
+            expected = None
+            error_code = None
+            for frame in frames:
+                command = frame.command
+                if command == inv:
+                    raw = frame.raw
+                    pc_uii_length = inventory_pc_uii_length(raw)
+                    if pc_uii_length is None:
+                        continue   # PC+UIIのバイト数がデータ長と合わないフレームは読み飛ばす
+                    round_seen.add(bytes(raw[PC_UII_LOCATION:PC_UII_LOCATION + pc_uii_length]))
+                    tags += 1
+                elif command == ack and frame.detail == detail_inv:
+                    expected = check_inventory_ack_response(frame.raw)
+                elif command == nack:
+                    error_code = frame.raw[ERROR_CODE_LOCATION]
+            trial.reads += tags
+            repeat_unique_tags += len(round_seen)
+            seen |= round_seen
+            if expected is not None:
+                trial.expected_tags += expected
+                if expected != tags:
+                    trial.mismatches += 1
+            elif error_code is not None:
+                trial.nacks[error_code] = trial.nacks.get(error_code, 0) + 1
+            else:
+                trial.timeouts += 1
+            timeout.update(expected)
+        elapsed = time.perf_counter() - start
+        trial.elapsed += elapsed
+        trial.round_unique_tags += repeat_unique_tags
+        trial.repeat_rates.append(repeat_unique_tags / elapsed if elapsed > 0 else 0.0)
+    trial.unique_tags = len(seen)
+    return trial
+
+
+class TuningReport:
+    """
+    InventoryTuner.tune() の結果。
+
+    Attributes:
+        initial (InventoryParam): 調整前のパラメータ。
+        best (InventoryParam): 選んだパラメータ (条件を満たす試行が無ければ initial)。
+        trials (List[TrialResult]): 行った試行 (行った順)。
+        passes (int): 全てのバイト位置を試した回数。
+    """
+
+    __slots__ = ('initial', 'best', 'trials', 'passes')
+
+    def __init__(self, initial: InventoryParam) -> None:
+        self.initial = initial
+        self.best = initial
+        self.trials: List[TrialResult] = []
+        self.passes = 0
+
+    def trial_for(self, param: InventoryParam) -> Optional[TrialResult]:
+        """param で行った試行 (無ければNone)。"""
+        return next((trial for trial in self.trials if trial.param == param), None)
+
+    def format(self) -> str:
+        """試行の一覧を表形式の文字列で返す (選んだパラメータに * を付ける)。"""
+        lines = ["  パラメータ         ユニーク/秒 ユニーク   受信  不一致  NACK  タイムアウト",
+                 "  ---------------- ---------- -------- ------ ------ ----- -----------"]
+        for trial in self.trials:
+            mark = '*' if trial.param == self.best else ' '
+            if trial.rejected is not None:
+                lines.append(f"{mark} {trial.param.hex()}  設定できません (NACK 0x{trial.rejected:02X})")
+                continue
+            lines.append(f"{mark} {trial.param.hex()} {trial.unique_tags_per_second:10.1f} {trial.unique_tags:8d} "
+                         f"{trial.reads:6d} {trial.mismatches:6d} {sum(trial.nacks.values()):5d} "
+                         f"{trial.timeouts:11d}")
+        lines.append(f"試行 {len(self.trials)} 回 ({self.passes} 巡)、"
+                     f"選んだパラメータ: {self.best.hex()} (調整前: {self.initial.hex()})")
+        return "\n".join(lines)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """JSONファイルへ保存する形式で返す。"""
+        return {'initial': self.initial.hex(), 'best': self.best.hex(), 'passes': self.passes,
+                'trials': [trial.as_dict() for trial in self.trials]}
+
+
+class InventoryTuner:
+    """
+    インベントリパラメータを1バイトずつ変えて試行し、ユニークなタグ数/秒が最も多い値を探す。
+    """
+
+    def __init__(self, ser, search: Dict[int, Sequence[int]], cycles: int = 10, baud_rate: int = 19200,
+                 max_passes: int = 3, max_error_rate: float = 0.1, max_mismatch_rate: float = 0.05,
+                 min_coverage: float = 0.95, min_improvement: float = 0.02, repeats: int = 3,
+                 verbose: bool = True) -> None:
+        """
+        Args:
+            ser: シリアル通信オブジェクト (インベントリを実行できる状態にしたもの)。
+            search (Dict[int, Sequence[int]]): バイト位置ごとの候補の値。
+            cycles (int): 1回の試行の、1回の繰り返しのインベントリの回数。
+            baud_rate (int): ボーレート (インベントリのタイムアウトの計算に使用)。
+            max_passes (int): 全てのバイト位置を試す回数の上限。
+            max_error_rate (float): 選ぶ試行のNACK・タイムアウトの割合の上限。
+            max_mismatch_rate (float): 選ぶ試行の読み取り枚数の不一致の割合の上限。
+            min_coverage (float): 選ぶ試行で読み取ったタグの種類数の下限 (全ての試行の中で
+                                  最も多い種類数に対する割合)。一部のタグしか読めない値を選ばないため。
+            min_improvement (float): 選んでいる値より、ユニークなタグ数/秒がこの割合以上
+                                     多い場合に値を変える (計測のばらつきで値が変わらないように)。
+            repeats (int): 1回の試行で、cycles 回のインベントリを繰り返す回数。
+                           ユニークなタグ数/秒の差が、繰り返しの計測のばらつき (最大と最小の差) より
+                           大きい場合のみ値を変える。1なら、ばらつきは確認しない。
+            verbose (bool): Trueなら、試行ごとに結果を表示する。
+        """
+        for index, values in search.items():
+            if not 0 <= index < INVENTORY_PARAM_LENGTH:
+                raise IndexError(f"バイト位置は 0～{INVENTORY_PARAM_LENGTH - 1} で指定してください ({index})")
+            if not values:
+                raise ValueError(f"{index} バイト目の候補の値がありません")
+        if repeats < 1:
+            raise ValueError(f"repeats は1以上を指定してください ({repeats})")
+        self.ser = ser
+        self.search = {index: list(values) for index, values in sorted(search.items())}
+        self.cycles = cycles
+        self.baud_rate = baud_rate
+        self.max_passes = max_passes
+        self.max_error_rate = max_error_rate
+        self.max_mismatch_rate = max_mismatch_rate
+        self.min_coverage = min_coverage
+        self.min_improvement = min_improvement
+        self.repeats = repeats
+        self.verbose = verbose
+
+    def acceptable(self, trial: TrialResult, report: TuningReport) -> bool:
+        """
+        選んでよい試行ならTrue。設定でき、NACK・タイムアウトと不一致の割合が上限以下で、
+        読み取ったタグの種類数が、これまでの試行の最大の min_coverage 倍以上の場合。
+        """
+        if trial.rejected is not None or trial.cycles == 0:
+            return False
+        most_tags = max(t.unique_tags for t in report.trials)
+        return (trial.error_rate <= self.max_error_rate and trial.mismatch_rate <= self.max_mismatch_rate
+                and trial.unique_tags >= self.min_coverage * most_tags)
+
+    def _better(self, trial: TrialResult, current: Optional[TrialResult], report: TuningReport) -> bool:
+        # 選んでいる試行より、ユニークなタグ数/秒が min_improvement の割合以上、かつ
+        # 両方の試行の計測のばらつき (繰り返しの最大と最小の差) より多ければTrue
+        if not self.acceptable(trial, report):
+            return False
+        if current is None or not self.acceptable(current, report):
+            return True
+        gain = trial.unique_tags_per_second - current.unique_tags_per_second
+        return gain > current.unique_tags_per_second * self.min_improvement and gain > max(trial.spread, current.spread)
+
+    def _trial(self, report: TuningReport, param: InventoryParam) -> TrialResult:
+        trial = report.trial_for(param)
+        if trial is not None:
+            return trial   # 同じ値は再計測しない
+        trial = run_trial(self.ser, param, self.cycles, self.baud_rate, self.repeats)
+        report.trials.append(trial)
+        if self.verbose:
+            if trial.rejected is not None:
+                print(f"{param.hex()}: 設定できません (NACK 0x{trial.rejected:02X})")
+            else:
+                print(f"{param.hex()}: {trial.unique_tags_per_second:8.1f} ユニーク/秒 (ばらつき {trial.spread:.1f}), "
+                      f"NACK・タイムアウト {trial.error_rate:.1%}, 不一致 {trial.mismatch_rate:.1%}")
+        return trial
+
+    def tune(self, initial: InventoryParam, apply: bool = True) -> TuningReport:
+        """
+        initial から始めて、バイト位置ごとに候補の値を試行し、最良の値に決めていく。
+        終了時には、apply がTrueなら選んだパラメータを、Falseなら initial を設定し直す。
+
+        Args:
+            initial (InventoryParam): 調整前のパラメータ (リーダライタに設定されている値)。
+            apply (bool): Trueなら、選んだパラメータをリーダライタに設定したままにする。
+
+        Returns:
+            TuningReport: 試行の一覧と選んだパラメータ。
+        """
+        report = TuningReport(initial)
+        best_trial = self._trial(report, initial)
+
+        for _ in range(self.max_passes):
+            report.passes += 1
+            changed = False
+            for index, values in self.search.items():
+                for value in values:
+                    trial = self._trial(report, best_trial.param.replace(index, value))
+                    if self._better(trial, best_trial, report):
+                        best_trial = trial
+                        changed = True
+            if not changed:
+                break
+
+        # 後の試行で読み取れたタグの種類が増えると、選んだ試行が条件を満たさなくなることがあるため、
+        # 全ての試行から選び直す
+        for trial in report.trials:
+            if self._better(trial, best_trial, report):
+                best_trial = trial
+        if self.acceptable(best_trial, report):
+            report.best = best_trial.param
+        final = report.best if apply else initial
+        if write_inventory_param(self.ser, final) is not None:
+            raise TunerError(f"UHF_SET_INVENTORY_PARAM: {final.hex()} を設定できませんでした")
+        return report
+
+
+# コマンドラインの --vary の指定を解析する
+def parse_search_space(specs: Sequence[str]) -> Dict[int, List[int]]:
+    """
+    'バイト位置=値,値,...' の形式 (値は16進数、'80-83' のように範囲も指定可) を解析する。
+
+    Args:
+        specs (Sequence[str]): 指定の一覧 (例: ['1=80-83', '3=00,04'])。
+
+    Returns:
+        Dict[int, List[int]]: バイト位置ごとの候補の値。
+
+    Raises:
+        ValueError: 形式が正しくない場合。
+    """
+    search: Dict[int, List[int]] = {}
+    for spec in specs:
+        index_text, separator, values_text = spec.partition('=')
+        if not separator:
+            raise ValueError(f"'バイト位置=値,値,...' の形式で指定してください ({spec})")
+        values = search.setdefault(int(index_text), [])
+        for item in values_text.split(','):
+            low, _, high = item.partition('-')
+            for value in range(int(low, 16), int(high or low, 16) + 1):
+                if not 0 <= value <= 0xFF:
+                    raise ValueError(f"値は 00h～FFh で指定してください ({item})")
+                if value not in values:
+                    values.append(value)
+    return search
+
+
+# コマンドラインから実行する
+def main() -> None:
+    """インベントリパラメータを調整し、試行の一覧を表示する。"""
+    import argparse
+    import json
+
+    from utr_reader import HandshakeError, handshake, open_reader
+
+    parser = argparse.ArgumentParser(description="UTR-S201 インベントリパラメータの自動調整")
+    parser.add_argument('--port', required=True, help="ポート名 (例: COM3, /dev/ttyUSB0)")
+    parser.add_argument('--baud', type=int, default=19200, help="ボーレート")
+    parser.add_argument('--vary', action='append', required=True, metavar='INDEX=VALUES',
+                        help="試すバイト位置と値 (16進数、例: 1=80-83 や 3=00,04)。複数指定可")
+    parser.add_argument('--start', default=None, metavar='HEX',
+                        help="調整を始めるパラメータ (省略時はリーダライタに設定されている値)")
+    parser.add_argument('--cycles', type=int, default=10, help="1回の試行の、1回の繰り返しのインベントリの回数")
+    parser.add_argument('--repeats', type=int, default=3,
+                        help="1回の試行で繰り返す回数 (計測のばらつきより大きい差の場合のみ値を変える)")
+    parser.add_argument('--passes', type=int, default=3, help="全てのバイト位置を試す回数の上限")
+    parser.add_argument('--max-error-rate', type=float, default=0.1, help="選ぶ試行のNACK・タイムアウトの割合の上限")
+    parser.add_argument('--max-mismatch-rate', type=float, default=0.05, help="選ぶ試行の読み取り枚数の不一致の割合の上限")
+    parser.add_argument('--report', default=None, metavar='PATH', help="試行の一覧を保存するJSONファイル")
+    parser.add_argument('--no-apply', action='store_true', help="終了時に調整前のパラメータに戻す")
+    args = parser.parse_args()
+
+    try:
+        search = parse_search_space(args.vary)
+        start = InventoryParam.from_hex(args.start) if args.start is not None else None
+    except ValueError as e:
+        parser.error(str(e))
+
+    ser = open_reader(args.port, args.baud)
+    try:
+        info = handshake(ser, verbose=False, set_inventory_param=False)
+        if start is None:
+            start = InventoryParam(info.inventory_param) if info.inventory_param else read_inventory_param(ser)
+        tuner = InventoryTuner(ser, search, args.cycles, args.baud, args.passes, args.max_error_rate,
+                               args.max_mismatch_rate, repeats=args.repeats)
+        report = tuner.tune(start, apply=not args.no_apply)
+    except (HandshakeError, TunerError, ValueError) as e:
+        print(e)
+        return
+    finally:
+        ser.close()
+
+    print(report.format())
+    if args.report is not None:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report.as_dict(), f, ensure_ascii=False, indent=2)
+        print(f"試行の一覧を {args.report} に保存しました")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+UTR-S201 シリーズ タグへの一括書き込みモジュール（無保証）
+
+【概要】
+エンコードステーション (タグへのEPCの書き込み) 用に、書き込み対象 (WriteJob) の一覧を受け取り、
+UHF_WRITE (0x55 / 0x16) の送信と、インベントリによる書き込み結果の確認をまとめて行う。
+
+- 送信コマンドは全て開始前に組み立てる (SUM値は build_command() で計算)。
+- 書き込みは batch_size 件ずつ、ACKを受信したらすぐに次のタグのコマンドを送信する。
+  NACK_RXBUSY_ERROR (0x04) と NACK_UHF_IC_ERROR (0x0A) のNACKは、同じまとまりの他のタグを
+  先に書き込んでから retries 回まで再送する。その他のNACKと応答なしは再送しない。
+- まとまりの書き込みが終わったら、UHF_INVENTORY を最大 verify_cycles 回送信し、
+  書き込み後のPC+UII (WriteJob.expected) が読み取れたかで確認する (1回のインベントリで
+  まとまり全体を確認する)。
+- 結果の集計・表示・on_result の呼び出しは別スレッドで行い (utr_pipeline と同じ2段構成)、
+  通信段は次のまとまりの書き込みをすぐに始める。
+
+タグごとの時間 (最初の書き込みの送信から確認まで) と、1分あたりの書き込み枚数を WriteStatistics で返す。
+
+【UHF_WRITE のデータ部について】
+build_write_command() は、本サンプルの COMMANDS['UHF_WRITE'] (01 000000 02 0456) と同じ並び
+(メモリバンク 1バイト, ワードアドレス 3バイト, データのバイト数 1バイト, データ) の後ろに、
+書き込むタグの指定 (PC+UIIのバイト数 1バイト, PC+UII) を加えて組み立てる。
+既定の command_builder は WriteJob.target で書き込むタグを指定するため、読み取り範囲に
+複数のタグがあっても、まとめて (batch_size 件ずつ) 書き込める。utr_emulator も同じ並びで解析する。
+実際の並び (タグの指定方法) はプロトコル仕様書で確認し、必要であれば command_builder で置き換えること。
+タグを指定しないコマンド (target=None) の場合は、読み取り範囲にタグを1枚ずつ置き、batch_size=1 で使うこと。
+
+【使用例】
+    jobs = [WriteJob(old_pc_uii, new_epc) for old_pc_uii, new_epc in assignments]
+    statistics = BatchWriter(ser).run(jobs)
+    print(statistics.succeeded, statistics.tags_per_minute, statistics.latency_p95)
+"""
+
+import queue
+import statistics as _statistics
+import sys
+import threading
+import time
+
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set
+
+from utr_protocol import (ADD, COMMANDS, DETAIL_WRITE, EPC_WORD_ADDRESS, ERROR_CODE_LOCATION, MEMORY_BANK_EPC,
+                          MEMORY_BANK_RESERVED, MEMORY_BANK_TID, MEMORY_BANK_USER, NACK_RXBUSY_ERROR, NACK_UHF_IC_ERROR,
+                          InventoryTimeout, build_command, communicate, communicate_frames, is_ack, is_nack,
+                          parse_nack_response)
+from utr_pipeline import inventory_ack_count
+from utr_responses import iter_inventory_tags
+
+# 再送するNACKのエラーコード (NACK_RXBUSY_ERROR, NACK_UHF_IC_ERROR)
+RETRYABLE_NACK_CODES = frozenset((NACK_RXBUSY_ERROR, NACK_UHF_IC_ERROR))
+
+
+# UHF_WRITE の送信コマンドを組み立てる
+def build_write_command(bank: int, word_address: int, data: bytes, target: Optional[bytes] = None,
+                        address: int = ADD[0]) -> bytes:
+    """
+    UHF_WRITE の送信コマンドを組み立てる (SUM値は build_command() で計算)。
+
+    Args:
+        bank (int): メモリバンク (MEMORY_BANK_EPC など)。
+        word_address (int): 書き込みを始めるワードアドレス。
+        data (bytes): 書き込むデータ (ワード単位のため偶数バイト)。
+        target (Optional[bytes]): 書き込むタグのPC+UII。Noneなら指定しない (読み取り範囲のいずれかのタグ)。
+        address (int): リーダライタのアドレス。
+
+    Returns:
+        bytes: 送信コマンドのバイト列。
+
+    Raises:
+        ValueError: データが空、奇数バイト、またはデータ・PC+UIIが長すぎる場合。
+    """
+    if not data or len(data) % 2:
+        raise ValueError(f"書き込むデータはワード単位 (偶数バイト) で指定してください ({len(data)} バイト)")
+    payload = bytes([bank]) + word_address.to_bytes(3, 'big') + bytes([len(data)]) + bytes(data)
+    if target is not None:
+        payload += bytes([len(target)]) + bytes(target)
+    # LEN (1バイト) には詳細コマンドも含む
+    if len(payload) + 1 > 0xFF:
+        raise ValueError(f"書き込むデータが長すぎます ({len(data)} バイト)")
+    return build_command(0x55, DETAIL_WRITE, payload, address)
+
+
+class WriteJob:
+    """
+    1枚のタグへの書き込み。
+
+    Attributes:
+        target (bytes): 書き込み前のPC+UII (書き込むタグの指定と、表示・集計に使用)。
+        data (bytes): 書き込むデータ。
+        bank (int): メモリバンク。
+        word_address (int): 書き込みを始めるワードアドレス。
+        expected (Optional[bytes]): 書き込み後にインベントリで読み取れるはずのPC+UII。
+                                    EPCバンクのEPC全体を同じ長さで書き換える場合は自動で設定する
+                                    (PCはそのまま)。Noneならインベントリでの確認は行わない。
+    """
+
+    __slots__ = ('target', 'data', 'bank', 'word_address', 'expected')
+
+    def __init__(self, target: bytes, data: bytes, bank: int = MEMORY_BANK_EPC,
+                 word_address: int = EPC_WORD_ADDRESS, expected: Optional[bytes] = None) -> None:
+        self.target = bytes(target)
+        self.data = bytes(data)
+        self.bank = bank
+        self.word_address = word_address
+        if (expected is None and bank == MEMORY_BANK_EPC and word_address == EPC_WORD_ADDRESS
+                and len(self.data) == len(self.target) - 2):
+            expected = self.target[:2] + self.data
+        self.expected = expected
+
+    def __repr__(self) -> str:
+        return f"WriteJob(target={self.target.hex().upper()}, data={self.data.hex().upper()}, bank={self.bank})"
+
+
+class WriteResult:
+    """
+    1枚のタグへの書き込み結果。
+
+    Attributes:
+        job (WriteJob): 書き込み。
+        written (bool): UHF_WRITE にACKが返ればTrue。
+        verified (Optional[bool]): インベントリで expected を読み取れたか (確認しない場合はNone)。
+        attempts (int): UHF_WRITE を送信した回数。
+        nack_codes (List[int]): 受信したNACKのエラーコード (受信順)。
+        error (str): 失敗した理由 (成功した場合は空文字列)。
+        latency (float): 最初の書き込みの送信から、確認 (または失敗) までの時間（秒）。
+    """
+
+    __slots__ = ('job', 'written', 'verified', 'attempts', 'nack_codes', 'error', 'latency', '_start')
+
+    def __init__(self, job: WriteJob) -> None:
+        self.job = job
+        self.written = False
+        self.verified: Optional[bool] = None
+        self.attempts = 0
+        self.nack_codes: List[int] = []
+        self.error = ""
+        self.latency = 0.0
+        self._start = 0.0
+
+    @property
+    def ok(self) -> bool:
+        """書き込みにACKが返り、確認した場合は expected を読み取れたらTrue。"""
+        return self.written and self.verified is not False
+
+    def __repr__(self) -> str:
+        return (f"WriteResult(target={self.job.target.hex().upper()}, ok={self.ok}, attempts={self.attempts}, "
+                f"latency={self.latency:.3f}, error={self.error!r})")
+
+
+class WriteStatistics:
+    """
+    BatchWriter.run() の結果。
+
+    Attributes:
+        results (List[WriteResult]): 書き込み結果 (WriteJob の順)。
+        elapsed (float): 全体の時間（秒）。
+        io_seconds (float): 通信段がリーダライタと通信していた時間（秒）。
+        write_commands (int): 送信した UHF_WRITE の数 (再送を含む)。
+        verify_inventories (int): 確認のために送信した UHF_INVENTORY の数。
+    """
+
+    __slots__ = ('results', 'elapsed', 'io_seconds', 'write_commands', 'verify_inventories')
+
+    def __init__(self) -> None:
+        self.results: List[WriteResult] = []
+        self.elapsed = 0.0
+        self.io_seconds = 0.0
+        self.write_commands = 0
+        self.verify_inventories = 0
+
+    @property
+    def succeeded(self) -> int:
+        """成功したタグの数。"""
+        return sum(1 for result in self.results if result.ok)
+
+    @property
+    def failed(self) -> int:
+        """失敗したタグの数。"""
+        return len(self.results) - self.succeeded
+
+    @property
+    def tags_per_minute(self) -> float:
+        """1分あたりに書き込めたタグの数。"""
+        return self.succeeded / self.elapsed * 60 if self.elapsed > 0 else 0.0
+
+    @property
+    def latency_mean(self) -> float:
+        """タグごとの時間の平均（秒）。"""
+        return _statistics.fmean(result.latency for result in self.results) if self.results else 0.0
+
+    @property
+    def latency_p95(self) -> float:
+        """タグごとの時間の95パーセンタイル（秒）。"""
+        latencies = [result.latency for result in self.results]
+        if len(latencies) < 2:
+            return latencies[0] if latencies else 0.0
+        return _statistics.quantiles(latencies, n=20, method='inclusive')[-1]
+
+    def __repr__(self) -> str:
+        return (f"WriteStatistics(succeeded={self.succeeded}, failed={self.failed}, "
+                f"tags_per_minute={self.tags_per_minute:.1f}, latency_mean={self.latency_mean:.3f})")
+
+
+class BatchWriter:
+    """
+    書き込み対象の一覧を、まとめて書き込み・確認する。
+    """
+
+    def __init__(self, ser, batch_size: int = 16, retries: int = 3, verify_cycles: int = 3,
+                 write_timeout: float = 1.0, timeout: Optional[InventoryTimeout] = None,
+                 command_builder: Optional[Callable[[WriteJob], bytes]] = None,
+                 on_result: Optional[Callable[[WriteResult], None]] = None, verbose: bool = False,
+                 max_queue: int = 64) -> None:
+        """
+        Args:
+            ser: シリアル通信オブジェクト (handshake() などでコマンドを実行できる状態にしたもの)。
+            batch_size (int): まとめて書き込み・確認するタグの数。
+            retries (int): 再送するNACK (RETRYABLE_NACK_CODES) を受信した場合の再送回数の上限。
+            verify_cycles (int): 確認のインベントリの回数の上限 (全て読み取れたら途中で終了)。
+            write_timeout (float): UHF_WRITE の応答待ち時間（秒）。
+            timeout (Optional[InventoryTimeout]): 確認のインベントリのタイムアウトの調整。
+                                                  省略時はボーレートから作成。
+            command_builder (Optional[Callable[[WriteJob], bytes]]): WriteJob から送信コマンドを組み立てる関数。
+                                                                     省略時は build_write_command()
+                                                                     (WriteJob.target でタグを指定)。
+            on_result (Optional[Callable[[WriteResult], None]]): タグごとの結果を受け取る関数 (処理段から呼ぶ)。
+            verbose (bool): Trueなら、タグごとの結果を表示する。
+            max_queue (int): 処理段に渡す前の結果 (まとまり単位) を溜められる数。
+
+        Raises:
+            ValueError: batch_size が1未満の場合。
+        """
+        if batch_size < 1:
+            raise ValueError(f"batch_size は1以上を指定してください ({batch_size})")
+        self.ser = ser
+        self.batch_size = batch_size
+        self.retries = retries
+        self.verify_cycles = verify_cycles
+        self.write_timeout = write_timeout
+        self.timeout = timeout if timeout is not None else InventoryTimeout(getattr(ser, 'baudrate', None) or 19200)
+        self.command_builder = command_builder or (
+            lambda job: build_write_command(job.bank, job.word_address, job.data, job.target))
+        self.on_result = on_result
+        self.verbose = verbose
+        self.max_queue = max_queue
+        self._error: Optional[BaseException] = None
+
+    def run(self, jobs: Iterable[WriteJob], stop_event: Optional[threading.Event] = None) -> WriteStatistics:
+        """
+        全ての書き込みを行い、全ての結果の処理が終わってから戻る。
+
+        Args:
+            jobs (Iterable[WriteJob]): 書き込み対象。
+            stop_event (Optional[threading.Event]): セットされたら、次のまとまりの前で終了する。
+
+        Returns:
+            WriteStatistics: 書き込み結果 (終了までに処理したタグの分)。
+
+        Raises:
+            Exception: 処理段 (on_result など) で発生したエラー。
+        """
+        jobs = list(jobs)
+        # 送信コマンドは全て先に組み立てる (通信段で組み立て・SUM値の計算をしないように)
+        commands = [self.command_builder(job) for job in jobs]
+
+        self._error = None
+        statistics = WriteStatistics()
+        batches: 'queue.Queue[Optional[List[WriteResult]]]' = queue.Queue(self.max_queue)
+        worker = threading.Thread(target=self._work, args=(batches, statistics), name='BatchWriterWorker',
+                                  daemon=True)
+        worker.start()
+
+        start = time.monotonic()
+        try:
+            for first in range(0, len(jobs), self.batch_size):
+                if stop_event is not None and stop_event.is_set():
+                    break
+                if self._error is not None:
+                    break
+                results = self._write_batch(jobs[first:first + self.batch_size],
+                                            commands[first:first + self.batch_size], statistics)
+                batches.put(results)
+        finally:
+            batches.put(None)
+            worker.join()
+            statistics.elapsed = time.monotonic() - start
+        if self._error is not None:
+            raise self._error
+        return statistics
+
+    # --- 以下、通信段 ---
+
+    def _write_batch(self, jobs: Sequence[WriteJob], commands: Sequence[bytes],
+                     statistics: WriteStatistics) -> List[WriteResult]:
+        results = [WriteResult(job) for job in jobs]
+        io_start = time.monotonic()
+
+        # 書き込み: 再送するNACKは、まとまりの他のタグを先に書き込んでから再送する
+        pending = list(range(len(results)))
+        for _ in range(self.retries + 1):
+            retry = []
+            for index in pending:
+                result = results[index]
+                if not result.attempts:
+                    result._start = time.monotonic()
+                result.attempts += 1
+                statistics.write_commands += 1
+                response = communicate(self.ser, commands[index], self.write_timeout)
+                if is_ack(response):
+                    result.written = True
+                elif is_nack(response):
+                    code = response[ERROR_CODE_LOCATION]
+                    result.nack_codes.append(code)
+                    result.error = parse_nack_response(response)
+                    if code in RETRYABLE_NACK_CODES:
+                        retry.append(index)
+                else:
+                    result.error = "UHF_WRITE の応答がありません"
+            if not retry:
+                break
+            pending = retry
+
+        # 確認: 書き込み後のPC+UIIを、まとまり全体で読み取れるまでインベントリを繰り返す
+        unverified: Dict[bytes, List[WriteResult]] = {}
+        for result in results:
+            if result.written:
+                result.error = ""
+                if result.job.expected is not None:
+                    unverified.setdefault(result.job.expected, []).append(result)
+        cycle = 0
+        while unverified and cycle < self.verify_cycles:
+            cycle += 1
+            statistics.verify_inventories += 1
+            frames = communicate_frames(self.ser, COMMANDS['UHF_INVENTORY'], self.timeout.value)
+            self.timeout.update(inventory_ack_count(frames))
+            now = time.monotonic()
+            for pc_uii in _inventory_pc_uiis(frames):
+                for result in unverified.pop(pc_uii, ()):
+                    result.verified = True
+                    result.latency = now - result._start
+        now = time.monotonic()
+        for pending_results in unverified.values():
+            for result in pending_results:
+                result.verified = False
+                result.error = "書き込み後のPC+UIIを読み取れませんでした"
+        for result in results:
+            if result.verified is not True:
+                result.latency = now - result._start
+        statistics.io_seconds += now - io_start
+        return results
+
+    # --- 以下、処理段 (ワーカースレッド) ---
+
+    def _work(self, batches: 'queue.Queue[Optional[List[WriteResult]]]', statistics: WriteStatistics) -> None:
+        while True:
+            results = batches.get()
+            if results is None:
+                return
+            if self._error is not None:
+                continue   # 処理段でエラーが発生した後は、通信段を止めないように読み捨てる
+            try:
+                for result in results:
+                    statistics.results.append(result)
+                    if self.verbose:
+                        status = "OK" if result.ok else f"NG ({result.error})"
+                        print(f"{result.job.target.hex().upper()}: {status}, 書き込み {result.attempts} 回, "
+                              f"{result.latency * 1000:.1f} ms")
+                    if self.on_result is not None:
+                        self.on_result(result)
+            except Exception as e:
+                self._error = e
+
+
+# 受信したフレームのうち、インベントリ応答のPC+UIIを返す (データ長と合わないフレームは読み飛ばす)
+def _inventory_pc_uiis(frames) -> Set[bytes]:
+    return {tag.pc_uii for tag in iter_inventory_tags(frames)}
+
+
+# 書き込み対象のCSVファイルを読み込む
+def load_jobs(path: str) -> List[WriteJob]:
+    """
+    1行に「書き込み前のPC+UII,書き込むEPC」(16進数) を並べたCSVファイルから、
+    EPCバンクへの書き込み対象を読み込む。空行と # で始まる行は読み飛ばす。
+
+    Args:
+        path (str): CSVファイル名。
+
+    Returns:
+        List[WriteJob]: 書き込み対象。
+
+    Raises:
+        ValueError: 16進数でない値がある場合。
+    """
+    jobs = []
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            target, _, data = line.partition(',')
+            try:
+                jobs.append(WriteJob(bytes.fromhex(target.strip()), bytes.fromhex(data.strip())))
+            except ValueError:
+                raise ValueError(f"{path}:{line_number}: 16進数で指定してください ({line})") from None
+    return jobs
+
+
+# コマンドラインから実行する
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    CSVファイルの書き込み対象を一括で書き込み、結果を表示する。
+
+    Args:
+        argv (Optional[List[str]]): コマンドライン引数 (Noneなら sys.argv[1:])。
+
+    Returns:
+        int: 終了コード (全て成功なら0、接続・書き込みに失敗したタグがあれば1)。
+    """
+    import argparse
+    import csv
+
+    import serial
+
+    from utr_reader import HandshakeError, handshake, open_reader
+
+    parser = argparse.ArgumentParser(description="UTR-S201 タグへの一括書き込み (EPC)")
+    parser.add_argument('--port', required=True, help="ポート名 (例: COM3, /dev/ttyUSB0)")
+    parser.add_argument('--baud', type=int, default=19200, help="ボーレート")
+    parser.add_argument('--jobs', required=True, metavar='CSV',
+                        help="書き込み対象 (1行に「書き込み前のPC+UII,書き込むEPC」、16進数)")
+    parser.add_argument('--batch-size', type=int, default=16, help="まとめて書き込み・確認するタグの数")
+    parser.add_argument('--retries', type=int, default=3, help="NACK_RXBUSY_ERROR / NACK_UHF_IC_ERROR の再送回数")
+    parser.add_argument('--verify-cycles', type=int, default=3, help="確認のインベントリの回数の上限")
+    parser.add_argument('--results', default=None, metavar='CSV', help="タグごとの結果を書き出すCSVファイル")
+    args = parser.parse_args(argv)
+
+    if args.batch_size < 1:
+        parser.error("--batch-size は1以上を指定してください")
+    try:
+        jobs = load_jobs(args.jobs)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    try:
+        ser = open_reader(args.port, args.baud)
+    except serial.SerialException as e:
+        print(f"シリアルポート接続エラー: {e}")
+        return 1
+    try:
+        handshake(ser, verbose=False)
+        writer = BatchWriter(ser, args.batch_size, args.retries, args.verify_cycles, verbose=True)
+        statistics = writer.run(jobs)
+    except HandshakeError as e:
+        print(e)
+        return 1
+    finally:
+        ser.close()
+
+    print(f"成功 {statistics.succeeded} 枚, 失敗 {statistics.failed} 枚, "
+          f"{statistics.tags_per_minute:.1f} 枚/分, 1枚あたり 平均 {statistics.latency_mean * 1000:.1f} ms "
+          f"(95% {statistics.latency_p95 * 1000:.1f} ms)")
+    if args.results is not None:
+        with open(args.results, 'w', newline='', encoding='utf-8') as f:
+            out = csv.writer(f)
+            out.writerow(['target', 'data', 'ok', 'attempts', 'nack_codes', 'latency_ms', 'error'])
+            for result in statistics.results:
+                out.writerow([result.job.target.hex().upper(), result.job.data.hex().upper(), int(result.ok),
+                              result.attempts, ' '.join(f'{code:02X}' for code in result.nack_codes),
+                              f'{result.latency * 1000:.1f}', result.error])
+        print(f"タグごとの結果を {args.results} に保存しました")
+    return 1 if statistics.failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+受信データ一括解析 (utr_batch) の確認
+
+- ランダムに壊した受信データで、parse_capture() が FrameReceiver と同じフレームを返すか
+  (NumPyあり・なしの両方)
+- 列ごとの配列 (RSSI、ANGLE、PC+UII) の値
+
+実行例:
+    python -m pytest -q tests/test_batch.py
+"""
+
+import os
+import random
+import sys
+
+from typing import List
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import utr_batch  # noqa: E402
+import utr_protocol as utr  # noqa: E402
+
+from utr_emulator import make_frame, make_tag_population  # noqa: E402
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def numpy_mode(request, monkeypatch):
+    """NumPyあり・なしの両方で実行する (NumPyが無い環境では、なしのみ)。"""
+    if request.param == 'numpy':
+        if utr_batch.np is None:
+            pytest.skip("NumPy がインストールされていません")
+    else:
+        monkeypatch.setattr(utr_batch, 'np', None)
+    return request.param
+
+
+# 正しいフレーム、ゴミ (STXと大きなデータ長を含む)、ビット反転を混ぜた受信データ
+def corrupted_stream(seed: int, frame_count: int = 60) -> bytes:
+    rng = random.Random(seed)
+    parts: List[bytes] = []
+    for pc_uii in make_tag_population(frame_count, seed):
+        if rng.random() < 0.2:
+            # 途中に現れるSTXと、フレームの範囲を越えるデータ長
+            parts.append(bytes([utr.STX[0], 0x00, 0x6C, rng.getrandbits(8)])
+                         + bytes(rng.getrandbits(8) for _ in range(rng.randint(0, 8))))
+        if rng.random() < 0.2:
+            parts.append(make_frame(utr.ACK[0], bytes([utr.DETAIL_INV[0], 0x00, rng.getrandbits(8)])))
+        parts.append(make_frame(utr.INV[0], bytes([0x09, rng.getrandbits(8), rng.getrandbits(8),
+                                                   rng.getrandbits(8), len(pc_uii)]) + pc_uii))
+    stream = bytearray(b''.join(parts))
+    for _ in range(rng.randint(1, 6)):
+        stream[rng.randrange(len(stream))] ^= 1 << rng.randrange(8)
+    return bytes(stream)
+
+
+# FrameReceiver で受信したフレームの位置と、SUM値の不一致の数
+def receiver_frames(stream: bytes):
+    receiver = utr.FrameReceiver()
+    # FrameReceiver はデータ長の分の受信を待つため、フレームの最大長のCR以外のデータを後ろに加えて
+    # 受信データの終わりを知らせる (parse_capture() は受信データの終わりを越えるSTXを読み飛ばす)
+    receiver.feed(stream + bytes(0xFF + utr.HEADER_LENGTH + utr.FOOTER_LENGTH))
+    spans = []
+    while True:
+        span = receiver.next_frame()
+        if span is None:
+            return spans, receiver.sum_errors
+        spans.append(span)
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_parse_capture_matches_frame_receiver(seed, numpy_mode):
+    stream = corrupted_stream(seed)
+    expected, sum_errors = receiver_frames(stream)
+    frames = utr_batch.parse_capture(stream)
+    assert list(frames.offset) == [start for start, _ in expected]
+    assert frames.sum_errors == sum_errors
+    assert frames.discarded_bytes == len(stream) - sum(end - start for start, end in expected)
+
+
+def test_garbage_stx_in_resync_window(numpy_mode):
+    # STXのゴミ (データ長が後ろの正しいフレームのCRまでで、SUM値が違う) の範囲を探し直すとき、
+    # 範囲の途中にデータ長が範囲を越えるSTXがあっても、その後ろの正しいフレームを失わない
+    good = [make_frame(utr.INV[0], bytes([0x09, 0xFC, 0x18, i, 4, 0x30, 0x00, i, i])) for i in range(20)]
+    second = bytes([utr.STX[0], 0x00, 0x6C, 0xA0])
+    first_length = len(second) + len(good[0]) + len(good[1]) - utr.FOOTER_LENGTH
+    first = bytes([utr.STX[0], 0x00, 0x6C, first_length])
+    stream = first + second + b''.join(good)
+    assert not utr.verify_sum_value(stream[:first_length + utr.HEADER_LENGTH + utr.FOOTER_LENGTH])
+    frames = utr_batch.parse_capture(stream)
+    assert [frames.pc_uii(i) for i in range(len(frames))] == [bytes([0x30, 0x00, i, i]) for i in range(20)]
+    assert frames.sum_errors == 1
+
+
+def test_columns(numpy_mode):
+    pc_uii = bytes([0x30, 0x00, 0x12, 0x34])
+    stream = (make_frame(utr.INV[0], bytes([0x09, 0xFF, 0xC0, 0x07, len(pc_uii)]) + pc_uii)
+              + make_frame(utr.ACK[0], bytes([utr.DETAIL_INV[0], 0x00, 0x01])))
+    frames = utr_batch.parse_capture(stream)
+    assert list(frames.command) == [utr.INV[0], utr.ACK[0]]
+    assert list(frames.inventory_indexes()) == [0]
+    assert frames.rssi[0] == -64 and frames.angle[0] == 0x07
+    assert frames.pc_uii(0) == pc_uii
+    assert frames.rssi[1] == 0 and frames.pc_uii_length[1] == 0
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+通信の記録・再生 (utr_capture) の確認 (疑似リーダライタ utr_emulator を使用)
+
+- 記録した通信を ReplaySerial で再生し、同じ解析結果になること
+- 既存の記録ファイルへ追記した場合に、追記分の時刻を追記時の基準で換算すること
+- ReplaySerial.close() でメモリマップを閉じること
+- timeout=None の read() が、pyserial と同じく揃うまで待つこと
+
+実行例:
+    python -m pytest -q tests/test_capture.py
+"""
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from utr_capture import (DIRECTION_RX, DIRECTION_SESSION, DIRECTION_TX, CaptureSerial,  # noqa: E402
+                         CaptureWriter, ReplaySerial, iter_capture, load_received_data, open_capture)
+from utr_emulator import EmulatedSerial, UtrEmulator, make_tag_population  # noqa: E402
+from utr_protocol import COMMANDS, communicate, received_data_parse  # noqa: E402
+
+
+def record_inventories(path: str, cycles: int, seed: int):
+    tags = make_tag_population(5, seed=seed)
+    results = []
+    with CaptureWriter(path) as writer:
+        ser = CaptureSerial(EmulatedSerial(UtrEmulator(tags, seed=seed)), writer)
+        for _ in range(cycles):
+            results.append(received_data_parse(communicate(ser, COMMANDS['UHF_INVENTORY'])))
+    return results
+
+
+def directions(path: str):
+    buffer, _, _ = open_capture(path)
+    try:
+        return [record.direction for record in iter_capture(buffer)]
+    finally:
+        buffer.close()
+
+
+def test_replay_matches_recording(tmp_path):
+    path = str(tmp_path / 'capture.utrcap')
+    recorded = record_inventories(path, 3, seed=1)
+    with ReplaySerial(path) as replay:
+        replayed = [received_data_parse(communicate(replay, COMMANDS['UHF_INVENTORY'])) for _ in range(3)]
+        assert replay.command_mismatches == 0
+    assert replayed == recorded
+
+
+def test_append_writes_session_record(tmp_path, monkeypatch):
+    path = str(tmp_path / 'capture.utrcap')
+    record_inventories(path, 1, seed=2)
+    first_data, first_offsets, first_times = load_received_data(path)
+
+    # 別のプロセスでの追記 (monotonic_ns() の基準が異なる) を再現する
+    monkeypatch.setattr(time, 'monotonic_ns', lambda: 5_000_000_000)
+    monkeypatch.setattr(time, 'time', lambda: 2_000_000_000.0)
+    with CaptureWriter(path) as writer:
+        writer.record(DIRECTION_TX, COMMANDS['UHF_INVENTORY'])
+        writer.record(DIRECTION_RX, b'\x02')
+    monkeypatch.undo()
+
+    assert directions(path)[-3:] == [DIRECTION_SESSION, DIRECTION_TX, DIRECTION_RX]
+    data, offsets, times = load_received_data(path)
+    assert data == first_data + b'\x02' and offsets == first_offsets + [len(first_data)]
+    assert times[:-1] == first_times
+    assert times[-1] == 2_000_000_000.0
+
+    # 再生は追記分も続けて返す
+    with ReplaySerial(path) as replay:
+        communicate(replay, COMMANDS['UHF_INVENTORY'])
+        replay.write(COMMANDS['UHF_INVENTORY'])
+        assert replay.read(10) == b'\x02'
+
+
+def test_append_refuses_other_files(tmp_path):
+    path = tmp_path / 'other.bin'
+    path.write_bytes(b'not a capture file')
+    with pytest.raises(ValueError):
+        CaptureWriter(str(path))
+    assert path.read_bytes() == b'not a capture file'
+
+
+def test_close_releases_mmap(tmp_path):
+    path = str(tmp_path / 'capture.utrcap')
+    record_inventories(path, 2, seed=3)
+    replay = ReplaySerial(path)
+    replay.write(COMMANDS['UHF_INVENTORY'])
+    assert replay.read(1)   # 受信データの途中で閉じる
+    replay.close()
+    assert replay._buffer.closed and not replay.is_open
+    assert replay.read(10) == b'' and replay.in_waiting == 0
+    replay.close()
+
+
+def test_read_without_timeout_blocks_until_size(tmp_path):
+    path = str(tmp_path / 'capture.utrcap')
+    record_inventories(path, 2, seed=4)
+    replay = ReplaySerial(path, timeout=None)
+    try:
+        # コマンドを送信するまで応答は無く、別のスレッドから送信すると続きを返す
+        timer = threading.Timer(0.1, replay.write, args=(COMMANDS['UHF_INVENTORY'],))
+        start = time.monotonic()
+        timer.start()
+        data = replay.read(4)
+        assert len(data) == 4 and time.monotonic() - start >= 0.09
+        timer.join()
+    finally:
+        replay.close()
+
+
+def test_read_without_timeout_returns_on_close(tmp_path):
+    path = str(tmp_path / 'capture.utrcap')
+    record_inventories(path, 1, seed=5)
+    replay = ReplaySerial(path, timeout=None)
+    threading.Timer(0.1, replay.close).start()
+    start = time.monotonic()
+    assert replay.read(1) == b''
+    assert time.monotonic() - start >= 0.09
+
+
+def test_read_with_timeout_waits_until_deadline(tmp_path):
+    path = str(tmp_path / 'capture.utrcap')
+    record_inventories(path, 1, seed=6)
+    with ReplaySerial(path, timeout=0.05) as replay:
+        start = time.monotonic()
+        assert replay.read(1) == b''
+        assert time.monotonic() - start >= 0.04
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+SUM値の計算・検証とRSSIの変換が、変更前の実装とビット単位で同じ結果になることの確認
+
+- RSSI   : 2バイトの全ての値 (65536通り) について、convert_rssi(hex) と decode_rssi()、
+           decode_rssi_values() の結果 (floatのビット列) が同じか
+- SUM値  : ランダムなデータ・フレーム (bytes/bytearray/memoryview) について、
+           calculate_sum_value()、verify_sum_value()、verify_sum_values() が
+           forループで合計する変更前の実装と同じか
+
+実行例:
+    python -m pytest -q tests/test_decode.py
+"""
+
+import os
+import random
+import struct
+import sys
+
+from typing import List
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import utr_protocol as utr  # noqa: E402
+
+from utr_emulator import make_frame, make_tag_population  # noqa: E402
+
+
+# 変更前の calculate_sum_value() (比較用)
+def reference_sum_value(data: bytes) -> int:
+    sum_value = 0
+    for byte in data:
+        sum_value += byte
+    sum_value &= 0xFF
+    return sum_value
+
+
+# 変更前の verify_sum_value() (比較用)
+def reference_verify_sum_value(data_frame: bytes) -> bool:
+    data_length = len(data_frame)
+    return data_frame[data_length - 2] == reference_sum_value(data_frame[:data_length - 2])
+
+
+def float_bits(value: float) -> bytes:
+    return struct.pack('<d', value)
+
+
+# RSSIの2バイトの全ての値を含む、インベントリ応答フレーム (65536個)
+RSSI_FRAMES = [bytes([0x02, 0x00, 0x6C, 0x05, 0x09, high, low, 0x00, 0x00, 0x03, 0x00, 0x0D])
+               for high in range(256) for low in range(256)]
+
+
+# 正しいインベントリ応答フレームと、SUM値を1だけずらしたフレーム (RSSI・ANGLEはランダム)
+def inventory_frames(rng: random.Random, count: int) -> List[bytes]:
+    frames = []
+    for pc_uii in make_tag_population(count, rng.getrandbits(32)):
+        data = bytes([0x09, rng.getrandbits(8), rng.getrandbits(8), rng.getrandbits(8), len(pc_uii)]) + pc_uii
+        frame = make_frame(utr.INV[0], data)
+        frames.append(frame)
+        frames.append(frame[:-2] + bytes([(frame[-2] + 1) & 0xFF]) + frame[-1:])
+    rng.shuffle(frames)
+    return frames
+
+
+# ランダムなデータ (SUM値が正しいとは限らない) と、inventory_frames() のフレーム
+def random_frames(seed: int, count: int = 2000) -> List[bytes]:
+    rng = random.Random(seed)
+    frames = [bytes(rng.getrandbits(8) for _ in range(rng.randint(2, 300))) for _ in range(count)]
+    frames.extend(inventory_frames(rng, count // 10))
+    rng.shuffle(frames)
+    return frames
+
+
+def test_decode_rssi_matches_convert_rssi_for_all_values():
+    expected = [float_bits(utr.convert_rssi(frame[5:7].hex())) for frame in RSSI_FRAMES]
+    assert [float_bits(utr.decode_rssi(frame)) for frame in RSSI_FRAMES] == expected
+    assert [float_bits(utr.decode_rssi(memoryview(frame))) for frame in RSSI_FRAMES] == expected
+    assert [float_bits(value) for value in utr.decode_rssi_values(RSSI_FRAMES)] == expected
+
+
+def test_decode_rssi_location():
+    # RSSIの位置を指定した場合 (先頭にバイトを追加して、位置をずらす)
+    frames = [b'\x00' + frame for frame in RSSI_FRAMES[::257]]
+    expected = [float_bits(utr.convert_rssi(frame[6:8].hex())) for frame in frames]
+    assert [float_bits(utr.decode_rssi(bytearray(frame), 6)) for frame in frames] == expected
+    assert [float_bits(value) for value in utr.decode_rssi_values(frames, 6)] == expected
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_calculate_sum_value_matches_loop(seed):
+    rng = random.Random(seed)
+    for _ in range(500):
+        data = bytes(rng.getrandbits(8) for _ in range(rng.randint(0, 300)))
+        expected = reference_sum_value(data)
+        for variant in (data, bytearray(data), memoryview(data)):
+            assert utr.calculate_sum_value(variant) == expected
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_verify_sum_value_matches_loop(seed):
+    frames = random_frames(seed)
+    expected = [reference_verify_sum_value(frame) for frame in frames]
+    # 正しいフレームと、SUM値を壊したフレームの両方を含むこと
+    assert any(expected) and not all(expected)
+    for variant in (bytes, bytearray, memoryview):
+        assert [utr.verify_sum_value(variant(frame)) for frame in frames] == expected
+        assert utr.verify_sum_values([variant(frame) for frame in frames]) == expected
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_frame_receiver_keeps_only_valid_frames(seed):
+    rng = random.Random(seed)
+    frames = inventory_frames(rng, 200)
+    stream = b''.join(frames)
+    receiver = utr.FrameReceiver()
+    # ばらばらの大きさのかたまりで受信した場合も同じ結果になること
+    received = []
+    position = 0
+    while position < len(stream):
+        size = rng.randint(1, 64)
+        receiver.feed(stream[position:position + size])
+        received.extend(frame.raw for frame in receiver.frames())
+        position += size
+    assert received == [frame for frame in frames if reference_verify_sum_value(frame)]
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+インベントリ応答の解析の確認 (疑似リーダライタ utr_emulator を使用)
+
+- SUM値は正しいが、PC+UIIのバイト数がデータ長と合わない0x6Cのフレーム (短いフレーム、
+  PC+UIIがETX以降まではみ出すフレーム) を、各解析経路が例外にせず読み飛ばすか
+- 読み飛ばしたフレームの後ろの正しいフレームを失わないか
+- parse_inventory_tags() (InventoryTag) と parse_inventory_frames() の結果が同じか、asyncio版クライアントの応答の解析
+
+実行例:
+    python -m pytest -q tests/test_parse.py
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import utr_batch  # noqa: E402
+import utr_protocol as utr  # noqa: E402
+
+from utr_async import UtrResponseError, open_socket_client  # noqa: E402
+from utr_emulator import EmulatedSerial, UtrEmulator, make_frame, make_tag_population, serve_socket  # noqa: E402
+from utr_pipeline import InventoryPipeline  # noqa: E402
+from utr_responses import decode_frame, iter_inventory_tags, parse_inventory_tags  # noqa: E402
+from utr_stream import StreamStatistics, iter_inventory_records  # noqa: E402
+from utr_survey import SweepPoint, measure_point  # noqa: E402
+from utr_tags import TagStore  # noqa: E402
+
+PC_UII = bytes([0x30, 0x00, 0x12, 0x34])
+
+# SUM値は正しいが、PC+UIIのバイト数がデータ長と合わないインベントリ応答
+BAD_FRAMES = [
+    utr.build_command(0x6C, 0x09),                                      # 詳細コマンドのみ
+    make_frame(utr.INV[0], bytes([0x09, 0xFF, 0xC0, 0x00])),            # PC+UIIのバイト数が無い
+    make_frame(utr.INV[0], bytes([0x09, 0xFF, 0xC0, 0x00, 6]) + PC_UII),  # PC+UIIがETX以降まで続く
+    make_frame(utr.INV[0], bytes([0x09, 0xFF, 0xC0, 0x00, 0xFF]) + PC_UII),
+]
+
+
+def good_frame(pc_uii: bytes = PC_UII) -> bytes:
+    return make_frame(utr.INV[0], bytes([0x09, 0xFF, 0xC0, 0x07, len(pc_uii)]) + pc_uii)
+
+
+def inventory_ack(count: int) -> bytes:
+    return make_frame(utr.ACK[0], bytes([utr.DETAIL_INV[0], 0x00]) + count.to_bytes(2, 'little'))
+
+
+def receive(stream: bytes):
+    receiver = utr.FrameReceiver()
+    receiver.feed(stream)
+    return list(receiver.frames())
+
+
+class BadFrameEmulator(UtrEmulator):
+    """インベントリ応答の先頭に、PC+UIIのバイト数がデータ長と合わないフレームを加える疑似リーダライタ。"""
+
+    def inventory(self) -> bytes:
+        return b''.join(BAD_FRAMES) + super().inventory()
+
+
+@pytest.mark.parametrize('frame', BAD_FRAMES)
+def test_inventory_pc_uii_length_rejects_bad_frames(frame):
+    assert utr.verify_sum_value(frame)
+    assert utr.inventory_pc_uii_length(frame) is None
+
+
+def test_inventory_pc_uii_length():
+    assert utr.inventory_pc_uii_length(good_frame()) == len(PC_UII)
+    assert utr.inventory_pc_uii_length(good_frame(b'')) == 0
+
+
+def test_parse_inventory_frames_skips_bad_frames(capsys):
+    frames = receive(b''.join(BAD_FRAMES) + good_frame() + inventory_ack(1))
+    pc_uii_list, rssi_list, expected = utr.parse_inventory_frames(frames)
+    assert pc_uii_list == [PC_UII] and rssi_list == [-6.4] and expected == 1
+    assert "データ長と合わない" in capsys.readouterr().out
+
+    pc_uii_list, _, _ = utr.received_data_parse(b''.join(BAD_FRAMES) + good_frame() + inventory_ack(1))
+    assert pc_uii_list == [PC_UII]
+
+
+def test_typed_decoders_skip_bad_frames():
+    frames = receive(b''.join(BAD_FRAMES) + good_frame())
+    assert [tag.pc_uii for tag in iter_inventory_tags(frames)] == [PC_UII]
+    assert [type(decode_frame(frame)).__name__ for frame in frames] == ['Frame'] * len(BAD_FRAMES) + ['InventoryTag']
+
+
+def test_stream_counts_bad_frames():
+    statistics = StreamStatistics()
+    records = list(iter_inventory_records([b''.join(BAD_FRAMES) + good_frame()], statistics))
+    assert [record.pc_uii for record in records] == [PC_UII]
+    assert statistics.short_frames == len(BAD_FRAMES)
+
+
+@pytest.mark.parametrize('numpy_mode', ['numpy', 'python'])
+def test_parse_capture_skips_bad_frames(numpy_mode, monkeypatch):
+    if numpy_mode == 'numpy' and utr_batch.np is None:
+        pytest.skip("NumPy がインストールされていません")
+    if numpy_mode == 'python':
+        monkeypatch.setattr(utr_batch, 'np', None)
+    frames = utr_batch.parse_capture(b''.join(BAD_FRAMES) + good_frame())
+    assert len(frames) == len(BAD_FRAMES) + 1
+    assert list(frames.inventory_indexes()) == [len(BAD_FRAMES)]
+    assert frames.pc_uii(len(BAD_FRAMES)) == PC_UII
+    assert all(frames.pc_uii_length[i] == 0 for i in range(len(BAD_FRAMES)))
+
+
+def test_pipeline_survives_bad_frames():
+    tags = make_tag_population(5, seed=1)
+    store = TagStore()
+    pipeline = InventoryPipeline(EmulatedSerial(BadFrameEmulator(tags, seed=1)), tag_store=store)
+    statistics = pipeline.run(cycles=3)
+    assert statistics.cycles == 3 and statistics.tags == 15
+    assert sorted(store) == sorted(tags)
+
+
+def test_survey_survives_bad_frames():
+    tags = make_tag_population(5, seed=2)
+    point = measure_point(EmulatedSerial(BadFrameEmulator(tags, seed=2)), SweepPoint(1, 25.0), cycles=2)
+    assert point.tags == set(tags) and point.reads == 10 and point.timeouts == 0
+
+
+def test_parse_inventory_tags_matches_parse_inventory_frames():
+    emulator = UtrEmulator(make_tag_population(30, seed=3), seed=3)
+    frames = receive(emulator.inventory())
+    tags, expected = parse_inventory_tags(frames)
+    assert ([tag.pc_uii for tag in tags], [tag.rssi for tag in tags], expected) == utr.parse_inventory_frames(frames)
+    assert [tag.angle for tag in tags] == [frame.raw[utr.ANGLE_LOCATION] for frame in frames[:-1]]
+    assert expected == 30
+
+
+def test_async_client_uses_typed_decoders():
+    emulator = UtrEmulator(make_tag_population(4, seed=4), output_power=23.5, channel=5, seed=4)
+    server, port = serve_socket(emulator)
+
+    async def run():
+        client = await open_socket_client('127.0.0.1', port)
+        try:
+            results = (await client.rom_version(), await client.read_output_power(),
+                       await client.read_frequency_channel(), await client.inventory_tags())
+            emulator.nack_rate = 1.0
+            with pytest.raises(UtrResponseError):
+                await client.rom_version()
+            return results
+        finally:
+            client.close()
+
+    try:
+        rom_version, power, (channel, frequency), (tags, expected) = asyncio.run(run())
+    finally:
+        server.close()
+    assert rom_version == b'EMU1.0' and power == 23.5
+    assert channel == 5 and frequency == utr.OUTPUT_CH_FREQ_LIST[4]
+    assert sorted(tag.pc_uii for tag in tags) == sorted(emulator.tags) and expected == 4
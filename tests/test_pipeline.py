@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+インベントリの連続実行 (utr_pipeline) と結果の出力 (utr_sink) の確認 (疑似リーダライタ utr_emulator を使用)
+
+- on_result に渡す読み取り枚数 (インベントリACK) とPC+UIIリストが一致すること
+- 応答が無い場合、ノイズ・壊れたフレームが混じる場合も止まらないこと
+- cycles / duration / stop_event / rate での終了と、処理段のエラーの伝搬
+- ResultSink へのCSV・JSON Lines出力
+
+実行例:
+    python -m pytest -q tests/test_pipeline.py
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from utr_emulator import EmulatedSerial, UtrEmulator, make_tag_population  # noqa: E402
+from utr_pipeline import InventoryPipeline  # noqa: E402
+from utr_protocol import InventoryTimeout  # noqa: E402
+from utr_sink import CSV_HEADER, ResultSink  # noqa: E402
+from utr_tags import TagStore  # noqa: E402
+
+
+def test_on_result_matches_inventory_ack():
+    tags = make_tag_population(20, seed=1)
+    results = []
+    pipeline = InventoryPipeline(EmulatedSerial(UtrEmulator(tags, read_probability=0.5, seed=1)),
+                                 on_result=lambda *result: results.append(result))
+    statistics = pipeline.run(cycles=10)
+
+    assert statistics.cycles == 10 and statistics.empty_responses == 0
+    assert [index for index, *_ in results] == list(range(10))
+    assert all(expected == len(pc_uii_list) == len(rssi_list)
+               for _, _, pc_uii_list, rssi_list, expected in results)
+    assert statistics.tags == sum(len(pc_uii_list) for _, _, pc_uii_list, _, _ in results)
+    assert 0 < statistics.tags < 200
+
+
+def test_no_response_counts_empty_responses():
+    # 他のアドレスのリーダライタ (応答しない)
+    emulator = UtrEmulator(make_tag_population(3), address=0x01, seed=2)
+    pipeline = InventoryPipeline(EmulatedSerial(emulator), timeout=InventoryTimeout(115200, base_timeout=0.01,
+                                                                                    max_timeout=0.02))
+    statistics = pipeline.run(cycles=3)
+    assert statistics.cycles == 3 and statistics.empty_responses == 3 and statistics.tags == 0
+
+
+def test_noisy_link_does_not_stop_pipeline():
+    tags = make_tag_population(10, seed=3)
+    emulator = UtrEmulator(tags, corruption_rate=0.1, noise_rate=0.1, seed=3)
+    store = TagStore()
+    pipeline = InventoryPipeline(EmulatedSerial(emulator), tag_store=store,
+                                 timeout=InventoryTimeout(115200, base_timeout=0.05, max_timeout=0.1))
+    statistics = pipeline.run(cycles=20)
+    assert statistics.cycles == 20
+    # 壊れたフレームは捨てるが、読めたタグは全て読み取り範囲のタグ
+    assert set(store) <= set(tags) and 0 < statistics.tags <= 200
+
+
+def test_on_result_error_propagates():
+    def on_result(index, read_time, pc_uii_list, rssi_list, expected_count):
+        if index == 2:
+            raise RuntimeError("処理段のエラー")
+
+    pipeline = InventoryPipeline(EmulatedSerial(UtrEmulator(make_tag_population(3), seed=4)), on_result=on_result)
+    with pytest.raises(RuntimeError, match="処理段のエラー"):
+        pipeline.run(cycles=50)
+
+
+def test_stop_event_and_duration():
+    emulator = UtrEmulator(make_tag_population(3), seed=5)
+    stop_event = threading.Event()
+    stop_event.set()
+    assert InventoryPipeline(EmulatedSerial(emulator)).run(stop_event=stop_event).cycles == 0
+
+    stop_event = threading.Event()
+    timer = threading.Timer(0.1, stop_event.set)
+    timer.start()
+    try:
+        statistics = InventoryPipeline(EmulatedSerial(emulator)).run(stop_event=stop_event)
+    finally:
+        timer.cancel()
+    assert statistics.cycles > 0 and not statistics.interrupted
+
+    statistics = InventoryPipeline(EmulatedSerial(emulator)).run(duration=0.1)
+    assert statistics.cycles > 0 and 0.1 <= statistics.elapsed < 1.0
+
+
+def test_rate_paces_cycles():
+    emulator = UtrEmulator(make_tag_population(3), seed=6)
+    start = time.monotonic()
+    statistics = InventoryPipeline(EmulatedSerial(emulator)).run(cycles=5, rate=50)
+    # 1回目は待たずに送信し、以降は 1/50 秒ごと
+    assert time.monotonic() - start >= 4 / 50 * 0.9
+    assert statistics.cycles == 5
+
+
+@pytest.mark.parametrize('file_format', ['csv', 'jsonl'])
+def test_pipeline_writes_sink(tmp_path, file_format):
+    tags = make_tag_population(5, seed=7)
+    with ResultSink(str(tmp_path), file_format=file_format) as sink:
+        statistics = InventoryPipeline(EmulatedSerial(UtrEmulator(tags, seed=7)), reader='R1', sink=sink).run(cycles=4)
+    assert sink.written == statistics.tags == 20 and sink.dropped == 0
+    assert len(sink.files) == 1 and sink.files[0].endswith('.' + file_format)
+
+    with open(sink.files[0], encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    if file_format == 'csv':
+        assert lines[0] + "\n" == CSV_HEADER
+        rows = [line.split(',') for line in lines[1:]]
+        assert all(row[1] == 'R1' for row in rows)
+        pc_uiis = {row[2] for row in rows}
+    else:
+        records = [json.loads(line) for line in lines]
+        assert all(record['reader'] == 'R1' for record in records)
+        pc_uiis = {record['pc_uii'] for record in records}
+    assert pc_uiis == {pc_uii.hex().upper() for pc_uii in tags}
+
+
+def test_sink_rotates_files(tmp_path):
+    with ResultSink(str(tmp_path), max_file_bytes=100, batch_size=1) as sink:
+        for index in range(10):
+            sink.put(float(index), 'R1', bytes([0x30, 0x00, index]), -50.0)
+    assert sink.written == 10 and len(sink.files) > 1
+    rows = []
+    for path in sink.files:
+        with open(path, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        assert lines[0] + "\n" == CSV_HEADER
+        rows += lines[1:]
+    assert [row.split(',')[0] for row in rows] == [f"{index:.6f}" for index in range(10)]
+
+
+def test_sink_reports_write_error(tmp_path):
+    directory = tmp_path / 'out'
+    sink = ResultSink(str(directory))
+    # ファイルは最初の書き込み時に作成するので、その前にディレクトリを消しておく
+    directory.rmdir()
+    sink.put(0.0, 'R1', bytes([0x30, 0x00]), -50.0)
+    with pytest.raises(OSError):
+        sink.close()
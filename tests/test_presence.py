@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+タグの在/不在判定 (utr_presence) の確認
+
+- hold_off / expiry による arrive / depart の判定
+- 読み取りの間隔が空いた場合 (タイミングホイールの一周以上) の depart
+- 疑似リーダライタ utr_emulator のインベントリ結果をそのまま渡した場合
+
+実行例:
+    python -m pytest -q tests/test_presence.py
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from utr_emulator import EmulatedSerial, UtrEmulator, make_tag_population  # noqa: E402
+from utr_presence import ARRIVE, DEPART, PresenceTracker  # noqa: E402
+from utr_protocol import COMMANDS, communicate_frames, parse_inventory_frames  # noqa: E402
+
+TAG_A = bytes([0x30, 0x00, 0x0A])
+TAG_B = bytes([0x30, 0x00, 0x0B])
+
+
+def kinds(events):
+    return [(event.kind, event.pc_uii) for event in events]
+
+
+def test_arrive_after_hold_off_and_depart_after_expiry():
+    tracker = PresenceTracker(hold_off=0.5, expiry=1.0, resolution=0.1)
+    assert tracker.update([TAG_A], 10.0) == []
+    assert TAG_A not in tracker
+    assert kinds(tracker.update([TAG_A, TAG_B], 10.6)) == [(ARRIVE, TAG_A)]
+    assert TAG_A in tracker and len(tracker) == 1
+
+    # TAG_B は arrive 前に期限が過ぎるので、イベントを出さずに消える
+    events = tracker.advance(11.8)
+    assert kinds(events) == [(DEPART, TAG_A)]
+    assert events[0].timestamp == pytest.approx(11.6) and events[0].reads == 2
+    assert len(tracker) == 0 and list(tracker.present()) == []
+
+
+def test_reads_extend_expiry():
+    tracker = PresenceTracker(expiry=1.0, resolution=0.1)
+    assert kinds(tracker.update([TAG_A], 0.0)) == [(ARRIVE, TAG_A)]
+    for step in range(1, 30):
+        assert tracker.update([TAG_A], step * 0.5) == []
+    assert kinds(tracker.advance(100.0)) == [(DEPART, TAG_A)]
+
+
+def test_flush_departs_all():
+    tracker = PresenceTracker()
+    tracker.update([TAG_A, TAG_B], 1.0)
+    assert sorted(kinds(tracker.flush(2.0))) == [(DEPART, TAG_A), (DEPART, TAG_B)]
+    assert len(tracker) == 0 and tracker.advance(100.0) == []
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        PresenceTracker(expiry=0)
+    with pytest.raises(ValueError):
+        PresenceTracker(hold_off=-1.0)
+
+
+def test_emulator_inventory_results():
+    tags = make_tag_population(8, seed=1)
+    emulator = UtrEmulator(tags, seed=1)
+    ser = EmulatedSerial(emulator)
+    tracker = PresenceTracker(expiry=1.0)
+
+    pc_uii_list, _, _ = parse_inventory_frames(communicate_frames(ser, COMMANDS['UHF_INVENTORY']))
+    assert sorted(pc_uii for _, pc_uii in kinds(tracker.update(pc_uii_list, 0.0))) == sorted(tags)
+
+    # 半分のタグが読み取り範囲から離れる
+    emulator.tags = tags[:4]
+    pc_uii_list, _, _ = parse_inventory_frames(communicate_frames(ser, COMMANDS['UHF_INVENTORY']))
+    assert tracker.update(pc_uii_list, 0.8) == []
+    events = tracker.update(pc_uii_list, 1.5)
+    assert sorted(kinds(events)) == sorted((DEPART, pc_uii) for pc_uii in tags[4:])
+    assert sorted(tracker.present()) == sorted(tags[:4])
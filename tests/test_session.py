@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+接続状態の再利用・自動再接続 (utr_session) の確認 (疑似リーダライタ utr_emulator を使用)
+
+- 状態ファイルがある場合の接続 (resume) で送信するコマンド
+- set_inventory_param=False (--no-set-param) の場合に、インベントリパラメータを設定しないこと
+- 受信中に切断した場合の再接続と、コマンドの送り直し
+
+実行例:
+    python -m pytest -q tests/test_session.py
+"""
+
+import os
+import sys
+
+from typing import List
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from utr_emulator import EmulatedSerial, UtrEmulator, make_tag_population  # noqa: E402
+from utr_protocol import (COMMANDS, DETAIL_GET_INVENTORY_PARAM, DETAIL_LOCATION,  # noqa: E402
+                          DETAIL_SET_INVENTORY_PARAM, communicate, communicate_frames, is_ack, parse_inventory_frames)
+from utr_session import ReaderSession  # noqa: E402
+
+# 疑似リーダライタの初期のインベントリパラメータと異なる値
+OTHER_PARAM = bytes([0x00, 0x81, 0x00, 0x01, 0x00, 0x00, 0x00, 0x00])
+
+
+class RecordingEmulator(UtrEmulator):
+    """受信したコマンドの (コマンド, 詳細コマンド) を記録する疑似リーダライタ。"""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.commands: List[tuple] = []
+
+    def respond(self, command: bytes) -> bytes:
+        self.commands.append((command[2], command[DETAIL_LOCATION]))
+        return super().respond(command)
+
+    def sent(self, detail: int) -> int:
+        return sum(1 for command in self.commands if command == (0x55, detail))
+
+
+class DroppingSerial(EmulatedSerial):
+    """drops 回目の read() で切断 (OSError) する EmulatedSerial。"""
+
+    def __init__(self, emulator: UtrEmulator, drops: List[int]) -> None:
+        super().__init__(emulator)
+        self.drops = drops
+
+    def read(self, size: int = 1) -> bytes:
+        if self.drops:
+            self.drops[0] -= 1
+            if self.drops[0] <= 0:
+                self.drops.pop(0)
+                raise OSError("切断")
+        return super().read(size)
+
+
+def new_session(emulator: UtrEmulator, state_file: str, **kwargs) -> ReaderSession:
+    return ReaderSession('EMU', 115200, state_file=state_file, verbose=False,
+                         opener=lambda port, baud: EmulatedSerial(emulator), **kwargs)
+
+
+@pytest.fixture
+def state_file(tmp_path):
+    return str(tmp_path / 'reader_state.json')
+
+
+def test_resume_skips_setting_reads(state_file):
+    emulator = RecordingEmulator(make_tag_population(3), seed=1)
+    with new_session(emulator, state_file, inventory_param=OTHER_PARAM) as session:
+        assert session.handshakes == 1 and session.resumes == 0
+    assert emulator.inventory_params == OTHER_PARAM
+    assert emulator.sent(DETAIL_SET_INVENTORY_PARAM) == 1
+
+    # 2回目は状態ファイルを再利用し、設定が同じならUHF_SET_INVENTORY_PARAMも省略する
+    emulator.commands.clear()
+    with new_session(emulator, state_file, inventory_param=OTHER_PARAM) as session:
+        assert session.handshakes == 0 and session.resumes == 1
+        assert session.info.rom_version == b'EMU1.0'
+        pc_uii_list, _, expected = parse_inventory_frames(communicate_frames(session, COMMANDS['UHF_INVENTORY']))
+        assert sorted(pc_uii_list) == sorted(emulator.tags) and expected == 3
+    assert emulator.commands[:3] == [(0x4F, 0x90), (0x4E, 0x00), (0x55, DETAIL_GET_INVENTORY_PARAM)]
+    assert emulator.sent(DETAIL_SET_INVENTORY_PARAM) == 0
+
+    # リーダライタの設定が変わっていれば設定し直す
+    emulator.inventory_params = bytes(8)
+    with new_session(emulator, state_file, inventory_param=OTHER_PARAM) as session:
+        assert session.resumes == 1
+    assert emulator.inventory_params == OTHER_PARAM
+
+
+def test_rom_version_change_runs_full_handshake(state_file):
+    with new_session(UtrEmulator(seed=2), state_file):
+        pass
+    with new_session(UtrEmulator(rom_version=b'EMU2.0', seed=2), state_file) as session:
+        assert session.handshakes == 1 and session.resumes == 0
+        assert session.info.rom_version == b'EMU2.0'
+
+
+@pytest.mark.parametrize('with_state', [False, True])
+def test_no_set_inventory_param(state_file, with_state):
+    emulator = RecordingEmulator(seed=3)
+    original = emulator.inventory_params
+    if with_state:
+        with new_session(emulator, state_file, set_inventory_param=False):
+            pass
+        emulator.commands.clear()
+    with new_session(emulator, state_file, inventory_param=OTHER_PARAM, set_inventory_param=False) as session:
+        assert session.resumes == int(with_state)
+    assert emulator.inventory_params == original
+    assert emulator.sent(DETAIL_SET_INVENTORY_PARAM) == 0
+
+
+def test_reconnect_resends_command(state_file):
+    emulator = RecordingEmulator(make_tag_population(2), seed=4)
+    drops: List[int] = []
+    session = ReaderSession('EMU', 115200, state_file=state_file, verbose=False,
+                            opener=lambda port, baud: DroppingSerial(emulator, drops))
+    session.connect()
+    try:
+        drops.append(1)   # 次の読み取りで切断
+        result = communicate(session, COMMANDS['ROM_VERSION_CHECK'])
+        assert is_ack(result)
+        assert session.reconnects == 1 and session.resumes == 1
+        # 再接続後も状態を再利用する (ROMバージョン、コマンドモード切替、パラメータの確認のみ)
+        assert emulator.commands[-4:] == [(0x4F, 0x90), (0x4E, 0x00), (0x55, DETAIL_GET_INVENTORY_PARAM),
+                                          (0x4F, 0x90)]
+    finally:
+        session.close()
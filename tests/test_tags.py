@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+タグ読み取り結果の集計 (utr_tags) の確認
+
+- ANGLEの受け渡し (add_many()、InventoryPipeline)
+- 集計中に別のスレッドから changes_since() などを呼び出せること
+- changes_since() の差分
+
+実行例:
+    python -m pytest -q tests/test_tags.py
+"""
+
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from utr_emulator import EmulatedSerial, UtrEmulator, make_tag_population  # noqa: E402
+from utr_pipeline import InventoryPipeline  # noqa: E402
+from utr_tags import TagStore  # noqa: E402
+
+
+def test_add_many_keeps_angle():
+    store = TagStore()
+    tags = make_tag_population(3)
+    store.add_many(tags, [-50.0, -60.0, -70.0], 1.0, antenna=2, angle_list=[10, 20, 30])
+    assert [(store.get(pc_uii).angle, store.get(pc_uii).antenna) for pc_uii in tags] == [(10, 2), (20, 2), (30, 2)]
+    store.add_many(tags[:1], [-40.0], 2.0)
+    record = store.get(tags[0])
+    assert record.angle is None and record.count == 2 and record.rssi_max == -40.0 and record.last_seen == 2.0
+
+
+def test_changes_since():
+    store = TagStore()
+    tags = make_tag_population(4)
+    store.add_many(tags, [-50.0] * 4, 1.0)
+    version, changes = store.changes_since(0)
+    assert [pc_uii for pc_uii, _ in changes] == tags
+    store.add(tags[1], -45.0, 2.0, angle=7)
+    version, changes = store.changes_since(version)
+    assert changes == [(tags[1], (2, 1.0, 2.0, -50.0, -45.0, -47.5, None, 7))]
+    assert store.changes_since(version) == (version, [])
+
+
+def test_pipeline_passes_angle():
+    tags = make_tag_population(10, seed=1)
+    store = TagStore()
+    InventoryPipeline(EmulatedSerial(UtrEmulator(tags, seed=1)), tag_store=store).run(cycles=2)
+    assert sorted(store) == sorted(tags)
+    assert all(record.angle is not None and record.count == 2 for _, record in store.items())
+
+
+def test_changes_since_while_adding():
+    store = TagStore()
+    tags = make_tag_population(2000, seed=2)
+    stop = threading.Event()
+    errors = []
+
+    def add() -> None:
+        try:
+            while not stop.is_set():
+                store.add_many(tags, [-50.0] * len(tags))
+        except Exception as e:   # 失敗した場合はテストで確認
+            errors.append(e)
+
+    worker = threading.Thread(target=add)
+    worker.start()
+    try:
+        version = 0
+        for _ in range(200):
+            version, changes = store.changes_since(version // 2)
+            assert all(len(change) == 2 for change in changes)
+            list(store.items())
+            store.counts()
+    finally:
+        stop.set()
+        worker.join()
+    assert not errors
+    assert len(store.changes_since(0)[1]) == len(tags)
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+コマンドラインサンプル (utr_usb_sample) の確認
+
+- 起動時に、読み取りループや一部のオプションでしか使わないモジュールを読み込まないこと
+
+実行例:
+    python -m pytest -q tests/test_usb_sample.py
+"""
+
+import os
+import subprocess
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC_DIR)
+
+# 使う関数の中で読み込むモジュール
+DEFERRED_MODULES = ['argparse', 'datetime', 'queue', 'threading', 'serial.tools.list_ports', 'utr_capture',
+                    'utr_link', 'utr_pipeline', 'utr_presence', 'utr_session', 'utr_sink', 'utr_tags']
+
+
+def test_import_defers_modules():
+    # 他のテストで読み込み済みのモジュールの影響を受けないよう、新しいプロセスで確認する
+    code = ("import sys; sys.path.insert(0, sys.argv[1]); import utr_usb_sample; "
+            "print(' '.join(sorted(set(sys.argv[2:]) & set(sys.modules))))")
+    result = subprocess.run([sys.executable, '-c', code, SRC_DIR] + DEFERRED_MODULES,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.split() == []
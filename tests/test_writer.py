@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+タグへの一括書き込み (utr_writer) の確認 (疑似リーダライタ utr_emulator を使用)
+
+- 書き込むタグを指定したコマンドで、読み取り範囲に複数のタグがあってもまとめて書き込めるか
+- NACK_RXBUSY_ERROR / NACK_UHF_IC_ERROR の再送と、その他のNACKを再送しないこと
+- インベントリでの確認、コマンドラインの終了コード
+
+実行例:
+    python -m pytest -q tests/test_writer.py
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import utr_writer  # noqa: E402
+
+from utr_emulator import EmulatedSerial, UtrEmulator, make_tag_population  # noqa: E402
+from utr_protocol import (DETAIL_WRITE, MEMORY_BANK_USER, NACK_FORMAT_ERROR, NACK_RXBUSY_ERROR,  # noqa: E402
+                          NACK_UHF_IC_ERROR)
+from utr_writer import BatchWriter, WriteJob, build_write_command  # noqa: E402
+
+
+class ScriptedNackEmulator(UtrEmulator):
+    """UHF_Write に、決めた順番でNACKを返す疑似リーダライタ。"""
+
+    def __init__(self, tags, nack_script):
+        super().__init__(tags, seed=0)
+        self.nack_script = list(nack_script)   # UHF_Write ごとのNACKのエラーコード (Noneなら通常の応答)
+
+    def respond(self, command):
+        if command[4] == DETAIL_WRITE and self.nack_script:
+            code = self.nack_script.pop(0)
+            if code is not None:
+                return self._nack(DETAIL_WRITE, code)
+        return super().respond(command)
+
+
+def new_epc(index: int) -> bytes:
+    return bytes([0xE2, 0x00, index]) + bytes(9)
+
+
+def test_build_write_command_layout():
+    target = bytes([0x30, 0x00, 0x12, 0x34])
+    command = build_write_command(MEMORY_BANK_USER, 0x10, bytes([0xAB, 0xCD]), target)
+    assert command[2] == 0x55 and command[4] == DETAIL_WRITE
+    assert command[5:-3] == bytes([MEMORY_BANK_USER, 0x00, 0x00, 0x10, 2, 0xAB, 0xCD, 4]) + target
+    assert command[3] == len(command) - 7
+    with pytest.raises(ValueError):
+        build_write_command(MEMORY_BANK_USER, 0, bytes([0xAB]))
+
+
+def test_batch_write_with_many_tags_in_field():
+    tags = make_tag_population(40, seed=1)
+    emulator = UtrEmulator(tags, seed=1)
+    jobs = [WriteJob(pc_uii, new_epc(index)) for index, pc_uii in enumerate(tags)]
+    statistics = BatchWriter(EmulatedSerial(emulator), batch_size=16).run(jobs)
+
+    assert statistics.succeeded == len(jobs)
+    assert statistics.write_commands == len(jobs)
+    # 確認のインベントリは、まとまりごとに1回
+    assert statistics.verify_inventories == 3
+    assert emulator.tags == [pc_uii[:2] + new_epc(index) for index, pc_uii in enumerate(tags)]
+
+
+def test_write_to_other_bank_is_kept():
+    tags = make_tag_population(3, seed=2)
+    emulator = UtrEmulator(tags, seed=2)
+    job = WriteJob(tags[1], bytes([0x01, 0x02, 0x03, 0x04]), bank=MEMORY_BANK_USER, word_address=1)
+    statistics = BatchWriter(EmulatedSerial(emulator)).run([job])
+    assert statistics.results[0].written and statistics.results[0].verified is None
+    assert emulator.memories[(1, MEMORY_BANK_USER)] == bytearray([0x00, 0x00, 0x01, 0x02, 0x03, 0x04])
+    assert emulator.tags == tags
+
+
+def test_retry_only_retryable_nacks():
+    tags = make_tag_population(3, seed=3)
+    emulator = ScriptedNackEmulator(tags, [NACK_RXBUSY_ERROR, NACK_FORMAT_ERROR, None, NACK_UHF_IC_ERROR])
+    jobs = [WriteJob(pc_uii, new_epc(index)) for index, pc_uii in enumerate(tags)]
+    statistics = BatchWriter(EmulatedSerial(emulator), batch_size=3, retries=2).run(jobs)
+
+    first, second, third = statistics.results
+    # 1枚目: RXBUSY → 他のタグを書き込んでから再送 (UHF_IC_ERROR) → 再送して成功
+    assert first.ok and first.attempts == 3 and first.nack_codes == [NACK_RXBUSY_ERROR, NACK_UHF_IC_ERROR]
+    # 2枚目: FORMAT_ERROR は再送しない
+    assert not second.ok and second.attempts == 1 and second.nack_codes == [NACK_FORMAT_ERROR]
+    assert third.ok and third.attempts == 1
+    assert statistics.write_commands == 5
+
+
+def test_missing_tag_fails():
+    tags = make_tag_population(2, seed=4)
+    emulator = UtrEmulator(tags, seed=4)
+    statistics = BatchWriter(EmulatedSerial(emulator), retries=1).run([WriteJob(bytes(14), new_epc(0))])
+    result = statistics.results[0]
+    assert not result.ok and result.nack_codes == [NACK_RXBUSY_ERROR, NACK_RXBUSY_ERROR]
+    assert emulator.tags == tags
+
+
+def test_unverified_write_fails():
+    # ACKは返るが、書き込み後のPC+UIIが読み取れない (タグが離れた場合など)
+    tags = make_tag_population(2, seed=5)
+    emulator = UtrEmulator(tags, seed=5)
+    emulator.read_probability = 0.0
+    statistics = BatchWriter(EmulatedSerial(emulator), verify_cycles=2).run([WriteJob(tags[0], new_epc(0))])
+    result = statistics.results[0]
+    assert result.written and result.verified is False and not result.ok
+    assert statistics.verify_inventories == 2
+
+
+def test_cli_exit_code(tmp_path, monkeypatch):
+    tags = make_tag_population(2, seed=6)
+    emulator = UtrEmulator(tags, seed=6)
+    monkeypatch.setattr('utr_reader.open_reader', lambda port, baud: EmulatedSerial(emulator))
+    jobs = tmp_path / 'jobs.csv'
+    jobs.write_text(f"# target,epc\n{tags[0].hex()},{new_epc(0).hex()}\n", encoding='utf-8')
+    results = tmp_path / 'results.csv'
+    assert utr_writer.main(['--port', 'EMU', '--jobs', str(jobs), '--results', str(results)]) == 0
+    assert results.read_text(encoding='utf-8').count('\n') == 2
+
+    # 読み取り範囲に無いタグ
+    jobs.write_text(f"{bytes(14).hex()},{new_epc(1).hex()}\n", encoding='utf-8')
+    assert utr_writer.main(['--port', 'EMU', '--jobs', str(jobs), '--retries', '0']) == 1